@@ -0,0 +1,57 @@
+from collections import Counter
+from random import Random
+from time import perf_counter
+
+# imports from my project
+from core_algos.gathering_types import counts_shared_genre_combinations, genre_mask
+
+
+def original_combinations(films_genres: list):
+    """
+    Every pair of films compared with sets, which "counts_shared_genre_combinations" replaced,
+    tests/test_gathering_types.py checks that they give the same combinations
+    """
+    combinations = []
+    for index, genres1 in enumerate(films_genres):
+        for genres2 in films_genres[index+1:]:
+            in_common = set(genres1) & set(genres2)
+            if len(in_common) > 1:
+                combinations += [tuple(sorted(in_common))]
+    return Counter(combinations).most_common()
+
+
+def benchmarks_genre_combinations(sizes: tuple = (100, 500, 2000, 5000), fewest_genres: int = 1, most_genres: int = 4, genres: int = 20, repeats: int = 3):
+    """
+    Times "counts_shared_genre_combinations" against comparing every pair of films with sets,
+    for a growing amount of films with fewest_genres to most_genres of the genres each, then prints the best time of each one
+
+    :param: sizes: tuple - the amount of films
+
+    :param: fewest_genres: int
+
+    :param: most_genres: int
+
+    :param: genres: int - the amount of genres the films' genres are picked from
+
+    :param: repeats: int
+    """
+    random = Random(1)
+    print(f"{fewest_genres} to {most_genres} of {genres} genres for each film")
+    for size in sizes:
+        films_genres = [random.sample(range(2, 2+genres), random.randint(fewest_genres, most_genres)) for _ in range(size)]
+        timings = []
+        for function, films in ((original_combinations, films_genres), (counts_shared_genre_combinations, None)):
+            best = float("inf")
+            for _ in range(repeats):
+                start = perf_counter()
+                function(films if films is not None else [genre_mask(genres) for genres in films_genres])
+                best = min(best, perf_counter() - start)
+            timings += [best]
+        old_time, new_time = timings
+        print(f"{size:>5} films: pairwise sets {old_time*1000:10.2f}ms  masks {new_time*1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmarks_genre_combinations()
+    benchmarks_genre_combinations((500, 3000), 12, 12, 27, repeats= 1) # films with too many genres to count by their combinations
+    benchmarks_genre_combinations((500, 3000), 1, 12, 27, repeats= 1)
@@ -0,0 +1,56 @@
+from random import sample
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+# imports from my project
+from core_algos import formulas
+from core_algos.formulas import configures_pool, pool, selects_info_from_database, selects_info_in_chunks, WhereStatement
+
+
+def benchmarks_large_id_sets(sizes: tuple = (100, 10000, 100000), repeats: int = 5):
+    """
+    Compares looking up a list of ids with a temporary table, against splitting them up into chunks,
+    on a table of 200,000 films with an index on FilmID, and for the smallest size against the normal "?" placeholders aswell.
+    Prints the average time for each method in milliseconds.
+    MAX_BOUND_IDS and the pool are always put back afterwards, even if a lookup fails
+
+    :param: sizes: tuple
+
+    :param: repeats: int
+    """
+    bound_ids = formulas.MAX_BOUND_IDS
+    with TemporaryDirectory() as folder:
+        configures_pool(f"{folder}/benchmark.db", size= 1)
+        try:
+            with pool.connection() as db:
+                db.execute("CREATE TABLE Films (FilmID INTEGER PRIMARY KEY, Length INTEGER)")
+                db.executemany("INSERT INTO Films VALUES (?, ?)", ((i, i % 200) for i in range(200000)))
+                db.commit()
+
+            for size in sizes:
+                ids = sample(range(200000), size)
+                timings = {}
+                methods = {"temporary table": lambda: selects_info_from_database("FilmID, Length", "Films", WhereStatement().is_in("FilmID", ids)),
+                    "chunks": lambda: selects_info_in_chunks("FilmID, Length", "Films", "FilmID", ids)}
+                for name, method in methods.items():
+                    formulas.MAX_BOUND_IDS = 0 if name == "temporary table" else bound_ids # makes sure the temporary table is used even for small lists
+                    try:
+                        start_time = perf_counter()
+                        for _ in range(repeats):
+                            assert len(method()) == size
+                        timings[name] = (perf_counter()-start_time)*1000/repeats
+                    finally:
+                        formulas.MAX_BOUND_IDS = bound_ids
+                if size <= bound_ids:
+                    start_time = perf_counter()
+                    for _ in range(repeats):
+                        selects_info_from_database("FilmID, Length", "Films", WhereStatement().is_in("FilmID", ids))
+                    timings["placeholders"] = (perf_counter()-start_time)*1000/repeats
+                print(f"{size} ids --- " + ", ".join([f"{name}: {timing:.2f}ms" for name, timing in timings.items()]))
+        finally:
+            formulas.MAX_BOUND_IDS = bound_ids
+            configures_pool()
+
+
+if __name__ == "__main__":
+    benchmarks_large_id_sets()
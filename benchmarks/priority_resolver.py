@@ -0,0 +1,65 @@
+from random import Random
+from time import perf_counter
+
+# imports from my project
+from core_algos.calc_recommendations import resolves_recommendation_priorities, recommendation_score, RECOMMENDATION_SIZE, \
+    LIKED_FIRST, LIKED_MONO, LIKED_SECOND, LIKED_THIRD, LIKED_REMAINDER
+
+
+def sorts_every_film(user_id, first_weighting, not_wanted, mono, second_weighting, third_weighting, film_ids_gathered_to_recommend, shared_people):
+    """
+    Scores and sorts every film, which "resolves_recommendation_priorities" does with a heap instead,
+    tests/test_calc_recommendations.py checks that they pick the same films
+    """
+    liked_of_film = {}
+    for liked, film_ids in ((LIKED_FIRST, first_weighting), (None, not_wanted), (LIKED_MONO, mono[1:]), (LIKED_SECOND, second_weighting),
+            (LIKED_THIRD, third_weighting), (LIKED_REMAINDER, film_ids_gathered_to_recommend)):
+        for film_id in film_ids:
+            liked_of_film.setdefault(film_id, liked)
+    scored = sorted(((recommendation_score(liked, shared_people.get(film_id, 0)), -film_id, liked) for film_id, liked in liked_of_film.items()
+        if liked is not None), reverse= True)
+    mono_rows = [row for row in scored if row[2] == LIKED_MONO][:round(mono[0]*RECOMMENDATION_SIZE) if mono else 0]
+    other_rows = [row for row in scored if row[2] != LIKED_MONO][:RECOMMENDATION_SIZE-len(mono_rows)]
+    return [(-negative_id, user_id, liked) for _, negative_id, liked in sorted(mono_rows+other_rows, reverse= True)]
+
+
+def random_lists(random: Random, size: int):
+    """
+    Random lists of films in the same form that "resolves_recommendation_priorities" is given them, out of size films gathered to recommend
+
+    :param: random: Random
+
+    :param: size: int
+
+    :return: TYPE: list - the arguments for "resolves_recommendation_priorities"
+    """
+    gathered = random.sample(range(1, size*10), size)
+    def some():
+        return [random.choice(gathered) for _ in range(random.randint(0, size//random.choice((2, 5, 20, 100))))] if random.random() < 0.8 else []
+    mono = [random.random()] + list(dict.fromkeys(some())) if random.random() < 0.5 else []
+    shared_people = {film_id: random.randint(0, 4) for film_id in gathered if random.random() < 0.6}
+    return [7, some(), some(), mono, some(), some(), gathered, shared_people]
+
+
+def benchmarks_priority_resolver(sizes: tuple = (100, 1000, 10000, 100000), seed: int = 1):
+    """
+    Times "resolves_recommendation_priorities" against scoring and sorting every film, for bigger amounts of films
+
+    :param: sizes: tuple
+
+    :param: seed: int
+    """
+    random = Random(seed)
+    for size in sizes:
+        lists = random_lists(random, size)
+        start = perf_counter()
+        sorts_every_film(*lists)
+        sorted_time = perf_counter()-start
+        start = perf_counter()
+        resolves_recommendation_priorities(*lists)
+        heap_time = perf_counter()-start
+        print(f"{size:>7} films: sorted {sorted_time*1000:9.2f}ms  heap {heap_time*1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmarks_priority_resolver()
@@ -0,0 +1,77 @@
+from math import sqrt, inf
+from random import Random
+from time import perf_counter
+
+# imports from my project
+from core_algos.statistics_kernel import means_and_sds, binomial_range, binomial_tables
+
+
+def benchmarks_statistics(sizes: tuple = (1000, 10000, 100000, 1000000), repeats: int = 3):
+    """
+    Times the old pure python versions against this module, for mean and sd and for the binomial distribution,
+    the old binomial distribution is also checked to see if it still gives an answer (it overflows after about 1000 trials)
+
+    :param: sizes: tuple
+
+    :param: repeats: int
+    """
+    def old_mean_and_sd(list_of_values):
+        total = sum(list_of_values)
+        amount = len(list_of_values)
+        values = map(lambda x : x**2, list_of_values)
+        mean = total/amount
+        return mean, sqrt((sum(values)/amount) - mean**2)
+
+    def old_factorial(val):
+        factorial = 1
+        for i in range(1, val+1):
+            factorial *= i
+        return factorial
+
+    def old_binomial_distribution(lower, upper, trial, probability):
+        value = 0
+        for i in range(lower, upper+1):
+            value += ((1-probability)**(trial-i)) * (probability**i)*(old_factorial(trial)/(old_factorial(trial-i)*old_factorial(i)))
+        return value
+
+    def times(function, *args):
+        best = inf
+        for _ in range(repeats):
+            start = perf_counter()
+            result = function(*args)
+            best = min(best, perf_counter()-start)
+        return best, result
+
+    random = Random(1)
+    for size in sizes:
+        values = [random.randint(60, 200) for _ in range(size)] # e.g. film runtimes
+        old_time, old_result = times(old_mean_and_sd, values)
+        new_time, new_result = times(lambda v: means_and_sds([v])[0], values)
+        print(f"mean and sd   {size:>8} values: old {old_time*1000:8.2f}ms  new {new_time*1000:8.2f}ms  "
+            f"difference {max(abs(a-b) for a, b in zip(old_result, new_result)):.2e}")
+
+    for trial in (10, 100, 1000, 10000, 100000, 1000000):
+        lower = int(trial*0.1)
+        try:
+            if trial <= 1000:
+                old_time, old_result = times(old_binomial_distribution, lower, trial, trial, 0.1)
+            elif trial <= 10000:
+                old_binomial_distribution(lower, lower, trial, 0.1) # the whole range would take too long, so only checks one term
+                old_time, old_result = inf, "too slow"
+            else:
+                old_time, old_result = inf, "too slow" # even one term would take minutes to work out the factorials
+        except OverflowError:
+            old_time, old_result = inf, "overflow"
+        binomial_tables.cache_clear()
+        new_time, new_result = times(binomial_range, lower, trial, trial, 0.1) # the first run builds the table, the rest use the cache
+        binomial_tables.cache_clear()
+        start = perf_counter()
+        binomial_range(lower, trial, trial, 0.1)
+        cold_time = perf_counter()-start
+        print(f"binomial {trial:>8} trials: old {old_time*1000:10.2f}ms ({old_result})  new {cold_time*1000:8.2f}ms cold, "
+            f"{new_time*1000:8.4f}ms cached ({new_result:.6f})")
+
+
+
+if __name__ == "__main__":
+    benchmarks_statistics()
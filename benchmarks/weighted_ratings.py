@@ -0,0 +1,62 @@
+from collections import Counter
+from random import Random
+from time import perf_counter
+
+# imports from my project
+from core_algos.gathering_types import tallies_weighted_ratings
+
+
+def original_tallies(ratings: list, without_unknowns: list, amount_of_known_films: int):
+    """
+    The nested loops which "tallies_weighted_ratings" replaced, tests/test_gathering_types.py checks that they give the same tallies
+    """
+    films_with_ratings = []
+    rating_frequency = []
+    for film_id, rating in ratings:
+        films_with_ratings +=[film_id]
+        if rating == -1:
+            rating = 5
+        for film_id2, actors_directors_genres_id in without_unknowns:
+                if film_id == film_id2:
+                    rating_frequency += [actors_directors_genres_id]*rating
+    if len(films_with_ratings) != amount_of_known_films:
+        for film_id3, actors_directors_genres_id2 in without_unknowns:
+            if film_id3 not in films_with_ratings:
+                rating_frequency += [actors_directors_genres_id2]*5
+    return dict(Counter(rating_frequency))
+
+
+def benchmarks_weighted_ratings(sizes: tuple = (50, 200, 800, 1600), repeats: int = 3):
+    """
+    Times "tallies_weighted_ratings" against the original nested loops for profiles of a growing amount of films,
+    with 10 actors for each film and 5 ratings for each film, some of the films are left without ratings
+    and some ratings are unknown (-1) or 0, then prints the best time of each one
+
+    :param: sizes: tuple - the amount of films in each profile
+
+    :param: repeats: int
+    """
+    random = Random(1)
+    for size in sizes:
+        films = list(range(size))
+        without_unknowns = [(film_id, random.randrange(size*3)) for film_id in films for _ in range(10)]
+        random.shuffle(without_unknowns)
+        rated_films = films[: size*4//5] # the last fifth of the films are not rated
+        ratings = [(film_id, random.choice((-1, 0, 1, 3, 5, 7, 10))) for film_id in rated_films for _ in range(5)]
+        random.shuffle(ratings)
+
+        timings = []
+        for function in (original_tallies, tallies_weighted_ratings):
+            best = float("inf")
+            for _ in range(repeats):
+                start = perf_counter()
+                function(ratings, without_unknowns, size)
+                best = min(best, perf_counter() - start)
+            timings += [best]
+        old_time, new_time = timings
+        print(f"{size:>5} films, {len(ratings):>6} ratings, {len(without_unknowns):>6} links: "
+            f"original {old_time*1000:10.2f}ms  new {new_time*1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmarks_weighted_ratings()
@@ -0,0 +1,141 @@
+from asyncio import get_running_loop, gather
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+
+# imports from my project
+from core_algos.formulas import pool, uses_pool, ConnectionPool, selects_info_from_database, inserts_info_to_database, deletes_from_database, updates_database
+
+
+ASYNC_WORKERS = 8 # the amount of queries which can be running at once for the async routes
+
+
+class DatabaseExecutor:
+    """
+    A set of worker threads which run the blocking database functions, so an async route can await them without blocking,
+    and can run lookups which do not depend on each other at the same time.
+    Each worker uses a dedicated pool with one connection for each worker, so the async routes never wait for connections used by the rest of the website.
+    The threads and connections are only made when the first query is run
+
+    :param: workers: int
+    """
+    def __init__(self, workers: int = ASYNC_WORKERS):
+        self.workers = workers
+        self.dedicated_pool = None
+        self.__executor = None
+        self.__lock = Lock()
+
+
+    def __starts(self):
+        """
+        Creates the dedicated pool and the threads, using the same database and settings as the main pool.
+        If the main pool has been pointed at a different database since then, the dedicated pool is changed to match it
+
+        :return: TYPE: ThreadPoolExecutor
+        """
+        with self.__lock:
+            if self.__executor is None:
+                self.dedicated_pool = ConnectionPool(pool.path, self.workers, pool.timeout, pool.pragmas)
+                self.__executor = ThreadPoolExecutor(max_workers= self.workers, thread_name_prefix= "database",
+                    initializer= uses_pool, initargs= (self.dedicated_pool,))
+            elif self.dedicated_pool.path != pool.path:
+                self.dedicated_pool.reconfigures(pool.path, self.workers, pool.timeout, pool.pragmas)
+        return self.__executor
+
+
+    async def runs(self, function, *args, **kwargs):
+        """
+        Runs any blocking function in one of the worker threads, and waits for the result without blocking the event loop.
+        The function runs in a copy of the current context, so the queries are still added to the totals for the route which called it
+
+        :param: function: function
+
+        :return: TYPE: - whatever the function returns
+        """
+        executor = self.__starts()
+        return await get_running_loop().run_in_executor(executor, partial(copy_context().run, function, *args, **kwargs))
+
+
+    def shuts_down(self):
+        """
+        Waits for the running queries to finish, then stops the threads and closes the dedicated connections
+        """
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown(wait= True)
+                self.dedicated_pool.closes_all()
+                self.__executor = None
+
+
+database_executor = DatabaseExecutor()
+
+
+async def selects_info_from_database_async(fields: str, table: str, where_statement):
+    """
+    The same as "selects_info_from_database" but can be awaited
+
+    :param: fields: str
+
+    :param: table: str
+
+    :param: where_statement: str or WhereStatement
+
+    :return: information: list
+    """
+    return await database_executor.runs(selects_info_from_database, fields, table, where_statement)
+
+
+async def inserts_info_to_database_async(fields: str, table: str, data: list):
+    """
+    The same as "inserts_info_to_database" but can be awaited
+
+    :param: field: str
+
+    :param: table: str
+
+    :param: data: list - 2d list of tuples
+    """
+    await database_executor.runs(inserts_info_to_database, fields, table, data)
+
+
+async def deletes_from_database_async(table: str, where_statement):
+    """
+    The same as "deletes_from_database" but can be awaited
+
+    :param: table: str
+
+    :param: where_statement: str or WhereStatement
+    """
+    await database_executor.runs(deletes_from_database, table, where_statement)
+
+
+async def updates_database_async(fields: str, table: str, where_statement, data: tuple):
+    """
+    The same as "updates_database" but can be awaited
+
+    :param: field: str
+
+    :param: table: str
+
+    :param: where_statement: str or WhereStatement
+
+    :param: data: tuple
+    """
+    await database_executor.runs(updates_database, fields, table, where_statement, data)
+
+
+async def selects_all_at_once(*queries):
+    """
+    Runs several select statements at the same time, and gives back the results in the same order as the queries
+    e.g. favourites, ratings = await selects_all_at_once(("FilmID", "Favourites", where), ("FilmID", "Ratings", where))
+
+    :param: queries: tuple - each one is (fields, table, where_statement)
+
+    :return: TYPE: list - the information from each query
+    """
+    return await gather(*[selects_info_from_database_async(fields, table, where_statement) for fields, table, where_statement in queries])
+
+
+if __name__ == "__main__":
+    pass
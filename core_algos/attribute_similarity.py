@@ -0,0 +1,281 @@
+from argparse import ArgumentParser
+from collections import Counter
+from heapq import nlargest
+from itertools import repeat
+from math import sqrt
+from operator import add, mul, gt
+from os import path, stat
+from random import Random
+from threading import Lock
+from time import perf_counter
+
+# imports from my project
+from core_algos.formulas import pool, configures_pool, selects_info_from_database, mean_and_sd, WhereStatement
+from core_algos.film_similarity import SimilarityIndex, NEIGHBOURS
+
+
+BITS = 16 # the amount of random hyperplanes in each table, a film's bucket in a table is which side of each hyperplane it is on
+TABLES = 32 # the amount of tables, a film only needs to share a bucket with the query in one of them to be a candidate
+MIN_CANDIDATES = 200 # if the buckets have less than this many films, the buckets next to them (1 bit different) are looked in aswell
+SCORED_CANDIDATES = 300 # only the candidates which share a bucket in the most tables are scored exactly
+ATTRIBUTE_CANDIDATES = 100 # the amount of films given by "similar_films" for a recommendation
+SEED = 1 # the hyperplanes are made from this, so the index is the same every time it is built from the same films
+
+# how much each attribute counts towards the similarity, the genres and languages are shared between all of the film's genres and languages
+RUNTIME_WEIGHT = 0.3
+YEAR_WEIGHT = 0.5
+COLOUR_WEIGHT = 0.4
+GENRE_WEIGHT = 1.0
+LANGUAGE_WEIGHT = 0.6
+UNKNOWN_ID = -1
+UNKNOWN_GENRE_ID = 1 # the same unknown ids which are used in gathering_types.py, they are left out the same as an unknown runtime or colour
+UNKNOWN_LANGUAGE_ID = 75
+MONO_ID = 1
+COLOUR_ID = 2
+
+
+def attribute_file_path(database_path: str = None):
+    """
+    The index is kept in a file next to the database, e.g. database/MainDB_attributes.bin
+
+    :param: database_path: str
+
+    :return: TYPE: str
+    """
+    return f"{path.splitext(database_path or pool.path)[0]}_attributes.bin"
+
+
+def film_vectors(films_data: list, language_data: list, genre_data: list):
+    """
+    Turns the attributes of every film (the same ones as FilmAttributesForRecommendation) into a vector with the same length for every film,
+    the runtime and year are how many standard deviations they are from the mean, the colour, genres and languages have one position for each id.
+    Unknown attributes are left out, so 2 films are not similar just because neither of their genres or languages are known.
+    Most of the positions of a vector are 0, so only the positions which are not are kept, and each vector has a length of 1,
+    so the dot product of 2 vectors is their cosine similarity
+
+    :param: films_data: list - of (FilmID, Length, Colour, ReleaseDate)
+
+    :param: language_data: list - of (FilmID, LanguageID)
+
+    :param: genre_data: list - of (FilmID, GenreID)
+
+    :return: vectors: dict - {film_id: [(position, value)]}
+
+    :return: dimensions: int - the length of every vector
+    """
+    language_data = [(film_id, language_id) for film_id, language_id in language_data if language_id != UNKNOWN_LANGUAGE_ID]
+    genre_data = [(film_id, genre_id) for film_id, genre_id in genre_data if genre_id != UNKNOWN_GENRE_ID]
+    languages_of_film, genres_of_film = {}, {}
+    for film_id, language_id in set(language_data):
+        languages_of_film.setdefault(film_id, []).append(language_id)
+    for film_id, genre_id in set(genre_data):
+        genres_of_film.setdefault(film_id, []).append(genre_id)
+    RUNTIME, YEAR, MONO, COLOUR = 0, 1, 2, 3
+    position_of_genre = {genre_id: 4+i for i, genre_id in enumerate(sorted({genre_id for _, genre_id in genre_data}))}
+    position_of_language = {language_id: 4+len(position_of_genre)+i for i, language_id in enumerate(sorted({language_id for _, language_id in language_data}))}
+    runtime_mean, runtime_sd = mean_and_sd([length for _, length, _, _ in films_data if length != UNKNOWN_ID] or [0])
+    year_mean, year_sd = mean_and_sd([int(release_date[:4]) for _, _, _, release_date in films_data] or [0])
+
+    vectors = {}
+    for film_id, length, colour, release_date in films_data:
+        vector = {YEAR: YEAR_WEIGHT*max(min((int(release_date[:4])-year_mean)/(year_sd or 1), 3), -3)/3}
+        # limited to 3 standard deviations, so a few very old films do not count for more than the genres
+        if length != UNKNOWN_ID:
+            vector[RUNTIME] = RUNTIME_WEIGHT*max(min((length-runtime_mean)/(runtime_sd or 1), 3), -3)/3
+        if colour != UNKNOWN_ID:
+            vector[MONO if colour == MONO_ID else COLOUR] = COLOUR_WEIGHT
+        for ids, position_of_id, weight in ((genres_of_film.get(film_id, []), position_of_genre, GENRE_WEIGHT),
+                (languages_of_film.get(film_id, []), position_of_language, LANGUAGE_WEIGHT)):
+            for data_id in ids:
+                vector[position_of_id[data_id]] = weight/sqrt(len(ids))
+        vectors[film_id] = unit_vector(vector)
+    return vectors, 4+len(position_of_genre)+len(position_of_language)
+
+
+def unit_vector(vector: dict):
+    """
+    :param: vector: dict - {position: value}
+
+    :return: TYPE: list - of (position, value), smallest position first, with a length of 1 (or empty if every value was 0)
+    """
+    length = sqrt(sum(value*value for value in vector.values()))
+    return [(position, value/length) for position, value in sorted(vector.items()) if value] if length else []
+
+
+class RandomProjections:
+    """
+    An approximate nearest neighbour search over the film vectors from "film_vectors", using random projection (locality sensitive hashing).
+    Each table has BITS random hyperplanes, a film's bucket is a number where each bit is which side of one hyperplane the film is on,
+    films which point in a similar direction are likely to be on the same side of most of them, so they end up in the same buckets.
+    To find the films most like a vector, the films which share a bucket with it are counted in every table,
+    and only the SCORED_CANDIDATES which share the most buckets are scored exactly, rather than every film in the catalog
+
+    :param: vectors: dict - {film_id: [(position, value)]}, from "film_vectors"
+
+    :param: dimensions: int
+
+    :param: bits: int
+
+    :param: tables: int
+
+    :param: seed: int
+    """
+    def __init__(self, vectors: dict, dimensions: int, bits: int = BITS, tables: int = TABLES, seed: int = SEED):
+        self.vectors = vectors
+        self.bits, self.tables = bits, tables
+        random = Random(seed)
+        self.__hyperplanes_of_position = [[random.gauss(0, 1) for _ in range(bits*tables)] for _ in range(dimensions)]
+        # for each position of the vectors, its value in every hyperplane, so only the positions which are not 0 need to be looked at
+        self.__films_in_bucket = [{} for _ in range(tables)] # for each table {bucket: [film ids in it]}
+        self.__buckets_of_film = {} # kept so the neighbours of a film in the index do not need its buckets to be worked out again
+        for film_id, vector in vectors.items():
+            self.__buckets_of_film[film_id] = buckets = self.buckets_of(vector)
+            for films_in_bucket, bucket in zip(self.__films_in_bucket, buckets):
+                films_in_bucket.setdefault(bucket, []).append(film_id)
+
+
+    def buckets_of(self, vector: list):
+        """
+        :param: vector: list - of (position, value)
+
+        :return: TYPE: list - the bucket of the vector in each table, as bytes where each byte is 1 if it is above the hyperplane
+        """
+        projections = [0.0]*(self.bits*self.tables)
+        for position, value in vector:
+            projections = list(map(add, projections, map(mul, self.__hyperplanes_of_position[position], repeat(value))))
+            # map does all of the adding and multiplying in C rather than in a python loop
+        sides, bits = bytes(map(gt, projections, repeat(0.0))), self.bits
+        return [sides[table*bits: (table+1)*bits] for table in range(self.tables)]
+
+
+    def candidates(self, vector: list, film_id: int = None):
+        """
+        The films which share a bucket with the vector in the most tables, if there are not enough films in its buckets then
+        the films in the buckets which are 1 bit different are counted aswell
+
+        :param: vector: list - of (position, value)
+
+        :param: film_id: int - if the vector is a film in the index, so its buckets have already been worked out
+
+        :return: TYPE: list - the film ids
+        """
+        buckets = self.__buckets_of_film.get(film_id) or self.buckets_of(vector)
+        shared_buckets = Counter()
+        for films_in_bucket, bucket in zip(self.__films_in_bucket, buckets):
+            shared_buckets.update(films_in_bucket.get(bucket, ())) # counting a list is done in C
+        if len(shared_buckets) < MIN_CANDIDATES:
+            for films_in_bucket, bucket in zip(self.__films_in_bucket, buckets):
+                for bit in range(self.bits):
+                    shared_buckets.update(films_in_bucket.get(bucket[:bit] + bytes([1-bucket[bit]]) + bucket[bit+1:], ()))
+        return [candidate for candidate, _ in shared_buckets.most_common(SCORED_CANDIDATES)]
+
+
+    def nearest(self, vector: list, amount: int, ignored: set = frozenset(), film_ids = None, film_id: int = None):
+        """
+        :param: vector: list - of (position, value)
+
+        :param: amount: int
+
+        :param: ignored: set - film ids which are never in the results
+
+        :param: film_ids: iterable - the films to score, if None then only the candidates from the buckets are scored
+
+        :param: film_id: int - if the vector is a film in the index
+
+        :return: TYPE: list - of (film_id, cosine similarity), most similar first
+        """
+        if not vector:
+            return []
+        get_value, vectors = dict(vector).get, self.vectors # looked up once rather than every time in the loop
+        scores = ((other_id, sum(get_value(position, 0.0)*value for position, value in vectors[other_id]))
+            for other_id in (self.candidates(vector, film_id) if film_ids is None else film_ids) if other_id not in ignored)
+        return nlargest(amount, scores, key= lambda item: (item[1], -item[0]))
+
+
+def builds_attribute_index():
+    """
+    Reads the attributes of every film, with 3 queries, finds the NEIGHBOURS most similar films of every film with the random projections,
+    and saves them next to the database as a SimilarityIndex, so the similar films for a user are found from the saved neighbours
+    in the same way as "film_similarity.similarity_index" without working anything out.
+    It only needs to be built again when films are added or changed
+
+    :return: TYPE: dict - how many films were added and how long it took
+    """
+    start_time = perf_counter()
+    vectors, dimensions = film_vectors(selects_info_from_database("FilmID, Length, Colour, ReleaseDate", "Films", WhereStatement().order_by("FilmID")),
+        selects_info_from_database("FilmID, LanguageID", "LanguageToFilm", WhereStatement()),
+        selects_info_from_database("FilmID, GenreID", "GenreToFilm", WhereStatement()))
+    projections = RandomProjections(vectors, dimensions)
+    SimilarityIndex.from_neighbours({film_id: projections.nearest(vector, NEIGHBOURS, {film_id}, film_id= film_id) for film_id, vector in vectors.items()}
+        ).saves(attribute_file_path())
+    return {"films": len(vectors), "dimensions": dimensions, "seconds": perf_counter()-start_time}
+
+
+index_lock = Lock()
+index_state = {"index": None, "file": None, "modified": None}
+
+
+def attribute_index():
+    """
+    The index shared by the whole process, it is read again whenever the file has been rebuilt
+
+    :return: TYPE: SimilarityIndex
+    """
+    file_path = attribute_file_path()
+    try:
+        modified = stat(file_path).st_mtime_ns
+    except FileNotFoundError:
+        modified = None
+    with index_lock:
+        if index_state["index"] is None or index_state["file"] != file_path or index_state["modified"] != modified:
+            index_state.update(index= SimilarityIndex.loads(file_path), file= file_path, modified= modified)
+        return index_state["index"]
+
+
+def benchmarks_attribute_index(films: int = 200, repeats: int = 1000, seed: int = 1):
+    """
+    Checks how many of each film's real nearest films (from scoring every film) the random projections found, for a sample of films,
+    then times finding the similar films for a user from the saved index
+
+    :param: films: int
+
+    :param: repeats: int
+
+    :param: seed: int
+    """
+    index = attribute_index()
+    if not index.film_ids:
+        print("The index is empty, run this module to build it first")
+        return
+    vectors, dimensions = film_vectors(selects_info_from_database("FilmID, Length, Colour, ReleaseDate", "Films", WhereStatement().order_by("FilmID")),
+        selects_info_from_database("FilmID, LanguageID", "LanguageToFilm", WhereStatement()),
+        selects_info_from_database("FilmID, GenreID", "GenreToFilm", WhereStatement()))
+    projections = RandomProjections(vectors, dimensions)
+    random = Random(seed)
+    sample = random.sample(sorted(vectors), min(films, len(vectors)))
+    found = exact = 0
+    for film_id in sample:
+        nearest = projections.nearest(vectors[film_id], NEIGHBOURS, {film_id}, vectors)
+        if nearest:
+            # films with the same score as the last of the real nearest films could have been picked instead of it, so they count aswell
+            found += len([score for _, score in index.neighbours(film_id) if score >= nearest[-1][1] - 1e-6])
+            exact += len(nearest)
+    print(f"recall of the {NEIGHBOURS} nearest films: {found/exact:.1%}")
+    for size in (1, 20, 200):
+        film_ids = sample[:size]
+        start = perf_counter()
+        for _ in range(repeats):
+            index.similar_films(film_ids, ATTRIBUTE_CANDIDATES)
+        print(f"similar films for a user with {size} films: {(perf_counter()-start)/repeats*1000:.4f}ms")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description= "Turns every film's attributes into a vector, and saves an index to find the films with the closest vectors")
+    parser.add_argument("--database", default= pool.path, help= "the path of the database")
+    parser.add_argument("--benchmark", action= "store_true", help= "times the lookups afterwards")
+    arguments = parser.parse_args()
+
+    configures_pool(arguments.database)
+    print(builds_attribute_index())
+    if arguments.benchmark:
+        benchmarks_attribute_index()
@@ -0,0 +1,203 @@
+from multiprocessing import get_context
+from argparse import ArgumentParser
+from os import cpu_count
+from time import perf_counter, time
+import logging
+
+# imports from my project
+from core_algos.formulas import pool, configures_pool, selects_info_from_database, transaction, WhereStatement
+from core_algos.calc_recommendations import RecommendedFilms
+from core_algos.recommendation_cache import profile_fingerprint
+
+
+BATCH_WORKERS = cpu_count() or 1 # the amount of processes which make recommendations at the same time
+CHUNK_SIZE = 50 # the amount of users each process is given at a time, the recommendations for a chunk are saved together
+CHECKPOINT_TABLE = "RecommendationCheckpoints"
+CREATE_CHECKPOINT_TABLE = f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (UserID INTEGER PRIMARY KEY, Signature TEXT, RunID INTEGER)"
+# the run which last made each user's recommendations, and what their favourites and ratings were at the time
+
+batch_log = logging.getLogger("films.batch_recommendations")
+
+
+def creates_checkpoint_table():
+    """
+    Creates the table for the checkpoints if it does not exist yet
+    """
+    with pool.connection() as db:
+        db.execute(CREATE_CHECKPOINT_TABLE)
+        db.commit()
+
+
+def users_signatures():
+    """
+    A signature for every user who has favourited or rated a film, which changes when they favourite, unfavourite or rate a film.
+    It is the same digest as "profile_fingerprint" of all of their favourites and ratings, which is read for all of the users in 2 queries
+
+    :return: TYPE: dict - {user_id: signature}
+    """
+    favourites, ratings = {}, {}
+    for user_id, film_id in selects_info_from_database("UserID, FilmID", "Favourites", WhereStatement()):
+        favourites.setdefault(user_id, []).append((film_id,))
+    for user_id, *rating in selects_info_from_database("UserID, FilmID, Overall, Actors, Quality", "Ratings", WhereStatement()):
+        ratings.setdefault(user_id, []).append(tuple(rating))
+    return {user_id: profile_fingerprint(favourites.get(user_id, []), ratings.get(user_id, [])) for user_id in favourites.keys() | ratings.keys()}
+
+
+def users_to_recommend(changed_only: bool = False, resumed_run_id: int = None):
+    """
+    Finds the users whose recommendations are going to be made
+
+    :param: changed_only: bool - only users who have favourited, unfavourited or rated a film since their last recommendations from a batch
+
+    :param: resumed_run_id: int - the run which is being carried on with, the users which it has already done are skipped
+
+    :return: TYPE: list - of (user_id, signature)
+    """
+    signatures = users_signatures()
+    checkpoints = {user_id: (signature, run_id) for user_id, signature, run_id in selects_info_from_database("UserID, Signature, RunID", CHECKPOINT_TABLE, WhereStatement())}
+    users = []
+    for user_id, signature in sorted(signatures.items()):
+        old_signature, run_id = checkpoints.get(user_id, (None, None))
+        if resumed_run_id is not None and run_id == resumed_run_id:
+            continue # already done by the run which stopped part way through
+        if changed_only and old_signature == signature:
+            continue # nothing has changed since their last recommendations
+        users += [(user_id, signature)]
+    return users
+
+
+def starts_worker(database_path: str, timeout: int, pragmas: dict):
+    """
+    Run once in each process when it starts, so every process has its own connections to the database
+
+    :param: database_path: str
+
+    :param: timeout: int
+
+    :param: pragmas: dict
+    """
+    configures_pool(database_path, 1, timeout, pragmas)
+
+
+def recommends_for_users(users: list):
+    """
+    Run in a worker process, makes the recommendations for a chunk of users together without saving them,
+    if that fails then they are made one at a time, and a user whose recommendation fails is left out so that they are tried again on the next run
+
+    :param: users: list - of (user_id, signature)
+
+    :return: done: list - of (user_id, signature) which did not fail
+
+    :return: created: list - the user ids which have new recommendations
+
+    :return: rows: list - of (FilmID, UserID, Liked) for every user in created
+
+    :return: failed: list - of (user_id, error)
+    """
+    done, created, rows, failed = [], [], [], []
+    try:
+        recommendations = RecommendedFilms.for_users([user_id for user_id, _ in users], saves_to_database= False)
+    except Exception:
+        recommendations = None # one of the users failed, so they are made one at a time to find which one
+    if recommendations is not None:
+        for user_id, signature in users:
+            done += [(user_id, signature)]
+            if recommendations[user_id].recommendation_created:
+                created += [user_id]
+                rows += recommendations[user_id].recommendation_rows
+        return done, created, rows, failed
+    for user_id, signature in users:
+        try:
+            recommendation = RecommendedFilms(user_id, saves_to_database= False)
+        except Exception as error:
+            failed += [(user_id, repr(error))]
+            continue
+        done += [(user_id, signature)]
+        if recommendation.recommendation_created:
+            created += [user_id]
+            rows += recommendation.recommendation_rows
+    return done, created, rows, failed
+
+
+def saves_chunk(run_id: int, done: list, created: list, rows: list):
+    """
+    Replaces the recommendations of the users in created and marks every user in done as done by this run, in one transaction,
+    so a run which is stopped never has saved the recommendations without the checkpoint or the other way round
+
+    :param: run_id: int
+
+    :param: done: list
+
+    :param: created: list
+
+    :param: rows: list
+    """
+    with transaction() as unit:
+        if created:
+            unit.deletes("Recommendations", WhereStatement().is_in("UserID", created))
+            unit.inserts("(FilmID, UserID, Liked)", "Recommendations", rows)
+        if done:
+            unit.deletes(CHECKPOINT_TABLE, WhereStatement().is_in("UserID", [user_id for user_id, _ in done]))
+            unit.inserts("(UserID, Signature, RunID)", CHECKPOINT_TABLE, [(user_id, signature, run_id) for user_id, signature in done])
+
+
+def runs_batch(workers: int = BATCH_WORKERS, changed_only: bool = False, resumed_run_id: int = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Makes the recommendations for every user (or only the ones which have changed), with the users split into chunks between a pool of processes.
+    Each chunk is saved as soon as it is finished, along with a checkpoint, so if the run is stopped it can be carried on with "resumed_run_id"
+
+    :param: workers: int
+
+    :param: changed_only: bool
+
+    :param: resumed_run_id: int
+
+    :param: chunk_size: int
+
+    :return: TYPE: dict - the metrics for the run
+    """
+    creates_checkpoint_table()
+    run_id = resumed_run_id if resumed_run_id is not None else int(time())
+    users = users_to_recommend(changed_only, resumed_run_id)
+    chunks = [users[i: i+chunk_size] for i in range(0, len(users), chunk_size)]
+    metrics = {"run_id": run_id, "users": len(users), "done": 0, "created": 0, "rows": 0, "failed": 0, "seconds": 0.0, "users_per_second": 0.0}
+    batch_log.info("run %s: %s users in %s chunks with %s workers", run_id, len(users), len(chunks), workers)
+    if not chunks:
+        return metrics
+
+    start_time = perf_counter()
+    with get_context("spawn").Pool(workers, initializer= starts_worker, initargs= (pool.path, pool.timeout, pool.pragmas)) as process_pool:
+        # spawn so that no process is given a copy of the connections which are already open
+        for done, created, rows, failed in process_pool.imap_unordered(recommends_for_users, chunks):
+            saves_chunk(run_id, done, created, rows)
+            metrics["done"] += len(done)
+            metrics["created"] += len(created)
+            metrics["rows"] += len(rows)
+            metrics["failed"] += len(failed)
+            for user_id, error in failed:
+                batch_log.warning("run %s: user %s failed: %s", run_id, user_id, error)
+
+            seconds = perf_counter()-start_time
+            finished = metrics["done"] + metrics["failed"]
+            users_per_second = finished/seconds if seconds else 0.0
+            batch_log.info("run %s: %s/%s users (%.1f%%), %.1f users/s, %.0fs left", run_id, finished, len(users), 100*finished/len(users),
+                users_per_second, (len(users)-finished)/users_per_second if users_per_second else 0.0)
+
+    metrics["seconds"] = perf_counter()-start_time
+    metrics["users_per_second"] = (metrics["done"] + metrics["failed"])/metrics["seconds"] if metrics["seconds"] else 0.0
+    batch_log.info("run %s finished: %s", run_id, metrics)
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description= "Makes the recommendations for all of the users at once, e.g. every night")
+    parser.add_argument("--workers", type= int, default= BATCH_WORKERS, help= "the amount of processes to use")
+    parser.add_argument("--changed-only", action= "store_true", help= "only users who have favourited or rated films since their last batch")
+    parser.add_argument("--resume", type= int, default= None, metavar= "RUN_ID", help= "carries on with a run which was stopped")
+    parser.add_argument("--chunk-size", type= int, default= CHUNK_SIZE, help= "the amount of users given to a process at a time")
+    parser.add_argument("--database", default= pool.path, help= "the path of the database")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level= logging.INFO, format= "%(asctime)s %(message)s")
+    configures_pool(arguments.database)
+    runs_batch(arguments.workers, arguments.changed_only, arguments.resume, arguments.chunk_size)
@@ -1,33 +1,122 @@
-from random import choices
+from collections import Counter
+from heapq import nlargest
 
 # imports from my project
-from core_algos.formulas import inserts_info_to_database, selects_info_from_database, deletes_from_database
-from core_algos.gathering_types import groupings, language, colour, runtime, release_date, directors, actors, genres
-from searching.format_film_dict import FilmAttributesForRecommendation
+from core_algos.formulas import selects_info_from_database, transaction, WhereStatement
+from core_algos.gathering_types import language, colour, runtime, release_date, directors, actors, genres
+from core_algos.film_catalog import film_catalog
+from core_algos.people_index import people_index
+from core_algos.film_similarity import similarity_index
+from core_algos.attribute_similarity import attribute_index, ATTRIBUTE_CANDIDATES
+from core_algos.recommendation_cache import recommendation_cache, profile_fingerprint
+from core_algos.pipeline_trace import PipelineTrace, NO_TRACE
+from core_algos.taste_profiles import loads_taste_profile
+
+
+TRACES_RECOMMENDATIONS = False # if every recommendation records and logs how long each stage took, can be turned on for one with traces=True
 
 
 class RecommendedFilms:
     """
     Gathers all of the users favourited and rated films from the database
     Checks to see if the user has enough films to make a good recommendation (atleast 5)
-    If they do then it will gather all films which the wanted actors and directors have been in if there are atleast 20 films from these 2, then it will
-    Filter down (a random set of 100 films from the actors and directors)
-    all of the films from the actors and directors in the following chategories runtime, release date, language, colour of the film and the genres.
+    If they do then it will gather all films which the wanted actors and directors have been in, the films other users most often favourite and rate along with the user's films,
+    and the films with the closest attributes to the user's films, if there are atleast 20 films from these 4, then it will
+    Filter down all of the films from the actors and directors in the following chategories runtime, release date, language, colour of the film and the genres.
     If there are more than 10 filtered recommendations then they are added to the database.
     
     :param: user_id: int
+
+    :param: saves_to_database: bool - if False the rows are only kept in "recommendation_rows", so they can be added to the database in bulk (e.g. by batch_recommendations.py)
+
+    :param: traces: bool - if True the time, queries and amount of films of each stage are recorded in "trace" and logged, see pipeline_trace.py
     """
-    def __init__(self, user_id: int):
+    def __init__(self, user_id: int, saves_to_database: bool = True, traces: bool = TRACES_RECOMMENDATIONS):
         """
         Calls all the functions, and creates the attributes
         """
+        self.__setting_up(user_id, saves_to_database, PipelineTrace("recommendation", user_id= user_id) if traces else NO_TRACE)
+        with self.trace.runs():
+            self.__making_recommendation()
+
+
+    @classmethod
+    def for_users(cls, user_ids: list, saves_to_database: bool = True, traces: bool = TRACES_RECOMMENDATIONS):
+        """
+        Makes the recommendations for several users together, e.g. for a backfill, giving the same recommendations as making them one at a time.
+        The favourites and ratings of all of the users are selected at once, the catalog is looked up once for all of their candidates,
+        then each user's films are filtered with the same catalog, and every user's new recommendations are added to the database in one transaction,
+        they are only kept in the cache after it has been committed
+
+        :param: user_ids: list
+
+        :param: saves_to_database: bool - if False the rows are only kept in each "recommendation_rows"
+
+        :param: traces: bool - if True one trace is recorded for the whole batch, each stage adds up the time of every user
+
+        :return: recommendations: dict - {user_id: RecommendedFilms}, in the same order as user_ids
+        """
+        user_ids = list(dict.fromkeys(user_ids)) # removes duplicates, keeping the order
+        trace = PipelineTrace("recommendation_batch", users= len(user_ids)) if traces else NO_TRACE
+        recommendations = {}
+        with trace.runs():
+            with trace.stage("batch_gathering"):
+                films_of_users = gathers_films_of_users(user_ids)
+            candidates_of_users = {} # {user_id: the film ids gathered to recommend}, for the users who were not cached and had enough films
+            for user_id in user_ids:
+                recommendation = cls.__new__(cls)
+                recommendation.__setting_up(user_id, False, trace) # the rows are added for all of the users at the end
+                recommendations[user_id] = recommendation
+                if recommendation.__preparing_recommendation(films_of_users[user_id]):
+                    candidates_of_users[user_id] = recommendation.__gathering_candidates()
+
+            with trace.stage("batch_catalog"):
+                catalog = film_catalog(list(set().union(*candidates_of_users.values())))
+                # only looked up once, if any of the films are new then it is read again for all of the users rather than for each one
+            for user_id, ids_gathered in candidates_of_users.items():
+                recommendations[user_id].__finishing_recommendation(ids_gathered, catalog)
+
+            created = [recommendation for recommendation in recommendations.values() if recommendation.recommendation_created and not recommendation.from_cache]
+            if saves_to_database:
+                if created:
+                    with trace.stage("saving"):
+                        replaces_recommendations([recommendation.user_id for recommendation in created],
+                            [row for recommendation in created for row in recommendation.recommendation_rows])
+                for recommendation in recommendations.values():
+                    if not recommendation.from_cache:
+                        recommendation.__keeping_in_cache()
+                        # only once the transaction has committed, if it fails then none of the users are cached,
+                        # so making them again one at a time does not take a recommendation which was never saved from the cache
+        return recommendations
+
+
+    def __setting_up(self, user_id: int, saves_to_database: bool, trace):
+        """
+        Creates the attributes, split from __init__ so "for_users" can create them without making the recommendation straight away
+
+        :param: user_id: int
+
+        :param: saves_to_database: bool
+
+        :param: trace: PipelineTrace or NoTrace
+        """
         self.recommendation_created = False # Sees if a recommendation is created or not and if there is enough information to make a good recommendation
         self.user_id = user_id
+        self.saves_to_database = saves_to_database
+        self.recommendation_rows = [] # the (FilmID, UserID, Liked) rows for the Recommendations table, once they have been made
+        self.fingerprint = None # of the user's favourites and ratings, the recommendation is cached with it
+        self.from_cache = False # if the recommendation was the same as the last one, since nothing has been favourited or rated
+        self.trace = trace
         self.__favourited_rated_films = []
-        self.__film_attributes = []
+        self.__profile = None # PersistedUserProfile for the favourited and rated films, once they have been gathered
+        self.__catalog = None # the FilmCatalog which the films are filtered with
+        self.__candidates = 0 # the bitset of the films gathered to recommend, from the catalog
         self.__film_ids_gathered_to_recommend = []
         self.__film_ids_from_directors = []
         self.__film_ids_from_actors = []
+        self.__film_ids_from_similar_films = [] # films which other users have favourited and rated along with this user's films
+        self.__film_ids_from_similar_attributes = [] # films with the closest runtime, year, colour, languages and genres to the user's films
+        self.__shared_people = Counter() # {film_id: the amount of wanted actors and directors in the film}, used to score the films
         self.__not_wanted = [] # from filtering down the films the ids of the films which are not wanted
         self.__mono = [] # the ids of the films which are in monochrome
 
@@ -38,128 +127,149 @@ class RecommendedFilms:
         # if the film id appears in more than one of these lists, then the priority order from the one which have the highest importance is
         # __first_weighting, __not_wanted, __mono, __second_weighting, __third_weighting, __favourited_rated_films
 
-        # data to insert for each weighting
-        self.__data_to_insert_for_first = []
-        self.__data_to_insert_for_second = []
-        self.__data_to_insert_for_third = []
-        self.__data_to_insert_for_mono = []
-        
-        self.__gathering_films_from_database() # is run to get all of the favourited and rated films
+
+    def __making_recommendation(self):
+        """
+        Runs every stage, or uses the last recommendation if nothing has been favourited or rated since
+        """
+        if self.__preparing_recommendation():
+            self.__finishing_recommendation(self.__gathering_candidates())
+
+
+    def __preparing_recommendation(self, films_gathered: tuple = None):
+        """
+        Gathers the user's films and checks the cache, then reads their profile if they have enough films to make a recommendation
+
+        :param: films_gathered: tuple - (favourited, rated) if they have already been selected, e.g. by "for_users"
+
+        :return: TYPE: bool - False if there is nothing more to do, since it was cached or there are not enough films
+        """
+        with self.trace.stage("gathering"):
+            self.__gathering_films_from_database(films_gathered) # is run to get all of the favourited and rated films
+        self.trace.counts("gathering", films= len(self.__favourited_rated_films))
+        with self.trace.stage("cache"):
+            cached = recommendation_cache.gets(self.user_id, self.fingerprint)
+        if cached is not None:
+            self.recommendation_created, self.recommendation_rows = cached
+            self.from_cache = True
+            self.trace.counts("cache", hit= True)
+            # the user has not favourited or rated anything since the last recommendation, so it is already in the database
+            return False
         if len(self.__favourited_rated_films) >= 5: # the has a good amount of films rated or favourited to find a good recommendation
-            self.recommendation_created = self.__gathering_and_filtering_film_ids()
-        else:
-            self.recommendation_created = False
+            with self.trace.stage("profile"):
+                self.__profile = loads_taste_profile(self.user_id, self.__favourited_rated_films)
+                # shared by all of the functions from gathering_types, it is kept up to date as the user favourites and rates films,
+                # so the user's films do not need to be selected again to make a recommendation
+            return True
+        self.recommendation_created = False
+        if self.saves_to_database:
+            self.__keeping_in_cache() # nothing is written to the database when there are not enough films
+        return False
+
+
+    def __finishing_recommendation(self, ids_gathered: list, catalog = None):
+        """
+        Filters the films gathered, and if the rows are saved to the database then keeps the recommendation in the cache
+
+        :param: ids_gathered: list - from "__gathering_candidates"
+
+        :param: catalog: FilmCatalog - if it has already been looked up, e.g. by "for_users"
+        """
+        self.recommendation_created = self.__filtering_candidates(ids_gathered, catalog)
+        if self.saves_to_database:
+            self.__keeping_in_cache() # only reached once "__filtering_candidates" has committed the rows, if saving them fails it raises first
+
+
+    def __keeping_in_cache(self):
+        """
+        Keeps the recommendation in the cache, which is only done once it is in the database,
+        since a recommendation from the cache is not added to the database again
+        """
+        recommendation_cache.keeps(self.user_id, self.fingerprint, self.recommendation_created, self.recommendation_rows)
 
 
-    def __gathering_films_from_database(self):
+    def __gathering_films_from_database(self, films_gathered: tuple = None):
         """
         Gathers all of the film ids from the database what are going to be used to create a good set recommendations
+
+        :param: films_gathered: tuple - (favourited, rated) if they have already been selected, otherwise they are selected for this user
         """
-        FIELD = "FilmID"
-        where = f"UserID = {self.user_id}"
-        favourited = selects_info_from_database(FIELD, "Favourites", where)
-        rated = selects_info_from_database(FIELD, "Ratings", where)
+        if films_gathered is None:
+            where = WhereStatement().equals("UserID", self.user_id)
+            favourited = selects_info_from_database("FilmID", "Favourites", where)
+            rated = selects_info_from_database("FilmID, Overall, Actors, Quality", "Ratings", where) # the ratings are only needed for the fingerprint
+        else:
+            favourited, rated = films_gathered
         self.__favourited_rated_films = list({i[0] for i in favourited+rated}) # removes duplicates if the film is rated and also favourited
+        self.fingerprint = profile_fingerprint(favourited, rated)
 
 
-    def __gathering_and_filtering_film_ids(self):
+    def __gathering_candidates(self):
+        """
+        Gathers all of the films which the actors wanted and directors wanted have acted in and directed, and the films similar to the user's films (by who favourites them and by their attributes).
+        Checks to make sure that there are enough film ids to generate a decent recommendation
+
+        :return: ids_gathered: list - empty if there are less than 20, so that the user knows to favourite or rate more films
+        """
+        self.__film_ids_from_director_function()
+        self.__film_ids_from_actor_function()
+        with self.trace.stage("similar_candidates"):
+            self.__film_ids_from_similar_films = similarity_index().similar_films(self.__favourited_rated_films)
+            # from the similarity index which is built by film_similarity.py, so it does not need any queries
+        self.trace.counts("similar_candidates", films= len(self.__film_ids_from_similar_films))
+        with self.trace.stage("attribute_candidates"):
+            self.__film_ids_from_similar_attributes = attribute_index().similar_films(self.__favourited_rated_films, ATTRIBUTE_CANDIDATES)
+            # from the index which is built by attribute_similarity.py, the neighbours of every film were found when it was built
+        self.trace.counts("attribute_candidates", films= len(self.__film_ids_from_similar_attributes))
+
+        ids_gathered  = list(set(self.__film_ids_from_directors + self.__film_ids_from_actors + self.__film_ids_from_similar_films
+            + self.__film_ids_from_similar_attributes))
+        # removes duplicate films if they are in more than one list
+        return ids_gathered if len(ids_gathered) >= 20 else [] # making sure there are enough films to try and filter down
+
+
+    def __filtering_candidates(self, ids_gathered: list, catalog = None):
         """
-        Gathers all of the films which the actors wanted and directors wanted have acted in and directed.
-        Checks to make sure that there are enough film ids to generate a decent recommendation, if there is not will return False, so that the user knows to favourite or rate more films
         If there are enough films, then it will use all of the film ids from the actors and the directors to create a recommendation, by first;
-        gathering all attributes for each film and creating this as a list of objects. Comparing each value of each film and filtering it down. 
+        finding the films in the catalog of film attributes. Comparing each value of all of the films at once and filtering it down. 
         Putting higher influenced films in a different chategory so that they are favoured when adding the 30 films to the database
         Once all of this has been done the information is gathered together and is added to the database.
+
+        :param: ids_gathered: list - from "__gathering_candidates"
+
+        :param: catalog: FilmCatalog - if None then it is looked up for these films
 		
 		:return: True or False: bool - depends on if a recommendation is created or not
         """
-        self.__film_ids_from_director_function()
-        self.__film_ids_from_actor_function()
-
-        ids_gathered  = list(set(self.__film_ids_from_directors + self.__film_ids_from_actors)) # removes duplicate films if they are in both lists
-        if len(ids_gathered) >= 20: # making sure there are enough films to try and filter down
-            self.__film_ids_gathered_to_recommend = ids_gathered[:100]
-            # If looking at too many films in depth then the algorithm will be slow, so only allowing 100 films to try and filter down
-            # The list is not in order so taking the index of the first 100 items, will mean it is not biased towards any film.
-            where = f"FilmID IN {'('+str(self.__film_ids_gathered_to_recommend)[1:-1]+')'}"
-            data_for_length_colour_release_date = selects_info_from_database("FilmID, Length, Colour, ReleaseDate", "Films", where)
-            data_for_language = selects_info_from_database("FilmID, LanguageID", "LanguageToFilm", where) # with this it will have multiple elements for that film id, since different languages
-            data_for_genres = selects_info_from_database("FilmID, GenreID", "GenreToFilm", where)
-            grouped_languages = groupings(data_for_language)
-            grouped_genres = groupings(data_for_genres)
-            self.__film_attributes = [FilmAttributesForRecommendation(
-                film_id, runtime_val, colour_val, release_date_val, grouped_languages[film_id], grouped_genres[film_id])
-                for film_id, runtime_val, colour_val, release_date_val in data_for_length_colour_release_date] # creates a list of objects
+        if ids_gathered:
+            self.__film_ids_gathered_to_recommend = ids_gathered
+            # every film is filtered, since the rules are checked for all of the films at once with the bitsets in the catalog,
+            # so there is no need to only look at a slice of them to keep it fast
+            with self.trace.stage("catalog"):
+                self.__catalog = film_catalog(ids_gathered) if catalog is None else catalog
+                self.__candidates = self.__catalog.candidates(ids_gathered) # films which are not in the Films table are not filtered
+            self.trace.counts("catalog", films= len(ids_gathered), in_catalog= self.__candidates.bit_count())
 
             self.__second_weighting += list(set(self.__film_ids_from_directors) & set(self.__film_ids_from_actors))
             # if the films which the directors has directored is shared with the films which actors have been in then will make a list of these,
             # and then they will more likely be favoured by putting them in the second weighting list
 
-            self.__filtering_film_ids_down()
+            with self.trace.stage("attribute_analyses"):
+                analyses = self.__analysing_attributes()
+            with self.trace.stage("filtering"):
+                self.__filtering_film_ids_down(*analyses)
+            self.trace.counts("filtering", not_wanted= len(self.__not_wanted), mono= max(len(self.__mono)-1, 0), first_weighting= len(self.__first_weighting),
+                second_weighting= len(self.__second_weighting), third_weighting= len(self.__third_weighting))
             
-            # removes all duplicates is there are any
-            self.__first_weighting_set = list(set(self.__first_weighting))
-            self.__second_weighting_set = list(set(self.__second_weighting))
-            self.__third_weighting_set = list(set(self.__third_weighting))
-            self.__not_wanted_set = list(set(self.__not_wanted))
-            all_films = self.__first_weighting + self.__not_wanted + self.__mono + self.__second_weighting_set + self.__third_weighting + self.__film_ids_gathered_to_recommend 
             have_too_many_films_been_removed = len(self.__film_ids_gathered_to_recommend) - len(self.__not_wanted)
             if have_too_many_films_been_removed >= 10: # at least 10 films left after the filtering process
-                if len(all_films) == len(set(all_films)):
-                    # This means that there are no films with a higher weighting and any films which are not wanted, and that only the films in self.__film_ids_gathered_to_recommend  are wanted
-                    # Just going to add all of the films to the data base for the "__favourited_rated_films" list  
-                    self.__adding_recommendations_to_db(True)
-                    # when calling the function is_singular is true
-
-                else: # Where val is the FilmID
-                    mono_data_to_add = []
-                    for val in self.__first_weighting_set:
-                        if val in self.__not_wanted_set:
-                            self.__not_wanted_set.remove(val)
-                        if val in self.__mono:
-                            self.__mono.remove(val)
-                        if val in self.__second_weighting_set:
-                            self.__second_weighting_set.remove(val)
-                        if val in self.__third_weighting_set:
-                            self.__third_weighting_set.remove(val)
-                        self.__film_ids_gathered_to_recommend.remove(val)
-                        self.__data_to_insert_for_first +=[(val ,self.user_id , 10)]
-
-                    for val2 in self.__not_wanted_set:
-                        if val2 in self.__mono:
-                            self.__mono.remove(val2)
-                        if val2 in self.__second_weighting_set:
-                            self.__second_weighting_set.remove(val2)
-                        if val2 in self.__third_weighting_set:
-                            self.__third_weighting_set.remove(val2)
-                        self.__film_ids_gathered_to_recommend.remove(val2)
-                    
-                    for val3 in self.__mono[1:]: # Is not looking at the proporition to represent
-                        if val3 in self.__second_weighting_set:
-                            self.__second_weighting_set.remove(val3)
-                        if val3 in self.__third_weighting_set:
-                            self.__third_weighting_set.remove(val3)
-                        self.__film_ids_gathered_to_recommend.remove(val3)
-                        mono_data_to_add +=[(val3, self.user_id, 7)]
-
-                    for val4 in self.__second_weighting_set:
-                        if val4 in self.__third_weighting_set:
-                            self.__third_weighting_set.remove(val4)
-                        self.__film_ids_gathered_to_recommend.remove(val4)
-                        self.__data_to_insert_for_second +=[(val4 ,self.user_id , 9)]
-                    
-                    for val5 in self.__third_weighting_set:
-                        self.__film_ids_gathered_to_recommend.remove(val5)
-                        self.__data_to_insert_for_third +=[(val5 ,self.user_id , 8)]
-
-                    if mono_data_to_add: # there is information to add to the database
-                        self.__data_to_insert_for_mono = mono_data_to_add[:round(self.__mono[0]*30)]
-                        # this is used to represent the proportion, multiplied by 30 since the recommendation will have 30 films
-
-                    # compare each list to each other, therefor 10 combinations to check, since 5 lists and groupings are in 2
-                    # in order of priority, removing the film ids from other lists if they are in a higher weighted list
-                    # __first_weighting_set, __not_wanted_set, __mono, __second_weighting_set, __third_weighting_set, __favourited_rated_films {PRIORITY ORDER}
-                    self.__adding_recommendations_to_db(False)
+                with self.trace.stage("resolving"):
+                    self.recommendation_rows = resolves_recommendation_priorities(self.user_id, self.__first_weighting, self.__not_wanted,
+                        self.__mono, self.__second_weighting, self.__third_weighting, self.__film_ids_gathered_to_recommend, self.__shared_people)
+                self.trace.counts("resolving", recommendations= len(self.recommendation_rows))
+                if self.saves_to_database:
+                    with self.trace.stage("saving"):
+                        self.__adding_recommendations_to_db(self.recommendation_rows)
             else:
                 return False # Not enough information to create a good recommendation
         else:
@@ -167,57 +277,11 @@ class RecommendedFilms:
         return True # Recommendation created
 
 
-    def __adding_recommendations_to_db(self, is_singular: bool):
+    def __adding_recommendations_to_db(self, rows_to_add: list):
         """
-        Adds the top 30 highest weighted films, is done randomly in the sense that the lists are not in any particular order, and is just selecting the first 30 from the lists
-        If none of the films have a speicifc weighting then will just add the first 30 of the "self.__film_ids_gathered_to_recommend" list to the database
-        This is the order of priority --- self.__first_weighting, self.__mono, self.__second_weighting, self.__third_weighting
-        for self.__mono, it will be added to the database, but when the user is viewing the films it will try and only select a third in each segment of 10 (using integer division).
-        
-        :param: is_singular: bool
+        :param: rows_to_add: list - of (FilmID, UserID, Liked), from "resolves_recommendation_priorities"
         """
-        TABLE = "Recommendations"
-        FIELDS = "(FilmID, UserID, Liked)"
-        deletes_from_database(TABLE, f"UserID = {self.user_id}")
-        # deletes the old recommendations, so that there are not duplicates when the new ones are added if the same film is recommended twice ones to add new ones
-
-        if not is_singular:
-            amount_added_so_far = 0 # the amount of films which have been added to the database from far from the recommended ones
-            # need to make sure that it limits to the amount in the database to 30
-            # after adding the first 3 weighting ones, if it isnt 30 get more to make it 30 from the __favourited_rated_films
-            if self.__data_to_insert_for_first:  # there are values for this list
-                inserts_info_to_database(FIELDS, TABLE, self.__data_to_insert_for_first[:30-amount_added_so_far]) # adds 30 to the database if there is 30
-                amount_added_so_far += len(self.__data_to_insert_for_first)
-            if self.__data_to_insert_for_mono:
-                inserts_info_to_database(FIELDS, TABLE, self.__data_to_insert_for_mono)
-                amount_added_so_far +=len(self.__data_to_insert_for_mono)
-            if self.__data_to_insert_for_second and amount_added_so_far < 30:
-                inserts_info_to_database(FIELDS, TABLE, self.__data_to_insert_for_second[:30-amount_added_so_far])
-                amount_added_so_far += len(self.__data_to_insert_for_second)
-            if self.__data_to_insert_for_third and amount_added_so_far < 30:
-                inserts_info_to_database(FIELDS, TABLE, self.__data_to_insert_for_third[:30-amount_added_so_far])
-                amount_added_so_far += len(self.__data_to_insert_for_third)
-
-            if amount_added_so_far <30:
-                remainder_to_add = []
-                if len(self.__film_ids_gathered_to_recommend) >= 30-amount_added_so_far:
-                    loop_size = 30-amount_added_so_far
-                else:
-                    loop_size = len(self.__film_ids_gathered_to_recommend)
-
-                for i in range(loop_size):
-                    # if there isn't 30 to add to the database will make it so that the remainder is made up of "self.__film_ids_gathered_to_recommend" films
-                    remainder_to_add += [(self.__film_ids_gathered_to_recommend[i], self.user_id, 0)]
-
-                inserts_info_to_database(FIELDS, TABLE, remainder_to_add)
-        else: # only has films in the __film_ids_gathered_to_recommend function
-            if len(self.__film_ids_gathered_to_recommend) >= 30:
-                loop_size = 30-amount_added_so_far
-            else:
-                loop_size = len(self.__film_ids_gathered_to_recommend)
-
-            to_add = [(self.__film_ids_gathered_to_recommend[i], self.user_id, 0) for i in range(loop_size)]
-            inserts_info_to_database(FIELDS, TABLE, to_add)
+        replaces_recommendations([self.user_id], rows_to_add)
 
 
     def __film_ids_from_director_function(self):
@@ -226,27 +290,23 @@ class RecommendedFilms:
         The function is called and the film ids are assigned to the __film_ids_from_directors list,
         this is done so that threading can be used in the main class to speed up the data processing speed, so tasks can be preformed simultaneously
         """
-        directors_wanted, directors_not_wanted = directors(self.__favourited_rated_films)
+        with self.trace.stage("directors_analysis"):
+            directors_wanted, directors_not_wanted = directors(self.__favourited_rated_films, self.__profile)
         
         if not directors_wanted and not directors_not_wanted:
             # no specific information given about either
             return # stops the function continuing
 
-        wanted = "("+str(directors_wanted)[1:-1] + ")"
-        not_wanted = "("+str(directors_not_wanted)[1:-1] + ")"
-        # turned both the wanted and not wanted director ids into a string so that they can work in the sql statement
-        where = f"DirectorID IN {wanted} AND FilmID NOT IN (SELECT FilmID FROM DirectorIntegrator WHERE DirectorID IN {not_wanted}) AND FilmID NOT IN {tuple(self.__favourited_rated_films)}"
-        # doesn't select films which are already rated or favourited by the user since the user already has an opinion on them
-        # only selects the films which those directors specified are in, so will not select any films where the directors are unknown.
-        data = selects_info_from_database("FilmID, DirectorID", "DirectorIntegrator", where)
-        self.__film_ids_from_directors = list(set([i[0] for i in data]))
-        # where the first index of i is the index of the film, and turned into a set so that duplicated film ids are not in there
-        # since some directors may work on the same film and appear in there twice
-
-        # the double select statement above (where variable) is used so that the films that have directors which are not wanted are removed
-        # using a singulal select statement then "AND DirectorID NOT IN (not_wanted)" would result in that film id still being in the results
-        # its better to do it this way then to gather it from the database then remove the ones which are not wanted in python.
-        # as doing so it will result in more memory overflow issues. since that data is not needed
+        with self.trace.stage("director_candidates"):
+            index = people_index("Director")
+            self.__film_ids_from_directors = list(index.films_of_any(directors_wanted) - index.films_of_any(directors_not_wanted)
+                - set(self.__favourited_rated_films))
+            films = set(self.__film_ids_from_directors)
+            self.__shared_people.update(film_id for director_id in set(directors_wanted) for film_id in index.films_of(director_id) if film_id in films)
+        self.trace.counts("director_candidates", films= len(self.__film_ids_from_directors))
+        # only the films which those directors specified are in, so will not have any films where the directors are unknown,
+        # the films with a director which is not wanted are removed even if they also have a director which is wanted,
+        # and doesn't have films which are already rated or favourited by the user since the user already has an opinion on them
 
 
     def __film_ids_from_actor_function(self):
@@ -255,37 +315,48 @@ class RecommendedFilms:
         It groups together all of the films where it has multiple actors from the ones which are wanted
         (the only actor ids which are selected are the ones which were from the "actors" function)
         It adds all of the film ids where it has 2 or more actors (from the selected actors from the function) to the "__film_ids_from_actors" list.
-        If there is not 100 films already in the list, then it will randomly select films where it only has 1 actor using the random.choice method
-        Until the length of the list is equal to 100
+        If there is not 100 films already in the list, then all of the films where it only has 1 actor are added aswell,
+        they are scored lower than the films with more actors in common when the recommendation is picked, so there is no need to randomly pick some of them
         """
-        actors_wanted, actors_not_wanted = actors(self.__favourited_rated_films)
+        with self.trace.stage("actors_analysis"):
+            actors_wanted, actors_not_wanted = actors(self.__favourited_rated_films, self.__profile)
         if not actors_wanted and not actors_not_wanted:
             return # empty list since there are none
         
-        wanted = "("+str(list(set(actors_wanted)))[1:-1] + ")" # turned into a set first incase there are multiple actor ids which occure more than once
-        not_wanted = "("+str(list(actors_not_wanted))[1:-1] + ")"
-        films_from_db_not_wanted = selects_info_from_database("FilmID", "ActorIntegrator", f"ActorID IN {not_wanted}")
-        films_not_wanted = set([i[0] for i in films_from_db_not_wanted])
-        # the film ids which are not wanted because they contain an actor which is not wanted, as a set incase that more than 1 actor which is not wanted is in the same film
-        where = f"ActorID IN {wanted} AND FilmID NOT IN {'('+str(self.__favourited_rated_films + list(films_not_wanted))[1:-1]+')'}"
-        # does not select films which have already been rated or favourited and the films which contain an actor which is not wanted
-        data = selects_info_from_database("FilmID, ActorID", "ActorIntegrator", where) # all of the film ids with the actors ids (FilmID, ActorID)
-
-        grouped_data = groupings(data) # this is used to make sure that the film has actors in common
-        grouped_data_list = list(grouped_data.items())
-        for film_id2, list_of_actors in grouped_data_list:
-            if len(list_of_actors) >= 2: # actors in common
-                self.__film_ids_from_actors += [film_id2] # adds to a list all of the film ids which have 2 or more actors in common 
-                del grouped_data[film_id2] # it is removed incase there are not atleast 100 films so that it can randomly select "x" unique film ids more to make it have 100 film ids
-
-        if len(self.__film_ids_from_actors) < 100:
-            # randomly selects film ids from the "grouped_data" dictionary, so that there are atleast 100 film ids to filter down
-            # add append them to the self.__film_ids_from_actors, do not need to worry about selecting the same one twice as it has already been removed from the dictionary
-            # self.__film_ids_from_actors += list(grouped_data.keys())[:100-len(self.__film_ids_from_actors)]
-            self.__film_ids_from_actors += choices(list(grouped_data.keys()), k=(100-len(self.__film_ids_from_actors)))
-
-
-    def __filtering_film_ids_down(self):
+        with self.trace.stage("actor_candidates"):
+            index = people_index("Actor")
+            wanted = set(actors_wanted) # turned into a set first incase there are multiple actor ids which occure more than once
+            films_not_wanted = index.films_of_any(actors_not_wanted) | set(self.__favourited_rated_films)
+            # the films which contain an actor which is not wanted, and the films which have already been rated or favourited
+            actors_in_each_film = Counter(film_id for actor_id in wanted for film_id in index.films_of(actor_id) if film_id not in films_not_wanted)
+            # this is used to make sure that the film has actors in common
+            self.__shared_people.update(actors_in_each_film)
+            films_with_1actor = [] # kept so that if there are not atleast 100 films they can be added aswell
+            for film_id2, amount_of_actors in actors_in_each_film.items():
+                if amount_of_actors >= 2: # actors in common
+                    self.__film_ids_from_actors += [film_id2] # adds to a list all of the film ids which have 2 or more actors in common 
+                else:
+                    films_with_1actor += [film_id2]
+
+            if len(self.__film_ids_from_actors) < 100:
+                # adds the films with only 1 actor in common, so that there are enough film ids to filter down,
+                # each film is only in the list once since they are the keys of the counter
+                self.__film_ids_from_actors += films_with_1actor
+        self.trace.counts("actor_candidates", films= len(self.__film_ids_from_actors))
+
+
+    def __analysing_attributes(self):
+        """
+        Works out what the user wants for each attribute from their profile, see gathering_types.py
+
+        :return: TYPE: tuple - (runtime bounds, release date bounds, colour type or probability, wanted languages, (combinations, genre ids and weightings))
+        """
+        return (runtime(self.__favourited_rated_films, self.__profile), release_date(self.__favourited_rated_films, self.__profile),
+            colour(self.__favourited_rated_films, self.__profile), language(self.__favourited_rated_films, self.__profile),
+            genres(self.__favourited_rated_films, self.__profile))
+
+
+    def __filtering_film_ids_down(self, runtime_bounds: list, release_date_bounds: list, colour_type_probability, wanted_languages: list, genre_analysis: tuple):
         """
         5 SECTIONS
 
@@ -310,15 +381,24 @@ class RecommendedFilms:
         If the genre is unknown, or does not contain one of the genres specified, then it will be just left and not added to any lists
 
         SUMMARY
-        All of these 5 sections are done in 1 functions is since they are all done using a loop, important information is assigned and stated before the loop begins
+        Each section is worked out for all of the films at once, as a bitset from the catalog, rather than in a loop over every film.
+        A film is added to a list once for every rule it matches, the same as when each film was checked on its own.
         Each section is labled with its name
         Finds all of the unwanted film ids
+
+        :param: runtime_bounds: list - the parameters are from __analysing_attributes
+
+        :param: release_date_bounds: list
+
+        :param: colour_type_probability: int or float
+
+        :param: wanted_languages: list
+
+        :param: genre_analysis: tuple
         """
-        runtime_lowerbound, runtime_upperbound = runtime(self.__favourited_rated_films)
-        release_date_lowerbound, release_date_upperbound = release_date(self.__favourited_rated_films)
-        colour_type_probability = colour(self.__favourited_rated_films)
-        wanted_languages = language(self.__favourited_rated_films)
-        combinations, genre_ids_and_weightings = genres(self.__favourited_rated_films)
+        runtime_lowerbound, runtime_upperbound = runtime_bounds
+        release_date_lowerbound, release_date_upperbound = release_date_bounds
+        combinations, genre_ids_and_weightings = genre_analysis
 
         # for COLOUR
         UNKNOWN_ID = -1
@@ -334,72 +414,173 @@ class RecommendedFilms:
         colour_unkown = colour_type_probability == UNKNOWN_ID # all of the colour's of the films from the user, are unkown the value will be True
         language_unknown = not wanted_languages
         genre_unknown = not combinations and not genre_ids_and_weightings
-
-        for film_object in self.__film_attributes: # all 5 sections use the same loop
-            #RUNTIME
-            if not runtime_unknown:
-                if not runtime_lowerbound <= film_object.length <= runtime_upperbound and film_object.length != -1:
-                    # "-1" since that is the value if the runtime is unknown so will ignore unknowns
-                    self.__not_wanted += [film_object.film_id]
-
-            # RELEASE DATE
-            if not release_date_lowerbound <= film_object.release <= release_date_upperbound: # the year will never be unknown so there is no need to ignore it
-                self.__not_wanted += [film_object.film_id]
-
-            # COLOUR
-            if not colour_unkown:
-                if colour_indicator_probability: # it is not a probability
-                    if film_object.colour != colour_type_probability and film_object.colour != -1: # ignores unknowns and checks to see if the colour of the film is not wanted
-                        self.__not_wanted += [film_object.film_id] # adds it to the not_wanted list if that colour is not the colour wanted
-                else: # it is a probability
-                    if film_object.colour == MONO_ID: # gets all of the films which are monochrome
-                        self.__mono += [film_object.film_id] # will use this later to represent the proportion of films which should to be mono out of the ones which have been recommeneded.
-
-            # LANGUAGE
-            if not language_unknown:
-                # if the language id is unknown then it will be shown in the languages of the film object, with only one element in that list,
-                # and in the wanted_languages the unknown language will never be in there so they will not have any in common
-                if not len(set(film_object.languages) & set(wanted_languages)):
-                    # if there are no common language between the languages which the user is likely to want and the languages of the films which have been recommended
-                    self.__not_wanted +=[film_object.film_id]
-
-            # GENRE
-            if not genre_unknown:
-                if len(film_object.genres) > 1: # it could potentially have a combo
-                    had_combo = False
-                    for genre_ids_in_combo, weighting in combinations:
-                        if len(set(film_object.genres) & set(genre_ids_in_combo)) == len(genre_ids_in_combo): # they have that combo
-                            had_combo = True
-                            if weighting == 3:
-                                self.__first_weighting += [film_object.film_id]
-                            elif weighting == 2:
-                                self.__second_weighting += [film_object.film_id]
-                            else: # weighting would be equal to 0
-                                self.__not_wanted += [film_object.film_id]
-                            # there is not a criteria for if weighting equals 1 since for combinations it will never equal one.
-                    if not had_combo: # the film did not have a combo in the list, then will look at the individual genres
-                        self.__individual_genres(genre_ids_and_weightings, film_object)
-                else:
-                    self.__individual_genres(genre_ids_and_weightings, film_object)
-
-
-    def __individual_genres(self, genre_ids_and_weightings: list, film_object: FilmAttributesForRecommendation):
+        catalog = self.__catalog
+        candidates = self.__candidates
+        film_ids_in = catalog.film_ids_in # turns a bitset back into film ids
+
+        #RUNTIME
+        if not runtime_unknown:
+            self.__not_wanted += film_ids_in(candidates & ~(catalog.lengths_between(runtime_lowerbound, runtime_upperbound) | catalog.with_length(-1)))
+            # "-1" since that is the value if the runtime is unknown so will ignore unknowns
+
+        # RELEASE DATE
+        self.__not_wanted += film_ids_in(candidates & ~catalog.years_between(release_date_lowerbound, release_date_upperbound))
+        # the year will never be unknown so there is no need to ignore it
+
+        # COLOUR
+        if not colour_unkown:
+            if colour_indicator_probability: # it is not a probability
+                self.__not_wanted += film_ids_in(candidates & ~(catalog.with_colour(colour_type_probability) | catalog.with_colour(UNKNOWN_ID)))
+                # ignores unknowns and adds the films to the not_wanted list if that colour is not the colour wanted
+            else: # it is a probability
+                self.__mono += film_ids_in(candidates & catalog.with_colour(MONO_ID)) # gets all of the films which are monochrome
+                # will use this later to represent the proportion of films which should to be mono out of the ones which have been recommeneded.
+
+        # LANGUAGE
+        if not language_unknown:
+            # if the language id is unknown then the film will only have the unknown language,
+            # and in the wanted_languages the unknown language will never be in there so they will not have any in common
+            self.__not_wanted += film_ids_in(candidates & ~catalog.with_any_language(wanted_languages))
+            # films with no common language between the languages which the user is likely to want and the languages of the film
+
+        # GENRE
+        if not genre_unknown:
+            could_have_combo = candidates & catalog.films_with_several_genres
+            had_combo = 0
+            for genre_ids_in_combo, weighting in combinations:
+                films_with_combo = could_have_combo & catalog.with_all_genres(genre_ids_in_combo)
+                had_combo |= films_with_combo
+                if weighting == 3:
+                    self.__first_weighting += film_ids_in(films_with_combo)
+                elif weighting == 2:
+                    self.__second_weighting += film_ids_in(films_with_combo)
+                else: # weighting would be equal to 0
+                    self.__not_wanted += film_ids_in(films_with_combo)
+                # there is not a criteria for if weighting equals 1 since for combinations it will never equal one.
+            self.__individual_genres(genre_ids_and_weightings, candidates & ~had_combo)
+            # the films which did not have a combo in the list, then will look at the individual genres
+
+
+    def __individual_genres(self, genre_ids_and_weightings: list, films: int):
         """
-        Looks at all of the genres and its weightings, compares it to the data of that specific film (film_object)
-        updates the variables which are stored inside of the class and is only called 2 times
+        Looks at all of the genres and its weightings, and finds which of the films have each genre,
+        updates the variables which are stored inside of the class
         
         :param: genre_ids_and_weightings: list
         
-        :param: film_object: FilmAttributesForRecommendation - which is an object
+        :param: films: int - the bitset of the films to look at, from the catalog
         """
         for genre_id, weighting2 in genre_ids_and_weightings:
-            if genre_id in film_object.genres:
-                if weighting2 == 2:
-                    self.__second_weighting += [film_object.film_id]
-                elif weighting2 == 1:
-                    self.__third_weighting += [film_object.film_id]
-                else: # weighting2 would be equal to 0
-                    self.__not_wanted += [film_object.film_id]
+            films_with_genre = self.__catalog.film_ids_in(films & self.__catalog.with_genre(genre_id))
+            if weighting2 == 2:
+                self.__second_weighting += films_with_genre
+            elif weighting2 == 1:
+                self.__third_weighting += films_with_genre
+            else: # weighting2 would be equal to 0
+                self.__not_wanted += films_with_genre
+
+
+def gathers_films_of_users(user_ids: list):
+    """
+    The favourites and ratings of every user at once, in the same form as they are selected for one user
+
+    :param: user_ids: list
+
+    :return: films_of_users: dict - {user_id: (favourited, rated)}, favourited is a list of (FilmID,), rated is a list of (FilmID, Overall, Actors, Quality)
+    """
+    films_of_users = {user_id: ([], []) for user_id in user_ids}
+    if user_ids:
+        where = WhereStatement().is_in("UserID", user_ids)
+        for user_id, *row in selects_info_from_database("UserID, FilmID", "Favourites", where):
+            films_of_users[user_id][0].append(tuple(row))
+        for user_id, *row in selects_info_from_database("UserID, FilmID, Overall, Actors, Quality", "Ratings", where):
+            films_of_users[user_id][1].append(tuple(row))
+    return films_of_users
+
+
+def replaces_recommendations(user_ids: list, rows_to_add: list):
+    """
+    The old recommendations of the users are deleted and the new ones are inserted in one transaction,
+    so the recommendations page never sees the old ones deleted without the new ones added.
+
+    :param: user_ids: list
+
+    :param: rows_to_add: list - of (FilmID, UserID, Liked), from "resolves_recommendation_priorities"
+    """
+    TABLE = "Recommendations"
+    FIELDS = "(FilmID, UserID, Liked)"
+    with transaction() as unit:
+        unit.deletes(TABLE, WhereStatement().is_in("UserID", user_ids))
+        # deletes the old recommendations, so that there are not duplicates when the new ones are added if the same film is recommended twice ones to add new ones
+        unit.inserts(FIELDS, TABLE, rows_to_add)
+
+
+RECOMMENDATION_SIZE = 30 # the amount of films in a recommendation
+LIKED_FIRST, LIKED_MONO, LIKED_SECOND, LIKED_THIRD, LIKED_REMAINDER = 10, 7, 9, 8, 0 # the "Liked" value added for the films from each list
+BUCKET_SCORES = {LIKED_FIRST: 4, LIKED_MONO: 3, LIKED_SECOND: 2, LIKED_THIRD: 1, LIKED_REMAINDER: 0}
+# the score of the list the film is in, a film in a higher list is always picked before a film in a lower one
+
+
+def recommendation_score(liked: int, shared_people: int):
+    """
+    The score of a film, the list it is in plus a fraction for the amount of wanted actors and directors it has,
+    which is always less than 1 so it only puts the films in order inside of each list
+
+    :param: liked: int - the "Liked" value of the list the film is in
+
+    :param: shared_people: int
+
+    :return: TYPE: float
+    """
+    return BUCKET_SCORES[liked] + shared_people/(shared_people+1)
+
+
+def resolves_recommendation_priorities(user_id: int, first_weighting: list, not_wanted: list, mono: list, second_weighting: list,
+        third_weighting: list, film_ids_gathered_to_recommend: list, shared_people: dict = None):
+    """
+    If the film id appears in more than one of the lists then it only counts for the one with the highest importance, in this priority order
+    first_weighting, not_wanted, mono, second_weighting, third_weighting, film_ids_gathered_to_recommend.
+    Each film is given its highest list in one pass with a dictionary, and the films which are not wanted are left out.
+    Every other film is given a score from "recommendation_score", and the 30 with the highest scores are picked with a heap,
+    so it is O(n log 30) however many films were gathered, rather than sorting all of them.
+    The monochrome films get the proportion of the 30 places from the colour analysis, the monochrome films with the highest scores fill them
+    and the rest are not recommended, the other places go to the highest scores of the other films.
+    Films with the same score are picked smallest id first, so the same films always give the same recommendation
+
+    :param: user_id: int
+
+    :param: first_weighting: list - these lists may have the same film id more than once
+
+    :param: not_wanted: list
+
+    :param: mono: list - the first index is the proportion of monochrome films to represent, then the ids of those films, or empty
+
+    :param: second_weighting: list
+
+    :param: third_weighting: list
+
+    :param: film_ids_gathered_to_recommend: list
+
+    :param: shared_people: dict - {film_id: the amount of wanted actors and directors in the film}, films which are not in it have none
+
+    :return: rows_to_add: list - of (FilmID, UserID, Liked) to add to the Recommendations table, highest score first
+    """
+    shared_people = shared_people or {}
+    NOT_WANTED = None
+    liked_of_film = {}
+    for liked, film_ids in ((LIKED_FIRST, first_weighting), (NOT_WANTED, not_wanted), (LIKED_MONO, mono[1:]), (LIKED_SECOND, second_weighting),
+            (LIKED_THIRD, third_weighting), (LIKED_REMAINDER, film_ids_gathered_to_recommend)):
+        for film_id in film_ids:
+            liked_of_film.setdefault(film_id, liked) # is only set the first time, which is the highest list the film is in
+
+    def score(film_id):
+        return recommendation_score(liked_of_film[film_id], shared_people.get(film_id, 0)), -film_id
+
+    mono_places = round(mono[0]*RECOMMENDATION_SIZE) if mono else 0
+    picked = nlargest(mono_places, (film_id for film_id, liked in liked_of_film.items() if liked == LIKED_MONO), key= score)
+    picked += nlargest(RECOMMENDATION_SIZE-len(picked),
+        (film_id for film_id, liked in liked_of_film.items() if liked is not NOT_WANTED and liked != LIKED_MONO), key= score)
+    return [(film_id, user_id, liked_of_film[film_id]) for film_id in sorted(picked, key= score, reverse= True)]
 
 
 if __name__ == "__main__":
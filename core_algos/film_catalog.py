@@ -0,0 +1,243 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import reduce
+from operator import or_
+from threading import Lock
+from time import monotonic
+
+# imports from my project
+from core_algos.formulas import selects_info_from_database, groupings, WhereStatement
+from core_algos.table_versions import table_versions
+
+
+REFRESH_SECONDS = 5 # how often the tables are checked for changes, the catalog is only read again if they have changed
+CATALOG_TABLES = ["Films", "LanguageToFilm", "GenreToFilm"]
+BYTE_POSITIONS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)] # the positions of the bits which are set in each byte
+
+
+def bitset_of(positions):
+    """
+    Turns positions into one int, where bit i is set if position i is given,
+    the bits are set in a bytearray first so it takes one pass, rather than making a new int for every position
+
+    :param: positions: iterable - of ints
+
+    :return: TYPE: int
+    """
+    positions = list(positions)
+    if not positions:
+        return 0
+    bits = bytearray((max(positions) >> 3) + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def positions_in(bitset: int):
+    """
+    The opposite of "bitset_of", the positions of every bit which is set, smallest first
+
+    :param: bitset: int
+
+    :return: TYPE: list
+    """
+    positions = []
+    for index, byte in enumerate(bitset.to_bytes((bitset.bit_length() + 7) >> 3, "little")):
+        if byte:
+            start = index << 3
+            positions += [start + bit for bit in BYTE_POSITIONS[byte]]
+    return positions
+
+
+def bitsets_for_each_value(values):
+    """
+    :param: values: iterable - the value of each position, e.g. the length of each film in the catalog
+
+    :return: TYPE: dict - {value: bitset of the positions with that value}
+    """
+    positions_with_value = {}
+    for position, value in enumerate(values):
+        positions_with_value.setdefault(value, []).append(position)
+    return {value: bitset_of(positions) for value, positions in positions_with_value.items()}
+
+
+class FilmCatalog:
+    """
+    Every film's length, colour, year, languages and genres, stored as columns (one array for each attribute, where a film has the same position in all of them)
+    rather than as one object for each film.
+    For each attribute there is also a bitset for every value, so a rule like "the length is between 90 and 120" is worked out for all of the films at once,
+    by combining bitsets with & and | which python does in C, instead of checking each film in a loop.
+    e.g. catalog.lengths_between(90, 120) & catalog.candidates(film_ids)
+
+    :param: films_data: list - of (FilmID, Length, Colour, ReleaseDate)
+
+    :param: language_data: list - of (FilmID, LanguageID)
+
+    :param: genre_data: list - of (FilmID, GenreID)
+    """
+    def __init__(self, films_data: list, language_data: list, genre_data: list):
+        self.film_ids = array("q", [film_id for film_id, _, _, _ in films_data])
+        self.positions = {film_id: position for position, film_id in enumerate(self.film_ids)}
+        self.lengths = array("q", [length for _, length, _, _ in films_data])
+        self.colours = array("q", [colour for _, _, colour, _ in films_data])
+        self.years = array("q", [int(release_date[:4]) for _, _, _, release_date in films_data])
+        self.__length_bitsets = bitsets_for_each_value(self.lengths)
+        self.__year_bitsets = bitsets_for_each_value(self.years)
+        self.__sorted_lengths = sorted(self.__length_bitsets)
+        self.__sorted_years = sorted(self.__year_bitsets)
+        self.__colour_bitsets = bitsets_for_each_value(self.colours)
+        self.__language_bitsets = self.__bitsets_for_each_link(language_data)
+        self.__genre_bitsets = self.__bitsets_for_each_link(genre_data)
+        self.films_with_several_genres = bitset_of(self.positions[film_id] for film_id, amount in groupings(genre_data).counts().items()
+            if amount > 1 and film_id in self.positions)
+        # films which could have a combination of genres
+
+
+    def __bitsets_for_each_link(self, link_data: list):
+        """
+        :param: link_data: list - of (FilmID, linked id), e.g. (FilmID, GenreID)
+
+        :return: TYPE: dict - {linked id: bitset of the films linked to it}
+        """
+        positions_with_id = {}
+        for film_id, linked_id in link_data:
+            position = self.positions.get(film_id)
+            if position is not None: # ignores films which have a language or genre but are not in the Films table
+                positions_with_id.setdefault(linked_id, []).append(position)
+        return {linked_id: bitset_of(positions) for linked_id, positions in positions_with_id.items()}
+
+
+    def __between(self, bitsets: dict, sorted_values: list, lowerbound, upperbound):
+        return reduce(or_, (bitsets[value] for value in sorted_values[bisect_left(sorted_values, lowerbound): bisect_right(sorted_values, upperbound)]), 0)
+
+
+    def __any_of(self, bitsets: dict, values):
+        return reduce(or_, (bitsets.get(value, 0) for value in values), 0)
+
+
+    def candidates(self, film_ids):
+        """
+        :param: film_ids: iterable
+
+        :return: TYPE: int - the bitset of the films, films which are not in the catalog are left out
+        """
+        positions = self.positions
+        return bitset_of(positions[film_id] for film_id in film_ids if film_id in positions)
+
+
+    def missing(self, film_ids):
+        """
+        :param: film_ids: iterable
+
+        :return: TYPE: list - the film ids which are not in the catalog
+        """
+        return [film_id for film_id in film_ids if film_id not in self.positions]
+
+
+    def film_ids_in(self, bitset: int):
+        """
+        :param: bitset: int
+
+        :return: TYPE: list - the film ids of the films in the bitset, in the order of the catalog
+        """
+        film_ids = self.film_ids
+        return [film_ids[position] for position in positions_in(bitset)]
+
+
+    def lengths_between(self, lowerbound: int, upperbound: int):
+        """
+        :return: TYPE: int - the bitset of films with a length from lowerbound to upperbound (inclusive)
+        """
+        return self.__between(self.__length_bitsets, self.__sorted_lengths, lowerbound, upperbound)
+
+
+    def years_between(self, lowerbound: int, upperbound: int):
+        """
+        :return: TYPE: int - the bitset of films released from lowerbound to upperbound (inclusive)
+        """
+        return self.__between(self.__year_bitsets, self.__sorted_years, lowerbound, upperbound)
+
+
+    def with_length(self, length: int):
+        """
+        :return: TYPE: int - the bitset of films with exactly that length
+        """
+        return self.__length_bitsets.get(length, 0)
+
+
+    def with_colour(self, colour_id: int):
+        """
+        :return: TYPE: int - the bitset of films with that colour
+        """
+        return self.__colour_bitsets.get(colour_id, 0)
+
+
+    def with_any_language(self, language_ids: list):
+        """
+        :return: TYPE: int - the bitset of films which have atleast one of the languages
+        """
+        return self.__any_of(self.__language_bitsets, language_ids)
+
+
+    def with_genre(self, genre_id: int):
+        """
+        :return: TYPE: int - the bitset of films which have that genre
+        """
+        return self.__genre_bitsets.get(genre_id, 0)
+
+
+    def with_all_genres(self, genre_ids: list):
+        """
+        :return: TYPE: int - the bitset of films which have every one of the genres, e.g. a combination of genres
+        """
+        bitsets = [self.__genre_bitsets.get(genre_id, 0) for genre_id in genre_ids]
+        return reduce(lambda x, y: x & y, bitsets) if bitsets else 0
+
+
+def loads_film_catalog():
+    """
+    Reads the attributes of every film which are used to filter recommendations, with 3 queries
+
+    :return: TYPE: FilmCatalog
+    """
+    where = WhereStatement().order_by("FilmID")
+    return FilmCatalog(selects_info_from_database("FilmID, Length, Colour, ReleaseDate", "Films", where),
+        selects_info_from_database("FilmID, LanguageID", "LanguageToFilm", WhereStatement()),
+        selects_info_from_database("FilmID, GenreID", "GenreToFilm", WhereStatement()))
+
+
+catalog_lock = Lock()
+catalog_state = {"catalog": None, "version": None, "checked_at": 0.0}
+
+
+def film_catalog(film_ids: list = ()):
+    """
+    The catalog shared by every recommendation, read the first time it is needed,
+    and read again if a film, language or genre has been added, changed or removed, which is checked at most once every REFRESH_SECONDS.
+    If some of the film ids are not in it (films added since it was checked) it is checked straight away,
+    film ids which are not in the Films table at all only cost the check, as the version has not changed
+
+    :param: film_ids: list - the films which are about to be looked up
+
+    :return: TYPE: FilmCatalog
+    """
+    with catalog_lock:
+        catalog = catalog_state["catalog"]
+        if catalog is None or monotonic() - catalog_state["checked_at"] > REFRESH_SECONDS or catalog.missing(film_ids):
+            version = table_versions(CATALOG_TABLES) # read before the catalog, so a change made while it is being read makes it read again next time
+            if catalog is None or version != catalog_state["version"]:
+                catalog = loads_film_catalog()
+            catalog_state.update(catalog= catalog, version= version, checked_at= monotonic())
+        return catalog
+
+
+def reloads_film_catalog():
+    """
+    Makes the catalog be read again the next time it is needed, without waiting for REFRESH_SECONDS
+    """
+    with catalog_lock:
+        catalog_state["catalog"] = None
+
+
+if __name__ == "__main__":
+    pass
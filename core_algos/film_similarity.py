@@ -0,0 +1,364 @@
+from array import array
+from argparse import ArgumentParser
+from collections import Counter
+from heapq import nlargest
+from itertools import combinations, product
+from math import sqrt
+from os import path, replace, stat
+from threading import Lock
+from time import perf_counter
+
+# imports from my project
+from core_algos.formulas import pool, configures_pool, transaction, WhereStatement
+
+
+NEIGHBOURS = 50 # the amount of most similar films which are kept for each film
+SIMILAR_CANDIDATES = 100 # the amount of films given by "similar_films" for a recommendation
+SIMILARITY = "cosine" # or "jaccard"
+FILE_VERSION = 1
+
+COOCCURRENCE_TABLE = "FilmCooccurrence"
+COUNTS_TABLE = "FilmInteractions"
+SNAPSHOT_TABLE = "CooccurrenceUsers"
+CREATE_TABLES = [
+    f"CREATE TABLE IF NOT EXISTS {COOCCURRENCE_TABLE} (FilmID INTEGER, OtherFilmID INTEGER, Amount INTEGER, PRIMARY KEY (FilmID, OtherFilmID)) WITHOUT ROWID",
+    f"CREATE TABLE IF NOT EXISTS {COUNTS_TABLE} (FilmID INTEGER PRIMARY KEY, Amount INTEGER)",
+    f"CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (UserID INTEGER PRIMARY KEY, FilmIDs TEXT)",
+]
+# FilmCooccurrence is the amount of users who have favourited or rated both films, with a row for both orders of the 2 films,
+# FilmInteractions is the amount of users who have favourited or rated each film,
+# and CooccurrenceUsers is the films each user had the last time they were counted, so the next rebuild only needs to count what has changed
+
+
+def similarity_file_path(database_path: str = None):
+    """
+    The neighbours are kept in a file next to the database, e.g. database/MainDB_similarity.bin
+
+    :param: database_path: str
+
+    :return: TYPE: str
+    """
+    return f"{path.splitext(database_path or pool.path)[0]}_similarity.bin"
+
+
+def similarity_score(together: int, amount: int, other_amount: int):
+    """
+    :param: together: int - the amount of users who have both films
+
+    :param: amount: int - the amount of users who have the first film
+
+    :param: other_amount: int - the amount of users who have the other film
+
+    :return: TYPE: float
+    """
+    if SIMILARITY == "jaccard":
+        return together/(amount + other_amount - together)
+    return together/sqrt(amount*other_amount)
+
+
+class SimilarityIndex:
+    """
+    The most similar films for every film, stored as 4 flat arrays, the neighbours of the film at position n are
+    neighbour_ids[offsets[n]: offsets[n+1]] with their scores at the same positions in scores, most similar first.
+    It is saved to and read from a file with "array.tofile" and "array.fromfile", so reading it does not need to go through every value in python
+
+    :param: film_ids: array
+
+    :param: offsets: array
+
+    :param: neighbour_ids: array
+
+    :param: scores: array
+    """
+    def __init__(self, film_ids: array = None, offsets: array = None, neighbour_ids: array = None, scores: array = None):
+        self.film_ids = film_ids if film_ids is not None else array("q")
+        self.offsets = offsets if offsets is not None else array("q", [0])
+        self.neighbour_ids = neighbour_ids if neighbour_ids is not None else array("q")
+        self.scores = scores if scores is not None else array("f")
+        self.positions = {film_id: position for position, film_id in enumerate(self.film_ids)}
+
+
+    @classmethod
+    def from_neighbours(cls, neighbours: dict):
+        """
+        :param: neighbours: dict - {film_id: [(neighbour_id, score)] most similar first}
+
+        :return: TYPE: SimilarityIndex
+        """
+        film_ids, offsets, neighbour_ids, scores = array("q"), array("q", [0]), array("q"), array("f")
+        for film_id in sorted(neighbours):
+            film_ids.append(film_id)
+            neighbour_ids.extend(neighbour_id for neighbour_id, _ in neighbours[film_id])
+            scores.extend(score for _, score in neighbours[film_id])
+            offsets.append(len(neighbour_ids))
+        return cls(film_ids, offsets, neighbour_ids, scores)
+
+
+    def neighbours(self, film_id: int):
+        """
+        :param: film_id: int
+
+        :return: TYPE: list - of (neighbour_id, score), most similar first, empty if the film has no neighbours
+        """
+        position = self.positions.get(film_id)
+        if position is None:
+            return []
+        start, end = self.offsets[position], self.offsets[position+1]
+        return list(zip(self.neighbour_ids[start: end], self.scores[start: end]))
+
+
+    def all_neighbours(self):
+        """
+        :return: TYPE: dict - {film_id: [(neighbour_id, score)]}, the opposite of "from_neighbours"
+        """
+        return {film_id: self.neighbours(film_id) for film_id in self.film_ids}
+
+
+    def similar_films(self, film_ids: list, amount: int = SIMILAR_CANDIDATES):
+        """
+        The films which are most similar to all of the films given, the score of each film is its scores to all of the given films added up,
+        the films which are given are never in the results
+
+        :param: film_ids: list - e.g. the films the user has favourited and rated
+
+        :param: amount: int
+
+        :return: TYPE: list - the film ids, most similar first
+        """
+        totals = {}
+        get_total, offsets, neighbour_ids, scores = totals.get, self.offsets, self.neighbour_ids, self.scores # looked up once rather than every time in the loop
+        for film_id in film_ids:
+            position = self.positions.get(film_id)
+            if position is not None:
+                start, end = offsets[position], offsets[position+1]
+                for neighbour_id, score in zip(neighbour_ids[start: end], scores[start: end]):
+                    totals[neighbour_id] = get_total(neighbour_id, 0.0) + score
+        for film_id in film_ids:
+            totals.pop(film_id, None)
+        return [film_id for film_id, _ in nlargest(amount, totals.items(), key= lambda item: (item[1], -item[0]))]
+
+
+    def saves(self, file_path: str):
+        """
+        Writes to a new file then replaces the old one, so a website reading it never sees half of a file
+
+        :param: file_path: str
+        """
+        with open(f"{file_path}.tmp", "wb") as file:
+            array("q", [FILE_VERSION, len(self.film_ids), len(self.neighbour_ids)]).tofile(file)
+            for column in (self.film_ids, self.offsets, self.neighbour_ids, self.scores):
+                column.tofile(file)
+        replace(f"{file_path}.tmp", file_path)
+
+
+    @staticmethod
+    def file_version(file_path: str):
+        """
+        :param: file_path: str
+
+        :return: TYPE: int - the version the file was saved with, None if there is no file yet
+        """
+        if not path.exists(file_path):
+            return None
+        with open(file_path, "rb") as file:
+            header = array("q")
+            header.fromfile(file, 1)
+        return header[0]
+
+
+    @classmethod
+    def loads(cls, file_path: str):
+        """
+        :param: file_path: str
+
+        :return: TYPE: SimilarityIndex - empty if there is no file yet
+        """
+        if not path.exists(file_path):
+            return cls()
+        with open(file_path, "rb") as file:
+            header = array("q")
+            header.fromfile(file, 3)
+            version, amount_of_films, amount_of_neighbours = header
+            if version != FILE_VERSION:
+                return cls() # made by a different version, the next rebuild will replace it
+            columns = []
+            for typecode, amount in (("q", amount_of_films), ("q", amount_of_films+1), ("q", amount_of_neighbours), ("f", amount_of_neighbours)):
+                column = array(typecode)
+                column.fromfile(file, amount)
+                columns += [column]
+        return cls(*columns)
+
+
+def creates_similarity_tables():
+    """
+    Creates the tables for the counts if they do not exist yet
+    """
+    with pool.connection() as db:
+        for statement in CREATE_TABLES:
+            db.execute(statement)
+        db.commit()
+
+
+def users_films(unit):
+    """
+    :param: unit: UnitOfWork
+
+    :return: TYPE: dict - {user_id: set of the films they have favourited or rated}
+    """
+    films = {}
+    for table in ("Favourites", "Ratings"):
+        for user_id, film_id in unit.selects("UserID, FilmID", table, WhereStatement()):
+            films.setdefault(user_id, set()).add(film_id)
+    return films
+
+
+def counts_changes(old_films: set, new_films: set, pair_changes: Counter, count_changes: Counter):
+    """
+    Adds what changes in the counts when a user's films go from old_films to new_films,
+    only the films which were added or removed are looked at, so a user who rated 1 more film adds 1 film's pairs rather than all of them again
+
+    :param: old_films: set
+
+    :param: new_films: set
+
+    :param: pair_changes: Counter - {(film_id, other_film_id): change}, both orders are added
+
+    :param: count_changes: Counter - {film_id: change}
+    """
+    kept = old_films & new_films
+    for films, change in ((new_films - old_films, 1), (old_films - new_films, -1)):
+        for film_id in films:
+            count_changes[film_id] += change
+        for film_id, other_film_id in list(combinations(films, 2)) + list(product(films, kept)):
+            pair_changes[film_id, other_film_id] += change
+            pair_changes[other_film_id, film_id] += change
+
+
+def top_neighbours(film_id: int, together: list, amounts: dict, amount: int = NEIGHBOURS):
+    """
+    :param: film_id: int
+
+    :param: together: list - of (other_film_id, the amount of users with both films)
+
+    :param: amounts: dict - {film_id: the amount of users with that film}
+
+    :param: amount: int
+
+    :return: TYPE: list - of (neighbour_id, score), most similar first and the smallest id first if the scores are the same
+    """
+    scores = [(other_film_id, similarity_score(both, amounts[film_id], amounts[other_film_id])) for other_film_id, both in together]
+    return nlargest(amount, scores, key= lambda item: (item[1], -item[0]))
+
+
+def rebuilds_similarity_index(full: bool = False):
+    """
+    Brings the counts up to date with the Favourites and Ratings tables, then works out the neighbours again for every film which could have changed,
+    that is the films which were added or removed by a user and every film which has been favourited or rated alongside them.
+    The neighbours of every other film are kept from the file, if there is no file or it was saved by a different version
+    the neighbours of every film are worked out again from the counts, as otherwise only the changed films would be saved
+
+    :param: full: bool - if True everything is counted again from the start
+
+    :return: TYPE: dict - the amount of users, films and seconds it took
+    """
+    start_time = perf_counter()
+    creates_similarity_tables()
+    file_path = similarity_file_path()
+    keeps_file = not full and SimilarityIndex.file_version(file_path) == FILE_VERSION
+    with transaction() as unit:
+        if full:
+            for table in (COOCCURRENCE_TABLE, COUNTS_TABLE, SNAPSHOT_TABLE):
+                unit.deletes(table, WhereStatement())
+        current = users_films(unit)
+        snapshots = {user_id: {int(film_id) for film_id in film_ids.split(",") if film_id}
+            for user_id, film_ids in unit.selects("UserID, FilmIDs", SNAPSHOT_TABLE, WhereStatement())}
+
+        pair_changes, count_changes, changed_users = Counter(), Counter(), []
+        for user_id in current.keys() | snapshots.keys():
+            old_films, new_films = snapshots.get(user_id, set()), current.get(user_id, set())
+            if old_films != new_films:
+                counts_changes(old_films, new_films, pair_changes, count_changes)
+                changed_users += [user_id]
+
+        unit.increments(COOCCURRENCE_TABLE, "FilmID, OtherFilmID", "Amount", [(*pair, change) for pair, change in pair_changes.items() if change])
+        unit.increments(COUNTS_TABLE, "FilmID", "Amount", [(film_id, change) for film_id, change in count_changes.items() if change])
+        unit.deletes(COOCCURRENCE_TABLE, WhereStatement().equals("Amount", 0))
+        unit.deletes(COUNTS_TABLE, WhereStatement().equals("Amount", 0))
+        unit.deletes(SNAPSHOT_TABLE, WhereStatement().is_in("UserID", changed_users))
+        unit.inserts("(UserID, FilmIDs)", SNAPSHOT_TABLE, [(user_id, ",".join(map(str, sorted(current[user_id]))))
+            for user_id in changed_users if user_id in current])
+
+        changed_films = {film_id for film_id, change in count_changes.items() if change}
+        affected = changed_films | {film_id for pair, change in pair_changes.items() if change for film_id in pair}
+        for _, other_film_id in unit.selects("FilmID, OtherFilmID", COOCCURRENCE_TABLE, WhereStatement().is_in("FilmID", changed_films)):
+            affected.add(other_film_id) # its score to the changed film depends on how many users have the changed film
+
+        neighbours = SimilarityIndex.loads(file_path).all_neighbours() if keeps_file else {}
+        amounts = dict(unit.selects("FilmID, Amount", COUNTS_TABLE, WhereStatement()))
+        if not keeps_file:
+            affected |= amounts.keys() # nothing is kept so every film which has been counted is worked out again
+        together = {}
+        for film_id, other_film_id, both in unit.selects("FilmID, OtherFilmID, Amount", COOCCURRENCE_TABLE, WhereStatement().is_in("FilmID", affected)):
+            together.setdefault(film_id, []).append((other_film_id, both))
+    for film_id in affected:
+        neighbours.pop(film_id, None)
+        if film_id in together:
+            neighbours[film_id] = top_neighbours(film_id, together[film_id], amounts)
+
+    SimilarityIndex.from_neighbours(neighbours).saves(file_path)
+    return {"changed_users": len(changed_users), "recalculated_films": len(affected), "films": len(neighbours), "seconds": perf_counter()-start_time}
+
+
+index_lock = Lock()
+index_state = {"index": None, "file": None, "modified": None}
+
+
+def similarity_index():
+    """
+    The index shared by the whole process, it is read again whenever the file has been rebuilt
+
+    :return: TYPE: SimilarityIndex
+    """
+    file_path = similarity_file_path()
+    try:
+        modified = stat(file_path).st_mtime_ns
+    except FileNotFoundError:
+        modified = None
+    with index_lock:
+        if index_state["index"] is None or index_state["file"] != file_path or index_state["modified"] != modified:
+            index_state.update(index= SimilarityIndex.loads(file_path), file= file_path, modified= modified)
+        return index_state["index"]
+
+
+def benchmarks_similar_films(repeats: int = 1000):
+    """
+    Times finding the neighbours of one film and the similar films for a user, with the index which has been built
+
+    :param: repeats: int
+    """
+    index = similarity_index()
+    if not index.film_ids:
+        print("The index is empty, run this module to build it first")
+        return
+    film_ids = list(index.film_ids[:200])
+    start = perf_counter()
+    for i in range(repeats):
+        index.neighbours(film_ids[i % len(film_ids)])
+    print(f"neighbours of 1 film: {(perf_counter()-start)/repeats*1000:.4f}ms")
+    start = perf_counter()
+    for _ in range(repeats//10):
+        index.similar_films(film_ids)
+    print(f"similar films for a user with {len(film_ids)} films: {(perf_counter()-start)/(repeats//10)*1000:.4f}ms")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description= "Counts which films are favourited and rated by the same users, and saves the most similar films for every film")
+    parser.add_argument("--full", action= "store_true", help= "counts everything again rather than only what has changed")
+    parser.add_argument("--database", default= pool.path, help= "the path of the database")
+    parser.add_argument("--benchmark", action= "store_true", help= "times the lookups afterwards")
+    arguments = parser.parse_args()
+
+    configures_pool(arguments.database)
+    print(rebuilds_similarity_index(arguments.full))
+    if arguments.benchmark:
+        benchmarks_similar_films()
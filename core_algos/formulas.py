@@ -1,202 +1,1208 @@
-from math import sqrt
-from sqlite3 import connect
-
-
-def mean_and_sd(list_of_values: list):
-    """
-    Calculates the variance using the formula
-    SUM(X*X)/n - mean*mean, where X is each individual element in the array of data
-    Once varience is found square roots it for the standard deviation (sd)
-    
-    :param: list_of_values: list
-    
-    :return: mean: float
-    
-    :return: sd: float
-    """
-    total = sum(list_of_values)
-    amount = len(list_of_values) 
-    mean = total/amount
-    values = map(lambda x : x**2, list_of_values)
-    variance = (sum(values)/amount) - (mean)**2
-    sd = sqrt(variance)
-    return mean, sd
-
-
-def factorial(val: int):
-    """
-    Calculates the factorial of the paramater
-    
-    :param: val: int
-    
-    :return: factorial: int
-    """
-    factorial = 1
-    for i in range(1,val+1):
-        factorial*=i
-    return factorial
-
-
-def combination_formula(total: int, position: int):
-    """
-    nCr, combination formula, used to calculate permutation, the different combinations which can occure.
-    n is the number of items (total)
-    r is the number of items being chosen (position)
-    this uses the pascal triangle, and n would be the line number and r would be the positon along that line
-    
-    :param: total: int
-    
-    :param: position: int
-    
-    :return: events: int
-    """
-    factorial_total = factorial(total) # the amount of ways the even can occur
-    factorial_difference = factorial(total-position)
-    factorial_position = factorial(position) # use to delete duplications of events
-    events = factorial_total/(factorial_difference*factorial_position)
-    return events
-
-
-def binomial_distribution(lower: int, upper: int, trial: int, probability: float):
-    """
-    Calculates the probability of getting a value between the lower and upper value based on the amount of trials
-    if lower is the same as upper then it will work out the proability of getting 1 value.
-    the lower and upper bounds are inclusive
-    Additional info, trial * probability, is the mean value, the probability is worked out around this value.
-    
-    :param: lower: int
-    
-    :param: upper: int
-    
-    :param: trial: int
-    
-    :param: probability: float
-    
-    :return: value: float
-    """
-    if lower == upper:
-        value = ((1-probability)**(trial-lower)) * (probability**lower)*combination_formula(trial,lower)
-    elif lower > upper:
-        value = None
-    else:
-        value = 0
-        for i in range(lower, upper+1): # This adds together all the probabilities
-            value += ((1-probability)**(trial-i)) * (probability**i)*combination_formula(trial,i)
-    return value
-
-
-def binary_search(values: list, target: str, startpoint: int =0, endpoint: int =None):
-    """
-    Rular binary search OLog(n), justing using a recursive algorithm, just using recursion.
-    
-    :param: values: list
-    
-    :param: target: str
-    
-    :param: startpoint: int
-    
-    :param: endpoint: int
-    
-    :returns: False, if the target is not in the values list, but otherwise it will return itself,
-    and go through the algorithm again, once the target has been located then it will return the position
-    """
-    if endpoint is None: endpoint = len(values) - 1
-    if startpoint > endpoint: return False # An error has occured
-
-    midpoint = (startpoint + endpoint) // 2
-    if target == values[midpoint]: return midpoint # Has found the position in the list where the target is
-    elif target < values[midpoint]: return binary_search(values, target, startpoint, midpoint - 1)
-    elif target > values[midpoint]: return binary_search(values, target, midpoint + 1, endpoint)
-
-
-def selects_info_from_database(fields: str, table: str, where_statement: str):
-    """
-    Gets the information from the database for the fields entered based on the where condition specified.
-    
-    :param: fields: str
-    
-    :param: table: str
-    
-    :param: where_statement: str
-    
-    :return: information: list
-    """    
-    with connect("database/MainDB.db", timeout= 300) as db:
-        pointer = db.cursor()
-        pointer.execute(f"SELECT {fields} FROM {table} WHERE {where_statement}")
-        information =  pointer.fetchall() # all of the information requested about information and condition given
-    return information
-
-
-def inserts_info_to_database(fields: str, table: str, data: list):
-    """
-    Inserts all of the data specified into the database
-    
-    :param: field: str
-    
-    :param: table: str
-    
-    :param: data: list - 2d list of tuples
-    """
-    question_marks = ",?"*fields.count(",")
-    with connect("database/MainDB.db", timeout= 300) as db:
-        pointer = db.cursor()
-        pointer.executemany(f"INSERT INTO {table} {fields} VALUES (?{question_marks})", data)
-        # executemany allows data to be a list of multiple values instead of just 1
-        db.commit()
-
-
-def deletes_from_database(table: str, where_statement: str):
-    """
-    Deletes data from table where it meets the where condition
-    
-    :param: table: str
-    
-    :param: where_statement: str
-    """
-    with connect("database/MainDB.db", timeout= 300) as db:
-        pointer = db.cursor()
-        pointer.execute(f"DELETE FROM {table} WHERE {where_statement}")
-        db.commit()
-
-
-def updates_database(fields: str, table: str, where_statement: str, data: tuple):
-    """
-    Updates the fields specified where it meets the where criteria.
-    The where statement will look like "Field=? AND Field2=?", and data with all all the items to add to the database
-
-    :param: field: str
-    
-    :param: table: str
-
-    :param: where_statement: str
-
-    :param: data: tuple
-    """
-    fields_formatted = fields.replace(",", "=?,")+"=?"
-    with connect("database/MainDB.db", timeout= 300) as db:
-        pointer = db.cursor()
-        pointer.execute(f"UPDATE {table} SET {fields_formatted} WHERE {where_statement}", data)
-        db.commit()
-
-
-def groupings(data_to_group: list):
-    """
-    Groups together all of the information which is given as a paramater, where data_to_group is a 2d list of tuples with each tuple having 2 values,
-    the first value in the tuple is the film id and may occur more than once so this will group them together in a dictionary
-    
-    :param: data_to_group: list
-
-    :return: grouped_data: dict
-    """
-    grouped_data = dict() # the result will look like :- {filmID: [1,2,3,4]} where: 1,2,3,4 are all ids of the data which have been grouped
-    for film_id, data_id in data_to_group: # where data_id is the id of the information which is wanted to be grouped
-        if film_id in grouped_data.keys():
-            grouped_data[film_id] += [data_id]
-        else:
-            grouped_data[film_id] = [data_id]
-    return grouped_data
-
-
-if __name__ == "__main__":
+from math import sqrt, factorial as math_factorial
+from sqlite3 import connect, ProgrammingError
+from queue import LifoQueue, Empty
+from threading import Lock, local
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from collections import deque, Counter
+from collections.abc import Mapping
+from array import array
+from itertools import accumulate
+from operator import sub, itemgetter
+from functools import partial
+from time import time, perf_counter
+from sys import _getframe
+from os import path
+import logging
+
+# imports from my project
+from core_algos.statistics_kernel import means_and_sds, combination, binomial_range
+
+
+DATABASE_PATH = "database/MainDB.db"
+POOL_SIZE = 10 # the most connections which can be open at once, threads will wait for a free connection if they are all in use
+PRAGMAS = {"journal_mode": "WAL", "cache_size": -64000, "mmap_size": 268435456}
+# WAL lets the readers carry on while something is being written, cache_size is negative so it is in KiB (64MB) and mmap_size is in bytes (256MB)
+STATEMENT_CACHE_SIZE = 256 # the amount of different query shapes which are kept compiled for each connection
+FETCH_SIZE = 1000 # the amount of rows read from the database at a time when they are being streamed
+MAX_BOUND_IDS = 512 # lists of ids longer than this are put into a temporary table instead of being "?" placeholders
+# keeps well under the limit of 999 variables in a statement which older versions of sqlite have
+SLOW_QUERY_SECONDS = 0.1 # queries which take longer than this are added to the slow query log
+
+slow_query_log = logging.getLogger("films.slow_queries")
+current_route = ContextVar("current_route", default= "unknown") # the route being loaded when a query is run, set by the website
+current_query_tally = ContextVar("current_query_tally", default= None)
+# a dictionary of the amount of queries, seconds and rows, which every query run in the same thread (or context) is added to, set by pipeline_trace.py
+
+
+class ConnectionPool:
+    """
+    Keeps a set of open connections to the database which are checked out when a query is run and put back once it has finished,
+    so that a page which runs dozens of queries does not have to open and close a new connection for every single one of them.
+    Connections are only opened when they are first needed, and the pragmas are applied once when the connection is opened.
+    Counters are kept about how the pool is being used so that they can be checked with the "stats" method.
+
+    :param: path: str
+
+    :param: size: int
+
+    :param: timeout: int
+
+    :param: pragmas: dict
+    """
+    def __init__(self, path: str = DATABASE_PATH, size: int = POOL_SIZE, timeout: int = 300, pragmas: dict = None):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self.__idle = LifoQueue() # last in first out, so the most recently used connection (which is warmer in the cache) is reused first
+        self.__lock = Lock() # so that the counters are not changed by 2 threads at the same time
+        self.__opened = 0 # the amount of connections which are currently open, in use or idle
+        self.__generation = 0 # goes up each time the pool is reconfigured, so connections opened before that are closed when they are given back
+        self.__generations = {} # {id(connection): the generation it was opened in}
+        self.counters = {"opened": 0, "closed": 0, "checkouts": 0, "waits": 0, "errors": 0, "discarded": 0, "dedicated": 0}
+
+
+    def __connects(self):
+        """
+        Opens a new connection and applies all of the pragmas to it, check_same_thread is False since
+        the connection may be checked out by a different thread to the one which opened it
+
+        :return: db: sqlite3.Connection
+        """
+        db = connect(self.path, timeout= self.timeout, check_same_thread= False, cached_statements= STATEMENT_CACHE_SIZE)
+        for pragma, value in self.pragmas.items():
+            db.execute(f"PRAGMA {pragma} = {value}")
+        return db
+
+
+    def __opens_connection(self):
+        """
+        Opens a new connection for the pool
+
+        :return: db: sqlite3.Connection
+        """
+        db = self.__connects()
+        with self.__lock:
+            self.counters["opened"] += 1
+            self.__generations[id(db)] = self.__generation
+        return db
+
+
+    def __closes(self, db, counter: str):
+        """
+        Closes the connection and takes it off the amount of open connections
+
+        :param: db: sqlite3.Connection
+
+        :param: counter: str - "closed" or "discarded"
+        """
+        with self.__lock:
+            self.__opened -= 1
+            self.counters[counter] += 1
+            self.__generations.pop(id(db), None)
+        try:
+            db.close()
+        except ProgrammingError:
+            pass # already closed
+
+
+    def checkout(self):
+        """
+        Gets a connection which is not being used by anything else, if all of them are being used and the pool is full,
+        then it will wait until one of them is given back
+
+        :return: db: sqlite3.Connection
+        """
+        with self.__lock:
+            self.counters["checkouts"] += 1
+        try:
+            return self.__idle.get_nowait()
+        except Empty:
+            pass
+
+        with self.__lock:
+            can_open = self.__opened < self.size
+            if can_open:
+                self.__opened += 1
+            else:
+                self.counters["waits"] += 1
+        if can_open:
+            try:
+                return self.__opens_connection()
+            except Exception:
+                with self.__lock:
+                    self.__opened -= 1
+                raise
+        try:
+            return self.__idle.get(timeout= self.timeout) # all of the connections are being used so waits for one
+        except Empty:
+            raise TimeoutError(f"no database connection was given back within {self.timeout} seconds, all {self.size} connections in the pool "
+                "are checked out (e.g. by queries which are waiting on each other)") from None
+
+
+    def checkin(self, db, broken: bool = False):
+        """
+        Gives the connection back to the pool, if the connection is broken then it is closed instead,
+        so a new one can be opened in its place the next time that one is needed
+
+        :param: db: sqlite3.Connection
+
+        :param: broken: bool
+        """
+        if broken:
+            self.__closes(db, "discarded")
+            return
+        if self.__generations.get(id(db)) != self.__generation:
+            self.__closes(db, "closed") # opened before the pool was reconfigured, so it may be for a different database
+            return
+        if db.in_transaction:
+            db.rollback() # anything which was not committed is not left for the next user of the connection
+        self.__idle.put(db)
+
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the length of the with statement, and then puts it back into the pool.
+        If there is an error then the connection is rolled back, and is thrown away if it can no longer be used.
+        
+        :return: db: sqlite3.Connection
+        """
+        db = self.checkout()
+        broken = False
+        try:
+            yield db
+        except Exception as error:
+            with self.__lock:
+                self.counters["errors"] += 1
+            broken = isinstance(error, ProgrammingError)
+            raise
+        finally:
+            # finally so the connection is also given back when a generator using it is closed before it has finished
+            self.checkin(db, broken)
+
+
+    @contextmanager
+    def dedicated_connection(self):
+        """
+        A connection with the same settings as the pool's, which is opened just for the with statement and closed afterwards.
+        It is never one of the pool's connections, so something which keeps its connection for a long time (e.g. a stream which the caller
+        is still going through) does not take a connection away from the pool, and the caller can still run other queries while it is open
+
+        :return: db: sqlite3.Connection
+        """
+        db = self.__connects()
+        with self.__lock:
+            self.counters["dedicated"] += 1
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+    def closes_all(self):
+        """
+        Closes all of the connections which are not being used, used when the pool is being replaced or the program is shutting down
+        """
+        while True:
+            try:
+                db = self.__idle.get_nowait()
+            except Empty:
+                break
+            self.__closes(db, "closed")
+
+
+    def reconfigures(self, path: str = DATABASE_PATH, size: int = POOL_SIZE, timeout: int = 300, pragmas: dict = None):
+        """
+        Changes the database, size or settings of the pool, the idle connections are closed straight away
+        and the ones which are checked out are closed when they are given back, so all new queries use the new settings
+
+        :param: path: str
+
+        :param: size: int
+
+        :param: timeout: int
+
+        :param: pragmas: dict
+        """
+        with self.__lock:
+            self.path = path
+            self.size = size
+            self.timeout = timeout
+            self.pragmas = PRAGMAS if pragmas is None else pragmas
+            self.__generation += 1
+        self.closes_all()
+
+
+    def stats(self):
+        """
+        Information about how the pool is being used, the connections which are "in_use" are the ones checked out
+
+        :return: TYPE: dict
+        """
+        with self.__lock:
+            idle = self.__idle.qsize()
+            return {**self.counters, "size": self.size, "open": self.__opened, "idle": idle, "in_use": self.__opened - idle}
+
+
+pool = ConnectionPool() # no connections are opened until the first query is run
+
+
+thread_settings = local() # settings which are different for each thread, e.g. "pool" for threads which use their own pool
+
+
+def uses_pool(thread_pool: ConnectionPool):
+    """
+    Makes all of the database functions in this thread use a different pool to the main one,
+    used by worker threads which should have their own dedicated connections
+
+    :param: thread_pool: ConnectionPool
+    """
+    thread_settings.pool = thread_pool
+
+
+def current_pool():
+    """
+    :return: TYPE: ConnectionPool - the pool set for this thread with "uses_pool", or the main pool if one has not been set
+    """
+    return getattr(thread_settings, "pool", pool)
+
+
+def configures_pool(path: str = DATABASE_PATH, size: int = POOL_SIZE, timeout: int = 300, pragmas: dict = None):
+    """
+    Reconfigures the pool which all of the database functions use, closing the connections which were opened with the old settings.
+    Used to change the size of the pool, or to point it at a different database.
+    The same pool object is kept, so modules which have imported "pool" still use the new settings
+
+    :param: path: str
+
+    :param: size: int
+
+    :param: timeout: int
+
+    :param: pragmas: dict
+
+    :return: pool: ConnectionPool
+    """
+    pool.reconfigures(path, size, timeout, pragmas)
+    return pool
+
+
+def mean_and_sd(list_of_values: list):
+    """
+    Calculates the variance using the formula
+    SUM(X*X)/n - mean*mean, where X is each individual element in the array of data
+    Once varience is found square roots it for the standard deviation (sd)
+    
+    :param: list_of_values: list
+    
+    :return: mean: float
+    
+    :return: sd: float
+    """
+    return means_and_sds([list_of_values])[0]
+
+
+def mean_and_sd_from_totals(total: float, total_of_squares: float, amount: int):
+    """
+    The same as "mean_and_sd" but from totals which have already been added up,
+    so that the values can be added up as they are read from the database without keeping them all in a list
+
+    :param: total: float - all of the values added together
+
+    :param: total_of_squares: float - the square of all of the values added together
+
+    :param: amount: int
+
+    :return: mean: float
+
+    :return: sd: float
+    """
+    mean = total/amount
+    variance = (total_of_squares/amount) - (mean)**2
+    sd = sqrt(max(variance, 0.0)) # rounding errors can make it very slightly below 0 when every value is the same, the same as "means_and_sds"
+    return mean, sd
+
+
+def factorial(val: int):
+    """
+    Calculates the factorial of the paramater
+    
+    :param: val: int
+    
+    :return: factorial: int
+    """
+    return math_factorial(val)
+
+
+def combination_formula(total: int, position: int):
+    """
+    nCr, combination formula, used to calculate permutation, the different combinations which can occure.
+    n is the number of items (total)
+    r is the number of items being chosen (position)
+    this uses the pascal triangle, and n would be the line number and r would be the positon along that line
+    
+    :param: total: int
+    
+    :param: position: int
+    
+    :return: events: float - infinity if it is too big to be a float
+    """
+    return combination(total, position)
+
+
+def binomial_distribution(lower: int, upper: int, trial: int, probability: float):
+    """
+    Calculates the probability of getting a value between the lower and upper value based on the amount of trials
+    if lower is the same as upper then it will work out the proability of getting 1 value.
+    the lower and upper bounds are inclusive
+    Additional info, trial * probability, is the mean value, the probability is worked out around this value.
+    
+    :param: lower: int
+    
+    :param: upper: int
+    
+    :param: trial: int
+    
+    :param: probability: float
+    
+    :return: value: float - None if lower is greater than upper
+    """
+    return binomial_range(lower, upper, trial, probability) # worked out in log space so large trials do not overflow
+
+
+def binary_search(values: list, target: str, startpoint: int =0, endpoint: int =None):
+    """
+    Rular binary search OLog(n), justing using a recursive algorithm, just using recursion.
+    
+    :param: values: list
+    
+    :param: target: str
+    
+    :param: startpoint: int
+    
+    :param: endpoint: int
+    
+    :returns: False, if the target is not in the values list, but otherwise it will return itself,
+    and go through the algorithm again, once the target has been located then it will return the position
+    """
+    if endpoint is None: endpoint = len(values) - 1
+    if startpoint > endpoint: return False # An error has occured
+
+    midpoint = (startpoint + endpoint) // 2
+    if target == values[midpoint]: return midpoint # Has found the position in the list where the target is
+    elif target < values[midpoint]: return binary_search(values, target, startpoint, midpoint - 1)
+    elif target > values[midpoint]: return binary_search(values, target, midpoint + 1, endpoint)
+
+
+class QueryTelemetry:
+    """
+    Records every query which is run through the functions in this file, with how long it took, how many rows it gave back or changed,
+    the table, the route which was being loaded (set with "sets_route_label") and the file, line and function which called it.
+    These are added up for each route and for each different statement, and any query which takes longer than slow_query_seconds
+    is kept in the slow query log and logged as a warning, with sqlite's query plan for it if explain_slow_queries is True.
+
+    :param: slow_query_seconds: float
+
+    :param: explain_slow_queries: bool
+
+    :param: history_size: int - the amount of the most recent queries and slow queries which are kept
+    """
+    def __init__(self, slow_query_seconds: float = SLOW_QUERY_SECONDS, explain_slow_queries: bool = False, history_size: int = 1000):
+        self.enabled = True
+        self.slow_query_seconds = slow_query_seconds
+        self.explain_slow_queries = explain_slow_queries
+        self.recent_queries = deque(maxlen= history_size)
+        self.slow_queries = deque(maxlen= history_size)
+        self.routes = {} # {route: {"queries": int, "seconds": float, "rows": int, "tables": Counter}}
+        self.statements = {} # {statement: {"table": str, "queries": int, "seconds": float, "rows": int, "parameters": list}}
+        self.__lock = Lock()
+
+
+    def records(self, db, statement: str, parameters, table: str, seconds: float, rows: int):
+        """
+        Adds a query which has just been run, db is the connection it was run on so that the query plan can be found
+        while any temporary tables it used are still filled in
+
+        :param: db: sqlite3.Connection
+
+        :param: statement: str
+
+        :param: parameters: list
+
+        :param: table: str
+
+        :param: seconds: float
+
+        :param: rows: int
+        """
+        tally = current_query_tally.get()
+        if tally is not None:
+            tally["queries"] += 1
+            tally["seconds"] += seconds
+            tally["rows"] += rows
+        if not self.enabled:
+            return
+        route = current_route.get()
+        record = {"statement": statement, "table": table, "seconds": seconds, "rows": rows,
+            "route": route, "call_site": finds_call_site(), "time": time()}
+
+        if seconds >= self.slow_query_seconds:
+            if self.explain_slow_queries and statement.startswith("SELECT"):
+                record["query_plan"] = [row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()]
+            slow_query_log.warning(f"{seconds*1000:.1f}ms {rows} rows {table} at {record['call_site']} on {route}: {statement}")
+
+        with self.__lock:
+            self.recent_queries.append(record)
+            if seconds >= self.slow_query_seconds:
+                self.slow_queries.append(record)
+
+            route_totals = self.routes.setdefault(route, {"queries": 0, "seconds": 0.0, "rows": 0, "tables": Counter()})
+            route_totals["queries"] += 1
+            route_totals["seconds"] += seconds
+            route_totals["rows"] += rows
+            route_totals["tables"][table] += 1
+
+            statement_totals = self.statements.setdefault(statement, {"table": table, "queries": 0, "seconds": 0.0, "rows": 0})
+            statement_totals["queries"] += 1
+            statement_totals["seconds"] += seconds
+            statement_totals["rows"] += rows
+            statement_totals["parameters"] = list(parameters) # the most recent values, so the statement can be run again to check its query plan
+
+
+    def summary(self):
+        """
+        The totals for each route, and the 10 statements which have taken the longest in total
+
+        :return: TYPE: dict
+        """
+        with self.__lock:
+            routes = {route: {**totals, "tables": dict(totals["tables"])} for route, totals in self.routes.items()}
+            slowest = sorted(self.statements.items(), key = lambda x: x[1]["seconds"], reverse = True)[:10]
+            return {"routes": routes, "slowest_statements": [{"statement": statement, **{k: v for k, v in totals.items() if k != "parameters"}}
+                for statement, totals in slowest], "slow_queries": len(self.slow_queries)}
+
+
+    def resets(self):
+        """
+        Clears everything which has been recorded so far
+        """
+        with self.__lock:
+            self.recent_queries.clear()
+            self.slow_queries.clear()
+            self.routes = {}
+            self.statements = {}
+
+
+telemetry = QueryTelemetry()
+
+
+def sets_route_label(route: str):
+    """
+    Sets the name of the route which is being loaded, every query run after this in the same thread (or context) is recorded against it
+
+    :param: route: str
+    """
+    current_route.set(route)
+
+
+def finds_call_site():
+    """
+    Goes back through the function calls until it finds the first one which is not in this file
+
+    :return: TYPE: str - "file.py:line function"
+    """
+    frame = _getframe(1)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+class WhereStatement:
+    """
+    Builds up a where statement where all of the values are "?" placeholders and are passed into sqlite seperately,
+    so the text of the statement only depends on the shape of the query and not on the values in it.
+    That means the same text is produced every time a page is loaded, so sqlite can reuse the compiled statement instead of parsing it again.
+    Each method adds a condition which is joined together with AND, and returns the object so the conditions can be chained
+    e.g. WhereStatement().equals("UserID", 4).is_in("FilmID", [1, 2, 3])
+
+    :param: statement: str - optional, raw sql to start the statement with (must only use "?" for values)
+
+    :param: parameters: - the values for the "?" in the raw statement
+    """
+    def __init__(self, statement: str = "", *parameters):
+        self.conditions = [] # the sql text of each condition, which makes up the shape of the query
+        self.parameters = [] # all of the values in the same order as the "?" in the conditions
+        self.ordering = ""
+        self.id_sets = [] # large lists of ids which are loaded into temporary tables when the statement is run, in the same order as their table numbers
+        if statement:
+            self.raw(statement, *parameters)
+
+
+    def raw(self, statement: str, *parameters):
+        """
+        Adds a condition which is already written in sql, for things which can't be a value like joining 2 tables together
+
+        :param: statement: str
+
+        :param: parameters: - the values for any "?" in the statement
+
+        :return: self: WhereStatement
+        """
+        self.conditions += [statement]
+        self.parameters += list(parameters)
+        return self
+
+
+    def equals(self, field: str, value):
+        """
+        The field must be equal to the value
+
+        :param: field: str
+
+        :param: value: - any value which can be stored in the database
+
+        :return: self: WhereStatement
+        """
+        return self.raw(f"{field} = ?", value)
+
+
+    def not_equals(self, field: str, value):
+        """
+        The field must not be equal to the value
+
+        :param: field: str
+
+        :param: value: - any value which can be stored in the database
+
+        :return: self: WhereStatement
+        """
+        return self.raw(f"{field} <> ?", value)
+
+
+    def greater_than(self, field: str, value):
+        """
+        The field must be greater than the value
+
+        :param: field: str
+
+        :param: value: - any value which can be stored in the database
+
+        :return: self: WhereStatement
+        """
+        return self.raw(f"{field} > ?", value)
+
+
+    def less_than(self, field: str, value):
+        """
+        The field must be less than the value
+
+        :param: field: str
+
+        :param: value: - any value which can be stored in the database
+
+        :return: self: WhereStatement
+        """
+        return self.raw(f"{field} < ?", value)
+
+
+    def is_in(self, field: str, values):
+        """
+        The field must be one of the values, the amount of "?" is rounded up to the next power of 2, with the last value repeated to fill the gaps.
+        Otherwise a list of 37 ids and a list of 38 ids would be 2 different statements to sqlite and neither would be reused.
+        If there are more than MAX_BOUND_IDS values then they are put into a temporary table and the field is looked up in that table instead,
+        so the statement does not go over sqlite's variable limit and sqlite can use the index on the temporary table.
+
+        :param: field: str
+
+        :param: values: list, tuple or set
+
+        :return: self: WhereStatement
+        """
+        if len(values) > MAX_BOUND_IDS:
+            return self.raw(f"{field} IN (SELECT ID FROM {self.__adds_id_set(values)})")
+        placeholders, values = padded_placeholders(values)
+        return self.raw(f"{field} IN ({placeholders})", *values)
+
+
+    def not_in(self, field: str, values):
+        """
+        The field must not be one of the values, padded in the same way as "is_in"
+
+        :param: field: str
+
+        :param: values: list, tuple or set
+
+        :return: self: WhereStatement
+        """
+        if len(values) > MAX_BOUND_IDS:
+            return self.raw(f"{field} NOT IN (SELECT ID FROM {self.__adds_id_set(values)})")
+        placeholders, values = padded_placeholders(values)
+        return self.raw(f"{field} NOT IN ({placeholders})", *values)
+
+
+    def __adds_id_set(self, values):
+        """
+        Keeps hold of a large list of ids to load into a temporary table when the statement is run,
+        the tables are numbered in the order they are added so that the same query always uses the same table names
+
+        :param: values: list, tuple or set
+
+        :return: TYPE: str - the name of the temporary table
+        """
+        self.id_sets += [values]
+        return f"temp.IdSet{len(self.id_sets)-1}"
+
+
+    def in_select(self, field: str, select_field: str, table: str, where_statement: "WhereStatement", negate: bool = False):
+        """
+        The field must be in (or not in if negate is True) the results of another select statement
+
+        :param: field: str
+
+        :param: select_field: str
+
+        :param: table: str
+
+        :param: where_statement: WhereStatement
+
+        :param: negate: bool
+
+        :return: self: WhereStatement
+        """
+        operator = "NOT IN" if negate else "IN"
+        inner_text = where_statement.text()
+        for index in reversed(range(len(where_statement.id_sets))):
+            # the other statement numbers its temporary tables from 0, so they are renumbered to come after the ones in this statement
+            inner_text = inner_text.replace(f"temp.IdSet{index})", f"temp.IdSet{index+len(self.id_sets)})")
+        self.id_sets += where_statement.id_sets
+        return self.raw(f"{field} {operator} (SELECT {select_field} FROM {table} WHERE {inner_text})", *where_statement.parameters)
+
+
+    def like_any(self, field: str, words: list):
+        """
+        The field must have atleast one of the words in it, anywhere in the text
+
+        :param: field: str
+
+        :param: words: list
+
+        :return: self: WhereStatement
+        """
+        return self.raw("(" + " OR".join([f" {field} like ?" for _ in words]) + ")", *[f"%{word}%" for word in words])
+
+
+    def order_by(self, ordering: str):
+        """
+        :param: ordering: str - e.g. "GrossRevenue DESC"
+
+        :return: self: WhereStatement
+        """
+        self.ordering = ordering
+        return self
+
+
+    def shape(self):
+        """
+        Everything about the statement apart from the values, used as the key for the statement cache
+
+        :return: TYPE: tuple
+        """
+        return tuple(self.conditions) + (self.ordering,)
+
+
+    def text(self):
+        """
+        :return: TYPE: str - the where statement with "?" where the values go
+        """
+        return where_text(self.shape())
+
+
+def where_text(shape: tuple):
+    """
+    Turns the shape of a WhereStatement back into the sql text of the where statement
+
+    :param: shape: tuple
+
+    :return: text: str
+    """
+    conditions, ordering = shape[:-1], shape[-1]
+    text = " AND ".join(conditions) if conditions else "1" # 1 is always true, for when there are no conditions
+    if ordering:
+        text += f" ORDER BY {ordering}"
+    return text
+
+
+def padded_placeholders(values):
+    """
+    Creates the "?,?,?" for a list of values, rounding the amount up to the next power of 2 by repeating the last value,
+    repeating a value does not change the result of an IN or NOT IN condition
+
+    :param: values: list, tuple or set
+
+    :return: placeholders: str
+
+    :return: values: list
+    """
+    values = list(values)
+    if not values:
+        return "", values
+    size = 1
+    while size < len(values):
+        size *= 2
+    values += [values[-1]]*(size-len(values))
+    return ",".join("?"*size), values
+
+
+def as_where_statement(where_statement):
+    """
+    Lets the database functions be called with either a WhereStatement or the text of a where statement like before
+
+    :param: where_statement: str or WhereStatement
+
+    :return: TYPE: WhereStatement
+    """
+    if isinstance(where_statement, WhereStatement):
+        return where_statement
+    return WhereStatement(where_statement)
+
+
+def loads_id_sets(db, where_statement: WhereStatement):
+    """
+    Puts the large lists of ids from the where statement into the temporary tables which it refers to,
+    temporary tables only exist for the connection which made them, so this has to be done on the connection which is running the query.
+    The tables have the id as the primary key so they are indexed, and are emptied first incase they were used by a previous query
+
+    :param: db: sqlite3.Connection
+
+    :param: where_statement: WhereStatement
+    """
+    for index, values in enumerate(where_statement.id_sets):
+        db.execute(f"CREATE TEMP TABLE IF NOT EXISTS IdSet{index} (ID PRIMARY KEY) WITHOUT ROWID")
+        db.execute(f"DELETE FROM temp.IdSet{index}")
+        db.executemany(f"INSERT OR IGNORE INTO temp.IdSet{index} VALUES (?)", ((value,) for value in values))
+
+
+def empties_id_sets(db, where_statement: WhereStatement):
+    """
+    Empties the temporary tables once the query has finished, so the ids are not kept in memory while the connection is idle
+
+    :param: db: sqlite3.Connection
+
+    :param: where_statement: WhereStatement
+    """
+    for index in range(len(where_statement.id_sets)):
+        db.execute(f"DELETE FROM temp.IdSet{index}")
+
+
+@lru_cache(maxsize= STATEMENT_CACHE_SIZE)
+def builds_statement(statement_type: str, fields: str, table: str, shape: tuple):
+    """
+    Creates the sql text for a query, cached by the shape of the query so that the same string object is given to sqlite each time,
+    which is then found in the connection's own cache of compiled statements
+
+    :param: statement_type: str - SELECT, DELETE or UPDATE
+
+    :param: fields: str
+
+    :param: table: str
+
+    :param: shape: tuple - from WhereStatement.shape()
+
+    :return: TYPE: str
+    """
+    if statement_type == "SELECT":
+        return f"SELECT {fields} FROM {table} WHERE {where_text(shape)}"
+    elif statement_type == "DELETE":
+        return f"DELETE FROM {table} WHERE {where_text(shape)}"
+    else:
+        fields_formatted = fields.replace(",", "=?,")+"=?"
+        return f"UPDATE {table} SET {fields_formatted} WHERE {where_text(shape)}"
+
+
+def selects_info_from_database(fields: str, table: str, where_statement):
+    """
+    Gets the information from the database for the fields entered based on the where condition specified.
+    
+    :param: fields: str
+    
+    :param: table: str
+    
+    :param: where_statement: str or WhereStatement
+    
+    :return: information: list
+    """    
+    where_statement = as_where_statement(where_statement)
+    with current_pool().connection() as db:
+        loads_id_sets(db, where_statement)
+        pointer = db.cursor()
+        statement = builds_statement("SELECT", fields, table, where_statement.shape())
+        start_time = perf_counter()
+        pointer.execute(statement, where_statement.parameters)
+        information =  pointer.fetchall() # all of the information requested about information and condition given
+        telemetry.records(db, statement, where_statement.parameters, table, perf_counter()-start_time, len(information))
+        empties_id_sets(db, where_statement)
+    return information
+
+
+def selects_info_in_chunks(fields: str, table: str, field: str, values, where_statement = None):
+    """
+    Another way of looking up a large list of ids, instead of a temporary table it runs the same select statement for each chunk of MAX_BOUND_IDS values
+    and joins the results together. The results will not be in an order across the chunks,
+    so it is only used where the rows are not ordered and the field must be IN the values (NOT IN would need every chunk at once)
+
+    :param: fields: str
+
+    :param: table: str
+
+    :param: field: str - the field which must be one of the values
+
+    :param: values: list, tuple or set
+
+    :param: where_statement: str or WhereStatement - any other conditions
+
+    :return: information: list
+    """
+    values = list(values)
+    information = []
+    for start in range(0, len(values), MAX_BOUND_IDS):
+        chunk_statement = WhereStatement().is_in(field, values[start: start+MAX_BOUND_IDS])
+        if where_statement is not None:
+            other = as_where_statement(where_statement)
+            chunk_statement.conditions += other.conditions
+            chunk_statement.parameters += other.parameters
+        information += selects_info_from_database(fields, table, chunk_statement)
+    return information
+
+
+def streams_info_from_database(fields: str, table: str, where_statement, batch_size: int = 0):
+    """
+    The same as "selects_info_from_database" but instead of gathering all of the rows into a list at once,
+    it gives back the rows a few at a time as they are read from the database, so the memory used stays the same however many rows there are.
+    If batch_size is given then it gives back lists of that many rows (the last list may be shorter), else it gives back each row one at a time.
+    The rows are read on a dedicated connection which is not from the pool and is closed once all of the rows have been gone through
+    or the generator is closed, so a caller which runs other queries while going through the rows, or many streams at once,
+    never waits for the pool to give a connection back
+
+    :param: fields: str
+
+    :param: table: str
+
+    :param: where_statement: str or WhereStatement
+
+    :param: batch_size: int
+
+    :return: TYPE: generator - of rows (tuples), or of lists of rows if batch_size is given
+    """
+    where_statement = as_where_statement(where_statement)
+    with current_pool().dedicated_connection() as db:
+        loads_id_sets(db, where_statement)
+        pointer = db.cursor()
+        statement = builds_statement("SELECT", fields, table, where_statement.shape())
+        seconds = 0 # only the time spent reading from the database, not the time spent by the caller going through the rows
+        amount_of_rows = 0
+        try:
+            start_time = perf_counter()
+            pointer.execute(statement, where_statement.parameters)
+            while True:
+                rows = pointer.fetchmany(batch_size or FETCH_SIZE)
+                seconds += perf_counter()-start_time
+                if not rows:
+                    break
+                amount_of_rows += len(rows)
+                if batch_size:
+                    yield rows
+                else:
+                    yield from rows
+                start_time = perf_counter()
+        finally:
+            pointer.close()
+            telemetry.records(db, statement, where_statement.parameters, table, seconds, amount_of_rows)
+
+
+class UnitOfWork:
+    """
+    All of the writes which are made through this object are run on the same connection and are committed together,
+    so there is only one commit (and one write to the disk) for all of them, and nothing else reading the database
+    sees some of the changes without the rest of them. Created by the "transaction" function
+
+    :param: db: sqlite3.Connection
+    """
+    def __init__(self, db):
+        self.db = db
+
+
+    def inserts(self, fields: str, table: str, data: list):
+        """
+        Inserts all of the data specified into the database, the same as "inserts_info_to_database"
+
+        :param: field: str
+
+        :param: table: str
+
+        :param: data: list - 2d list of tuples
+        """
+        if not data:
+            return # nothing to add
+        question_marks = ",?"*fields.count(",")
+        statement = f"INSERT INTO {table} {fields} VALUES (?{question_marks})"
+        start_time = perf_counter()
+        pointer = self.db.executemany(statement, data)
+        # executemany allows data to be a list of multiple values instead of just 1
+        telemetry.records(self.db, statement, (), table, perf_counter()-start_time, pointer.rowcount)
+
+
+    def deletes(self, table: str, where_statement):
+        """
+        Deletes data from table where it meets the where condition, the same as "deletes_from_database"
+
+        :param: table: str
+
+        :param: where_statement: str or WhereStatement
+        """
+        where_statement = as_where_statement(where_statement)
+        loads_id_sets(self.db, where_statement)
+        statement = builds_statement("DELETE", "", table, where_statement.shape())
+        start_time = perf_counter()
+        pointer = self.db.execute(statement, where_statement.parameters)
+        telemetry.records(self.db, statement, where_statement.parameters, table, perf_counter()-start_time, pointer.rowcount)
+        empties_id_sets(self.db, where_statement)
+
+
+    def updates(self, fields: str, table: str, where_statement, data: tuple):
+        """
+        Updates the fields specified where it meets the where criteria, the same as "updates_database"
+
+        :param: field: str
+
+        :param: table: str
+
+        :param: where_statement: str or WhereStatement
+
+        :param: data: tuple
+        """
+        where_statement = as_where_statement(where_statement)
+        loads_id_sets(self.db, where_statement)
+        statement = builds_statement("UPDATE", fields, table, where_statement.shape())
+        parameters = tuple(data) + tuple(where_statement.parameters)
+        start_time = perf_counter()
+        pointer = self.db.execute(statement, parameters)
+        telemetry.records(self.db, statement, parameters, table, perf_counter()-start_time, pointer.rowcount)
+        empties_id_sets(self.db, where_statement)
+
+
+    def selects(self, fields: str, table: str, where_statement):
+        """
+        Selects inside of the transaction, so it sees the writes which have already been made in it,
+        and nothing else can write in between reading and writing, the same as "selects_info_from_database"
+
+        :param: fields: str
+
+        :param: table: str
+
+        :param: where_statement: str or WhereStatement
+
+        :return: information: list
+        """
+        where_statement = as_where_statement(where_statement)
+        loads_id_sets(self.db, where_statement)
+        statement = builds_statement("SELECT", fields, table, where_statement.shape())
+        start_time = perf_counter()
+        information = self.db.execute(statement, where_statement.parameters).fetchall()
+        telemetry.records(self.db, statement, where_statement.parameters, table, perf_counter()-start_time, len(information))
+        empties_id_sets(self.db, where_statement)
+        return information
+
+
+    def increments(self, table: str, key_fields: str, amount_fields: str, data: list):
+        """
+        Adds the amounts onto the row with the same keys, or inserts the row if there is not one yet,
+        the table must have a primary key (or unique index) on the key fields
+        e.g. increments("Totals", "UserID, Field", "Amount", [(1, "Length", 3)]) adds 3 onto the Amount of that row
+
+        :param: table: str
+
+        :param: key_fields: str
+
+        :param: amount_fields: str
+
+        :param: data: list - 2d list of tuples, the keys followed by the amounts
+        """
+        if not data:
+            return # nothing to add
+        amounts = [field.strip() for field in amount_fields.split(",")]
+        question_marks = ",?"*(key_fields.count(",") + len(amounts))
+        adding = ", ".join(f"{field} = {field} + excluded.{field}" for field in amounts)
+        statement = f"INSERT INTO {table} ({key_fields}, {amount_fields}) VALUES (?{question_marks}) ON CONFLICT ({key_fields}) DO UPDATE SET {adding}"
+        start_time = perf_counter()
+        pointer = self.db.executemany(statement, data)
+        telemetry.records(self.db, statement, (), table, perf_counter()-start_time, pointer.rowcount)
+
+
+@contextmanager
+def transaction():
+    """
+    Checks out a connection and starts a transaction, everything done with the UnitOfWork inside the with statement
+    is committed at the end, or if there is an error then none of it is.
+    BEGIN IMMEDIATE is used so that the lock to write is taken at the start, instead of part way through when another connection may already have it
+    e.g.
+    with transaction() as unit:
+        unit.deletes("Recommendations", WhereStatement().equals("UserID", 4))
+        unit.inserts("(FilmID, UserID, Liked)", "Recommendations", rows)
+
+    :return: unit: UnitOfWork
+    """
+    with current_pool().connection() as db:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield UnitOfWork(db)
+        except BaseException:
+            db.rollback()
+            raise
+        db.commit()
+
+
+def inserts_info_to_database(fields: str, table: str, data: list):
+    """
+    Inserts all of the data specified into the database
+    
+    :param: field: str
+    
+    :param: table: str
+    
+    :param: data: list - 2d list of tuples
+    """
+    with transaction() as unit:
+        unit.inserts(fields, table, data)
+
+
+def deletes_from_database(table: str, where_statement):
+    """
+    Deletes data from table where it meets the where condition
+    
+    :param: table: str
+    
+    :param: where_statement: str or WhereStatement
+    """
+    with transaction() as unit:
+        unit.deletes(table, where_statement)
+
+
+def updates_database(fields: str, table: str, where_statement, data: tuple):
+    """
+    Updates the fields specified where it meets the where criteria.
+    The where statement will look like "Field=? AND Field2=?", and data with all all the items to add to the database
+
+    :param: field: str
+    
+    :param: table: str
+
+    :param: where_statement: str or WhereStatement
+
+    :param: data: tuple
+    """
+    with transaction() as unit:
+        unit.updates(fields, table, where_statement, data)
+
+
+class ColumnarGroups(Mapping):
+    """
+    The rows (film_id, data_id) grouped by film id, stored as 2 flat arrays rather than a list for each film.
+    "column" holds every data id sorted by film id, and the data ids for the film numbered n are column[offsets[n]: offsets[n+1]],
+    the films are numbered in the order they are first seen, and the data ids keep the order they were given in,
+    so it reads exactly like the dictionary "groupings" used to build :- {filmID: [1,2,3,4]}.
+    All of the sorting and counting is done by built in functions, so there is no python work for each row,
+    and counts, sums and means for every group can be worked out without making a list for each film
+
+    :param: data_to_group: list - 2d list of tuples with each tuple having 2 values
+    """
+    def __init__(self, data_to_group: list):
+        data_to_group = list(data_to_group)
+        keys_column = list(map(itemgetter(0), data_to_group))
+        values_column = list(map(itemgetter(1), data_to_group))
+        self.group_keys = tuple(dict.fromkeys(keys_column)) # each film id once, in the order they were first seen
+        self.__group_number = {key: number for number, key in enumerate(self.group_keys)}
+
+        group_of_each_row = list(map(self.__group_number.__getitem__, keys_column))
+        self.column = as_column(sorted(values_column, key= partial(next, iter(group_of_each_row))))
+        # sorted calls the key once for each value in order, so next(iterator, value) gives the group number of that row without a python function,
+        # and sorted is stable, so each group keeps the order its values were given in
+
+        rows_in_each_group = Counter(group_of_each_row)
+        self.offsets = array("q", accumulate(map(rows_in_each_group.__getitem__, range(len(self.group_keys))), initial= 0))
+
+
+    def __getitem__(self, key):
+        number = self.__group_number[key]
+        group = self.column[self.offsets[number]: self.offsets[number+1]]
+        return group.tolist() if isinstance(group, array) else group
+
+
+    def __iter__(self):
+        return iter(self.group_keys)
+
+
+    def __len__(self):
+        return len(self.group_keys)
+
+
+    def __contains__(self, key):
+        return key in self.__group_number
+
+
+    def counts(self):
+        """
+        :return: TYPE: dict - {film_id: the amount of data ids for that film}
+        """
+        return dict(zip(self.group_keys, map(sub, self.offsets[1:], self.offsets[:-1])))
+
+
+    def sums(self):
+        """
+        :return: TYPE: dict - {film_id: all of the data ids (e.g. ratings) for that film added together}
+        """
+        values = self.column
+        return {key: sum(values[start: end]) for key, start, end in zip(self.group_keys, self.offsets, self.offsets[1:])}
+
+
+    def means(self):
+        """
+        :return: TYPE: dict - {film_id: the mean of the data ids (e.g. ratings) for that film}
+        """
+        counts = self.counts()
+        return {key: total/counts[key] for key, total in self.sums().items()}
+
+
+def as_column(values: list):
+    """
+    Stores the values in an array of 64 bit integers if they are all integers, as it uses far less memory than a list,
+    otherwise they are left as a list
+
+    :param: values: list
+
+    :return: TYPE: array or list
+    """
+    try:
+        return array("q", values)
+    except (TypeError, OverflowError):
+        return values
+
+
+def groupings(data_to_group: list):
+    """
+    Groups together all of the information which is given as a paramater, where data_to_group is a 2d list of tuples with each tuple having 2 values,
+    the first value in the tuple is the film id and may occur more than once so this will group them together
+    
+    :param: data_to_group: list
+
+    :return: grouped_data: ColumnarGroups - can be used the same as a dictionary, :- {filmID: [1,2,3,4]}
+    """
+    return ColumnarGroups(data_to_group)
+
+
+if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -1,44 +1,240 @@
+from bisect import bisect_right
 from collections import Counter # sums up all the elements with the occurence
+from itertools import islice
 
 # imports from my project
-from core_algos.formulas import selects_info_from_database, mean_and_sd, combination_formula, binomial_distribution, groupings 
+from core_algos.formulas import selects_info_from_database, mean_and_sd, mean_and_sd_from_totals, combination_formula, binomial_distribution, groupings, WhereStatement
 
 
+MAX_SUBSET_GENRES = 6 # films with more genres than this are compared with every other film instead, as they have 2^genres combinations
 
-def language(films: list):
+
+class UserProfile:
+    """
+    All of the information about the user's favourited and rated films which the 7 analyses need,
+    each table is only selected from once for all of the films, the first time an analysis asks for it, and then shared between them.
+    The unknown ids are removed in memory rather than selecting the same rows again without them.
+    With all 7 analyses this is 6 queries, where before it was 14.
+    The analyses only use the methods from "amount_of_films" down, which add up the rows,
+    so a profile which has already been added up (taste_profiles.PersistedUserProfile) can be given to them instead
+
+    :param: films: list - all the films which the user has favourited and rated
+    """
+    def __init__(self, films: list):
+        self.films = films
+        self.queries = 0 # the amount of queries which have been run for this profile
+        self.__tables = {} # {(fields, table): rows}
+
+
+    def __selects(self, fields: str, table: str):
+        """
+        Selects the fields for all of the films from the table, the first time they are asked for
+
+        :param: fields: str
+
+        :param: table: str
+
+        :return: TYPE: list
+        """
+        if (fields, table) not in self.__tables:
+            self.__tables[(fields, table)] = selects_info_from_database(fields, table, WhereStatement().is_in("FilmID", self.films))
+            self.queries += 1
+        return self.__tables[(fields, table)]
+
+
+    def films_table(self):
+        """
+        :return: TYPE: list - of (FilmID, Length, Colour, ReleaseDate) for each film
+        """
+        return self.__selects("FilmID, Length, Colour, ReleaseDate", "Films")
+
+
+    def links(self, field: str, table: str):
+        """
+        :param: field: str - e.g. ActorID
+
+        :param: table: str - e.g. ActorIntegrator
+
+        :return: TYPE: list - of (FilmID, field) for each film, including the unknown ids
+        """
+        return self.__selects(f"FilmID, {field}", table)
+
+
+    def links_without_unknowns(self, field: str, table: str, UNKNOWN_ID: int):
+        """
+        :param: field: str
+
+        :param: table: str
+
+        :param: UNKNOWN_ID: int
+
+        :return: TYPE: list - of (FilmID, field) for each film, without the unknown ids, in the same order
+        """
+        return [row for row in self.links(field, table) if row[1] != UNKNOWN_ID]
+
+
+    def ratings(self, rating_chategory: str):
+        """
+        Every user's ratings for these films, all 3 chategories are gathered together since the analyses need all of them
+
+        :param: rating_chategory: str - Overall, Actors or Quality
+
+        :return: TYPE: list - of (FilmID, rating)
+        """
+        column = ("Overall", "Actors", "Quality").index(rating_chategory) + 1
+        return [(row[0], row[column]) for row in self.__selects("FilmID, Overall, Actors, Quality", "Ratings")]
+
+
+    def amount_of_films(self):
+        """
+        :return: TYPE: int
+        """
+        return len(self.films)
+
+
+    def runtime_totals(self, UNKNOWN_ID: int):
+        """
+        :param: UNKNOWN_ID: int - the value of the runtime if it is unknown
+
+        :return: total: int - all of the runtimes added together, including the unknown ones
+
+        :return: total_of_squares: int
+
+        :return: amount: int
+
+        :return: amount_of_unknown: int
+        """
+        total = 0
+        total_of_squares = 0
+        amount = 0
+        amount_of_unknown = 0
+        for _, length, _, _ in self.films_table():
+            # added up as they are read, so the runtimes are only gone through once
+            total += length
+            total_of_squares += length**2
+            amount += 1
+            if length == UNKNOWN_ID:
+                amount_of_unknown += 1
+        return total, total_of_squares, amount, amount_of_unknown
+
+
+    def year_totals(self):
+        """
+        :return: total: int - all of the release years added together
+
+        :return: total_of_squares: int
+
+        :return: amount: int
+        """
+        total = 0
+        total_of_squares = 0
+        amount = 0
+        for _, _, _, date in self.films_table():
+            year = int(date[:4])
+            # date[:4], so that it is only working with the year, and all values in the table are ready integer, so converting back
+            total += year
+            total_of_squares += year**2
+            amount += 1
+        return total, total_of_squares, amount
+
+
+    def colour_amounts(self):
+        """
+        :return: TYPE: dict - {colour id: the amount of films with that colour}
+        """
+        colour_ids_only = list(dict((film_id, colour_id) for film_id, _, colour_id, _ in self.films_table()).values())
+        # since the user will only have 1 colour this method of using the dictionary is fine as there will never be more than 1 element with the same key (film id)
+        return dict(Counter(colour_ids_only))
+
+
+    def language_amounts(self, field: str, table: str, UNKNOWN_ID: int):
+        """
+        :param: field: str
+
+        :param: table: str
+
+        :param: UNKNOWN_ID: int
+
+        :return: amount_of_unknowns: int - the amount of rows with an unknown language
+
+        :return: films_with_language: dict - {language id: the amount of films with that language}
+
+        :return: amount_of_singles: dict - {language id: the amount of films where that is their only known language}
+        """
+        language_ids_without_unknowns = self.links_without_unknowns(field, table, UNKNOWN_ID)
+        amount_of_unknowns = len(self.links(field, table)) - len(language_ids_without_unknowns)
+        films_with_language = dict(Counter([i[1] for i in language_ids_without_unknowns]))
+
+        grouped_languages = groupings(language_ids_without_unknowns)
+        films_with_1language = [grouped_languages[film_id][0] for film_id, amount in grouped_languages.counts().items() if amount == 1]
+        # used to get all the films with only 1 language
+        return amount_of_unknowns, films_with_language, dict(Counter(films_with_1language))
+
+
+    def tallies(self, field: str, table: str, rating_chategory: str, UNKNOWN_ID: int):
+        """
+        :param: field: str
+
+        :param: table: str
+
+        :param: rating_chategory: str
+
+        :param: UNKNOWN_ID: int
+
+        :return: amount_of_unknown: int - the amount of links to an unknown id
+
+        :return: occurence: dict - {id: the amount of films with that actor, director or genre}
+
+        :return: tallied_ratings: dict - {id: the ratings of its films added up, from "tallies_weighted_ratings"}
+        """
+        amount_of_unknown = [i[1] for i in self.links(field, table)].count(UNKNOWN_ID)
+        without_unknowns = self.links_without_unknowns(field, table, UNKNOWN_ID)
+        occurence = dict(Counter([i[1] for i in without_unknowns]))
+        tallied_ratings = tallies_weighted_ratings(self.ratings(rating_chategory), without_unknowns, len(self.films) - amount_of_unknown)
+        return amount_of_unknown, occurence, tallied_ratings
+
+
+    def genre_masks(self, field: str, table: str, UNKNOWN_ID: int):
+        """
+        :param: field: str
+
+        :param: table: str
+
+        :param: UNKNOWN_ID: int
+
+        :return: TYPE: list - the genre mask of each film which has a known genre, from "genre_mask"
+        """
+        return [genre_mask(genre_ids) for genre_ids in groupings(self.links_without_unknowns(field, table, UNKNOWN_ID)).values()]
+
+
+
+def language(films: list, profile: UserProfile = None):
     """
     Gathers all the users favourited and rated films, and determines which language they are most likely going to want the films to be in
     
     :param: films: list - all the films which the user has favourited
     
+    :param: profile: UserProfile - the information already gathered for these films, if not given then it is gathered here
+    
     :return: TYPE: list - the language ids which the user may like
     """
     FIELD = "LanguageID"
     TABLE = "LanguageToFilm"
     UNKNOWN_ID = 75 # the id of a language if the language is unknown
-    all_language_ids = selects_info_from_database(f"FilmID, {FIELD}", TABLE, f"FilmID IN {tuple(films)}") # gets the ids of the languages of the users films   
-
-    language_ids_without_unknowns =  selects_info_from_database(f"FilmID, {FIELD}", TABLE, f"FilmID IN {tuple(films)} AND {FIELD} <> {UNKNOWN_ID}")
-    # can select all the ones from the database which do not have an unknown language, allowing me to ignore the films with an unknown language
+    profile = profile or UserProfile(films)
+    amount_of_unknowns, films_with_language, amount_of_singles = profile.language_amounts(FIELD, TABLE, UNKNOWN_ID)
+    # ignores the films with an unknown language, amount_of_singles is {languageID: value} where value is the amount of films with 1 language that language has been in
 
-    if not len(language_ids_without_unknowns): # All languages are unknown
+    if not films_with_language: # All languages are unknown
         return [] # There are no languages to be found, so returns an empty list
         
-    amount_of_unknowns = len(all_language_ids) - len(language_ids_without_unknowns)
-    languages_without_ids = [i[1] for i in language_ids_without_unknowns] # all of the language IDs without the film ID (ignores the unknown ones)
-    films_with_language = tuple(dict(Counter(languages_without_ids)).items())
-    #  How many films have that language (occurence), automatically in descending order, converted into a dict then tuple as the function Counter does not apple instant tuple conversion
+    films_with_language = tuple(films_with_language.items())
+    #  How many films have that language (occurence)
 
-    if films_with_language[0][1] == len(films) - amount_of_unknowns: # does the occurence of that language equal the length of all the films (ignoring unknowns)
+    if films_with_language[0][1] == profile.amount_of_films() - amount_of_unknowns: # does the occurence of that language equal the length of all the films (ignoring unknowns)
         return [films_with_language[0][0]] # returns the id of that language
     else:
-        grouped_languages = groupings(language_ids_without_unknowns)
-        films_with_1language = {film_id2: languages_ids[0] for film_id2, languages_ids in grouped_languages.items() if len(languages_ids) == 1}
-        # used to get all the films with only 1 language
-
-        amount_of_singles = dict(Counter(list(films_with_1language.values()))) # {languageID: value} where value is the amount of films with 1 language that language has been in 
-
-        amount_of_films_with_1language = len(films_with_1language)
+        amount_of_films_with_1language = sum(amount_of_singles.values())
         percentage_occurence = [(language_id3, amount/amount_of_films_with_1language) for language_id3, amount in amount_of_singles.items()]
         # finds the percentage of films which this language is in, never will be 100% since the condition above for that language being in all films
 
@@ -65,12 +261,14 @@ def language(films: list):
         return language_ids_to_get_most_common # not significant evidence to suggest that the user would like a different language
 
 
-def colour(films: list):
+def colour(films: list, profile: UserProfile = None):
     """ 
     Gathers all the users favourited and rated films, and determines which colour type the user is most likely going to want the film to be in
     
     :param: films: list - all the films which the user has favourited
     
+    :param: profile: UserProfile - the information already gathered for these films, if not given then it is gathered here
+    
     :return: TYPE: float - the ID of the type of colour, or the percentage of films which should be monochrome
     """
     FIELD = "Colour"
@@ -85,13 +283,12 @@ def colour(films: list):
     UNKNOWN = 21700
     TOTAL = COL + MONO + UNKNOWN
 
-    all_colours = selects_info_from_database(f"FilmID, {FIELD}", TABLE, f"FilmID IN {tuple(films)}") 
-    colour_ids_only = list(dict(all_colours).values()) # used to find how many of the users favourited films are a certain colour
-    # since the user will only have 1 colour this method of using the dictionary is fine as there will never be more than 1 element with the same key (film id)
-    amount_of_mono = colour_ids_only.count(MONO_ID) # the amount of films which are in mono
-    amount_of_colour = colour_ids_only.count(COLOUR_ID)
-    amount_of_unknown = colour_ids_only.count(UNKNOWN_ID)
-    amount_of_films = len(films)
+    profile = profile or UserProfile(films)
+    colour_amounts = profile.colour_amounts() # used to find how many of the users favourited films are a certain colour
+    amount_of_mono = colour_amounts.get(MONO_ID, 0) # the amount of films which are in mono
+    amount_of_colour = colour_amounts.get(COLOUR_ID, 0)
+    amount_of_unknown = colour_amounts.get(UNKNOWN_ID, 0)
+    amount_of_films = profile.amount_of_films()
     amount_without_unknowns = amount_of_films- amount_of_unknown
 
     if amount_of_films == amount_of_unknown: # is the colour of all films unknown
@@ -114,12 +311,14 @@ def colour(films: list):
             return COLOUR_ID
 
 
-def runtime(films: list):
+def runtime(films: list, profile: UserProfile = None):
     """ 
     Gathers all the users favourited and rated films, and determines the length of the film the user is most likely going to prefer
     
     :param: films: list - all the films which the user has favourited
     
+    :param: profile: UserProfile - the information already gathered for these films, if not given then it is gathered here
+    
     :return: lower bound: int
     
     :return: upper bound: int
@@ -127,43 +326,42 @@ def runtime(films: list):
     FIELD = "Length"
     TABLE = "Films"
     UNKNOWN_ID = -1 # the value of the runtime if it is unknown
-    all_runtimes = selects_info_from_database(FIELD, TABLE, f"FilmID IN {tuple(films)}")  # gets the runtimes from the database for the users films
-    runtimes_as_list = [i[0] for i in all_runtimes]
-    amount_of_unknown = runtimes_as_list.count(UNKNOWN_ID)
+    profile = profile or UserProfile(films)
+    total, total_of_squares, amount, amount_of_unknown = profile.runtime_totals(UNKNOWN_ID) # the runtimes of the users films
 
-    if amount_of_unknown == len(films):
+    if amount_of_unknown == profile.amount_of_films():
         return [0, 0] # all of the films have an unknown runtime
 
-    mean, sd = mean_and_sd(runtimes_as_list) # sd: standard deviation
+    mean, sd = mean_and_sd_from_totals(total, total_of_squares, amount) # sd: standard deviation
     lower = mean - 2*sd
     upper = mean + 2*sd
     return round(lower), round(upper) # so that it returns an integer to the nearest whole number
 
 
-def release_date(films: list):
+def release_date(films: list, profile: UserProfile = None):
     """ 
     Gathers all the users favourited and rated films, and determines which range of years the user is most likely going to want a film from
     
     :param: films: list - all the films which the user has favourited
     
+    :param: profile: UserProfile - the information already gathered for these films, if not given then it is gathered here
+    
     :return: lower bound: int
     
     :return: upper bound: int
     """
     FIELD = "ReleaseDate"
     TABLE = "Films"
-    all_dates = selects_info_from_database(FIELD, TABLE, f"FilmID IN {tuple(films)}")  # gets the ids of the languages of the users films   
-    release_years_as_list = [int(date[0][:4] )for date in all_dates]
-    # date[0][:4], so that it is only working with the year, and all values in the table are ready integer, so converting back
+    total, total_of_squares, amount = (profile or UserProfile(films)).year_totals() # the release years of the users films
 
-    mean, sd = mean_and_sd(release_years_as_list) # sd: standard deviation
+    mean, sd = mean_and_sd_from_totals(total, total_of_squares, amount) # sd: standard deviation
     lower = mean - 2*sd
     upper = mean + 2*sd
 
     return round(lower), round(upper)   
 
 
-def statistics_for_actors_directors_genres(films: list, field: str, table: str, rating_chategory: str, UNKNOWN_ID: int = 888888888888):
+def statistics_for_actors_directors_genres(films: list, field: str, table: str, rating_chategory: str, UNKNOWN_ID: int = 888888888888, profile: UserProfile = None):
     """
     The directors, actors and genres algorithm are very similar, so can use the same function for a large part of it.
     Quality rating is for the directors, Actors rating is for the actors and Overall rating is for the genres.
@@ -181,6 +379,8 @@ def statistics_for_actors_directors_genres(films: list, field: str, table: str,
     
     :param: UNKNOWN_ID: int - if not specified then unknown id for actor or director as they are the same. When specified it will be the unknown id for genre
     
+    :param: profile: UserProfile - the information already gathered for these films, if not given then it is gathered here
+    
     :return: mean_rating: float
     
     :return: sd_of_rating: float
@@ -194,48 +394,16 @@ def statistics_for_actors_directors_genres(films: list, field: str, table: str,
     :return: average_ratings: dict
     
     :return: director_actor_occurence: dict
-    
-    :return: without_unknowns: list
     """
-    all_ids = selects_info_from_database(f"FilmID, {field}", table, f"FilmID IN {tuple(films)}")   # gets all the ids from the database
-    just_ids = [i[1] for i in all_ids]
-    # if this was made into a dictionary instead and used the .values method. it would remove some the film,
-    # as the keys can't have the same value, as films may have multiple actors or directors or genres
-    amount_of_unknown = just_ids.count(UNKNOWN_ID)
-
-    if amount_of_unknown == len(films):
-        return [[] for i in range(8)]
-        # if all actors, directors or genres are unknown, needs to return an empty list which is the same length as the one returned by the main function so that it does not crash
-
-    without_unknowns =  selects_info_from_database(f"FilmID, {field}", table, f"FilmID IN {tuple(films)} AND {field} <> {UNKNOWN_ID}")
-    # so that it can ignore the unknown actors, directors or genres
-    ratings = selects_info_from_database(f"FilmID, {rating_chategory}", "Ratings", f"FilmID IN {tuple(films)}")
-
-    just_director_actor_genre_ids = [i[1] for i in without_unknowns]
-    films_with_ratings = []
-    rating_frequency = [] # all of the ratings from each film, multiplied by each element of that film; where the elements are a list of the ids of the actors, directors or genres
-    for film_id, rating in ratings:
-        # This may not run depending on if the user has given the films a quality, actor or overall ratings
-        films_with_ratings +=[film_id]
-        if rating == -1:
-            rating = 5 # if the user hasn't given the film a quality, actor or overall rating
+    profile = profile or UserProfile(films)
+    amount_of_unknown, actors_directors_genres_occurence, tallied_ratings = profile.tallies(field, table, rating_chategory, UNKNOWN_ID)
+    # actors_directors_genres_occurence is the amount of films which that actors, directors or genres has been in, ignoring the unknown ones
+    # tallied_ratings is each actors, directors or genres multiplied by its rating of the film, then summed together, using every user's ratings for these films
 
-        for film_id2, actors_directors_genres_id in without_unknowns:
-                if film_id == film_id2:
-                    rating_frequency += [actors_directors_genres_id]*rating
-        # if the film ids are the same then multiply the director, actor, genre by its quality, actor or overall rating respectively
-
-    if len(ratings) == (len(films) - amount_of_unknown): # all films have a quality, actor or overall rating
-        pass
-    else:
-        for film_id3, actors_directors_genres_id2 in without_unknowns:
-            # Does the same loop as above, needs to be done at a different time as not all values are in films_with_ratings yet
-            if film_id3 not in films_with_ratings: # that film has no quality, actor or overall rating
-                rating_frequency += [actors_directors_genres_id2]*5
-                # the user has not given the film any ratings at all in any chategory
+    if amount_of_unknown == profile.amount_of_films():
+        return [[] for i in range(7)]
+        # if all actors, directors or genres are unknown, needs to return an empty list which is the same length as the one returned by the main function so that it does not crash
 
-    tallied_ratings = dict(Counter(rating_frequency)) # each actors, directors or genres multiplied by its rating of the film, then summed together
-    actors_directors_genres_occurence = dict(Counter(just_director_actor_genre_ids)) # The amount of films which that actors, directors or genres has been in, in the form (id, occurence)
     average_ratings = {actors_directors_genres_id3: total_rating/actors_directors_genres_occurence[actors_directors_genres_id3]
         for actors_directors_genres_id3, total_rating in tallied_ratings.items()}
     # creates a dictionary, with the key being the quality, actor or overall id and the value being the mean rating of the quality, actor or overall rating
@@ -249,21 +417,222 @@ def statistics_for_actors_directors_genres(films: list, field: str, table: str,
     mean_rating, sd_of_rating = mean_and_sd(rating_frequency2)
     mean_occurence, sd_of_occurence = mean_and_sd(only_occurences)
 
-    return mean_rating, sd_of_rating, mean_occurence, sd_of_occurence, one_of_each_rating, average_ratings, actors_directors_genres_occurence, without_unknowns
+    return mean_rating, sd_of_rating, mean_occurence, sd_of_occurence, one_of_each_rating, average_ratings, actors_directors_genres_occurence
 
 
-def directors(films: list):
+def tallies_weighted_ratings(ratings: list, without_unknowns: list, amount_of_known_films: int):
+    """
+    Adds up the ratings for each actor, director or genre, where every rating of a film counts towards every actor, director or genre in that film.
+    The ratings are added up for each film first, then each film's total is added to the ids linked to it once,
+    using a dictionary of the links for each film, rather than comparing every rating with every link.
+    The result is the same as repeating each id by the rating and counting them, in the same order:
+    an unknown rating (-1) counts as 5, and if there are not the same amount of ratings as known films,
+    every film without any rating counts as 5 for each of its ids
+
+    :param: ratings: list - of (FilmID, rating)
+
+    :param: without_unknowns: list - of (FilmID, actor, director or genre id)
+
+    :param: amount_of_known_films: int - the amount of films which do not have an unknown id
+
+    :return: tallied_ratings: dict - {actor, director or genre id: total of the ratings}
+    """
+    links_for_each_film = dict(groupings(without_unknowns).items()) # {film_id: [ids]}
+    totals_for_each_film = {} # {film_id: total of its ratings}, in the order each film is first given a rating above 0
+    films_with_ratings = set()
+    amount_of_ratings = 0
+    for film_id, rating in ratings:
+        # This may not run depending on if the user has given the films a quality, actor or overall ratings
+        films_with_ratings.add(film_id)
+        amount_of_ratings += 1
+        if rating == -1:
+            rating = 5 # if the user hasn't given the film a quality, actor or overall rating
+        if rating > 0: # a rating of 0 does not add the ids at all
+            totals_for_each_film[film_id] = totals_for_each_film.get(film_id, 0) + rating
+
+    tallied_ratings = {}
+    for film_id2, total in totals_for_each_film.items():
+        for actors_directors_genres_id in links_for_each_film.get(film_id2, ()):
+            tallied_ratings[actors_directors_genres_id] = tallied_ratings.get(actors_directors_genres_id, 0) + total
+
+    if amount_of_ratings != amount_of_known_films: # not all films have a quality, actor or overall rating
+        for film_id3, actors_directors_genres_id2 in without_unknowns:
+            if film_id3 not in films_with_ratings: # the user has not given the film any ratings at all in any chategory
+                tallied_ratings[actors_directors_genres_id2] = tallied_ratings.get(actors_directors_genres_id2, 0) + 5
+    return tallied_ratings
+
+
+def genre_mask(genre_ids: list):
+    """
+    Turns the genres of a film into 1 integer, where the bit at the position of each genre id is set,
+    e.g. genres [1, 3] becomes 0b1010, so whether 2 films share genres can be found with "&" rather than making sets
+
+    :param: genre_ids: list
+
+    :return: mask: int
+    """
+    mask = 0
+    for genre_id in genre_ids:
+        mask |= 1 << genre_id
+    return mask
+
+
+def genres_in_mask(mask: int):
+    """
+    The opposite of "genre_mask"
+
+    :param: mask: int
+
+    :return: TYPE: tuple - the genre ids in the mask, from smallest to largest
+    """
+    genre_ids = []
+    while mask:
+        lowest_bit = mask & -mask
+        genre_ids += [lowest_bit.bit_length() - 1]
+        mask ^= lowest_bit
+    return tuple(genre_ids)
+
+
+def combinations_in_mask(mask: int):
+    """
+    Every combination of more than 1 of the genres in the mask, including all of them
+
+    :param: mask: int
+
+    :return: TYPE: generator - of masks
+    """
+    combination = mask
+    while combination:
+        if combination.bit_count() > 1:
+            yield combination
+        combination = (combination - 1) & mask # the next smaller combination of the same genres
+
+
+def pair_number(position: int, later_position: int, amount: int):
+    """
+    A pair of films as 1 int, which is in the same order as the pairs are compared in, so pairs can be kept and sorted without making a tuple for each one
+
+    :param: position: int
+
+    :param: later_position: int
+
+    :param: amount: int - the amount of films
+
+    :return: TYPE: int
+    """
+    return position*amount + later_position
+
+
+def counts_pairs_with_many_genres(film_masks: list, many_genres: list):
+    """
+    Counts the genres in common of every pair of films which includes atleast one of the films in many_genres, by "&"ing the masks of the pairs,
+    where each film is only paired with the films after it. The masks are "&"ed with map and counted by the Counter in bulk, so it is done in C.
+    A Counter keeps its keys in the order they were first added, so the combinations which a film added are the last ones in it,
+    and only those are looked up to find the first pair with each combination
+
+    :param: film_masks: list - the genre mask of each film, from "genre_mask"
+
+    :param: many_genres: list - the positions of the films with more than MAX_SUBSET_GENRES genres, in order
+
+    :return: occurences: Counter - {mask of the combination: the amount of these pairs with exactly those genres in common}
+
+    :return: first_found: dict - {mask of the combination: the first of these pairs with exactly those genres in common, as a "pair_number"}
+    """
+    occurences, first_found = Counter(), {}
+    many_genres_masks = [film_masks[position] for position in many_genres]
+    for position, mask in enumerate(film_masks):
+        if mask.bit_count() > MAX_SUBSET_GENRES: # paired with every film after it
+            later_positions, later_masks = range(position+1, len(film_masks)), film_masks[position+1:]
+        else: # only paired with the films after it with many genres, the pairs with fewer genres are counted by their combinations
+            start = bisect_right(many_genres, position)
+            later_positions, later_masks = many_genres[start:], many_genres_masks[start:]
+        in_common = list(map(mask.__and__, later_masks))
+        amount_before = len(occurences)
+        occurences.update(in_common)
+        new_combinations = list(islice(reversed(occurences), len(occurences) - amount_before))
+        if new_combinations:
+            first_later = dict(zip(reversed(in_common), reversed(later_positions))) # the earliest film is written last, so it is the one kept
+            first_found.update(zip(new_combinations, map((position*len(film_masks)).__add__, map(first_later.__getitem__, new_combinations))))
+            # the same as "pair_number", without calling it for each combination
+    for combination in [combination for combination in occurences if combination.bit_count() < 2]:
+        del occurences[combination]
+    return occurences, first_found
+
+
+def counts_shared_genre_combinations(film_masks: list):
+    """
+    For every pair of films, finds the genres they have in common, and counts how many pairs share each combination of more than 1 genre,
+    without comparing any pairs of films.
+    Each film adds its position to every combination of its own genres, so if n films have all the genres of a combination,
+    n*(n-1)/2 pairs have at least those genres in common. Going from the largest combinations to the smallest,
+    the pairs which have even more genres in common (counted by a larger combination) are taken away, leaving the pairs with exactly that combination.
+    It gives the same result as "Counter(combinations).most_common()" did when every pair was compared in order,
+    including the order of combinations which occur the same amount of times, since that is the order they were first found in.
+    A film with more than MAX_SUBSET_GENRES genres would add itself to too many combinations,
+    so the pairs which include one of those films are counted with "counts_pairs_with_many_genres" instead
+
+    :param: film_masks: list - the genre mask of each film, from "genre_mask"
+
+    :return: TYPE: list - of (combination of genre ids as a tuple, occurence), from the most occuring to the least
+    """
+    many_genres = [position for position, mask in enumerate(film_masks) if mask.bit_count() > MAX_SUBSET_GENRES]
+    films_with_combination = {} # {mask of a combination: the positions of the films which have all of those genres, in order}
+    for position, mask in enumerate(film_masks):
+        if mask.bit_count() > MAX_SUBSET_GENRES:
+            continue
+        for combination in combinations_in_mask(mask):
+            if combination in films_with_combination:
+                films_with_combination[combination] += [position]
+            else:
+                films_with_combination[combination] = [position]
+
+    occurences = {} # {mask of the combination: the amount of pairs with exactly those genres in common}
+    counted_by_larger = Counter() # {mask of the combination: pairs which have been counted by a larger combination}
+    for combination in sorted(films_with_combination, key= int.bit_count, reverse= True):
+        amount = len(films_with_combination[combination])
+        occurence = amount*(amount-1)//2 - counted_by_larger[combination]
+        if occurence:
+            occurences[combination] = occurence
+            for smaller_combination in combinations_in_mask(combination):
+                if smaller_combination != combination:
+                    counted_by_larger[smaller_combination] += occurence
+
+    first_found = {} # {mask of the combination: the first pair of films which have exactly those genres in common, as a "pair_number"}
+    for combination in occurences:
+        positions = films_with_combination[combination]
+        for index, position in enumerate(positions):
+            later_in_common = list(map(film_masks[position].__and__, map(film_masks.__getitem__, positions[index+1:])))
+            if combination in later_in_common: # the first film after this one which only has this combination in common
+                first_found[combination] = pair_number(position, positions[index+1 + later_in_common.index(combination)], len(film_masks))
+                break
+
+    if many_genres:
+        pairs_occurences, pairs_first_found = counts_pairs_with_many_genres(film_masks, many_genres)
+        for combination, occurence in occurences.items(): # added to the pairs' results, as there are usually more of them
+            pairs_occurences[combination] += occurence
+            if combination not in pairs_first_found or first_found[combination] < pairs_first_found[combination]:
+                pairs_first_found[combination] = first_found[combination]
+        occurences, first_found = pairs_occurences, pairs_first_found
+
+    in_order_found = sorted(occurences, key= first_found.__getitem__)
+    ordered = sorted(in_order_found, key= occurences.__getitem__, reverse= True) # sorted is stable, so ties stay in the order they were found
+    return [(genres_in_mask(mask), occurences[mask]) for mask in ordered]
+
+
+def directors(films: list, profile: UserProfile = None):
     """
     Gathers all the users rated and favourited and rated films, and determines which directors they are likely going to want,
     and the ones which they are likely not to want, calling the "statistics_for_actors_directors_genres" function
     
     :param: films: list - all the films which the user has favourited
     
+    :param: profile: UserProfile - the information already gathered for these films, if not given then it is gathered here
+    
     :return: TYPE: list - 2d list, containing 2 elements; the first list are the ids of the directors which films are
     wanted for and the second list are the ids of the directors which are not wanted
     """
-    mean_rating, sd_of_rating, mean_occurence, sd_of_occurence, one_of_each_rating, average_ratings, director_occurence, _ = statistics_for_actors_directors_genres(
-        films,"DirectorID", "DirectorIntegrator", "Quality") # only indented and on a seperate line because it extended to far
+    mean_rating, sd_of_rating, mean_occurence, sd_of_occurence, one_of_each_rating, average_ratings, director_occurence = statistics_for_actors_directors_genres(
+        films,"DirectorID", "DirectorIntegrator", "Quality", profile= profile) # only indented and on a seperate line because it extended to far
 
     # gets all the information which is needed to calculate
     if not mean_rating:
@@ -290,7 +659,7 @@ def directors(films: list):
         return [directors_likely_wanted, directors_not_allowed]
 
 
-def actors(films: list):
+def actors(films: list, profile: UserProfile = None):
 
     """ 
     Gathers all the users rated and favourited and rated films, and determines which actors they are likely going to want,
@@ -299,10 +668,12 @@ def actors(films: list):
     
     :param: films: list - all the films which the user has favourited
     
+    :param: profile: UserProfile - the information already gathered for these films, if not given then it is gathered here
+    
     :return: TYPE: list - 2d list, containing 2 elements. 1st - Singular actors to gather. 2nd - Actors which should not be in the films gathered.
     """
-    mean_rating, sd_of_rating, mean_occurence, sd_of_occurence, _, average_ratings, actor_occurence, _ = statistics_for_actors_directors_genres(
-            films, "ActorID", "ActorIntegrator", "Actors")
+    mean_rating, sd_of_rating, mean_occurence, sd_of_occurence, _, average_ratings, actor_occurence = statistics_for_actors_directors_genres(
+            films, "ActorID", "ActorIntegrator", "Actors", profile= profile)
     if not mean_rating: # if all of the actors in the films are unknown
         return [[],[]]
 
@@ -329,7 +700,7 @@ def actors(films: list):
     return [actors_to_return, actors_not_wanted]
 
 
-def genres(films: list):
+def genres(films: list, profile: UserProfile = None):
     """ 
     Gathers all the users rated and favourited films and determines which genres they are likely going to want,
     and the ones which they are likely not to want, calling the "statistics_for_actors_directors_genres" function
@@ -340,36 +711,27 @@ def genres(films: list):
     
     :param: films: list - all the films which the user has favourited
     
+    :param: profile: UserProfile - the information already gathered for these films, if not given then it is gathered here
+    
     :return: TYPE: list - 2d list, containing 2 elements. 1st - Combinations of genres to gather, 2nd - List of genres to gather, with the weighing order to present in the recommended films.
     """
-    mean_rating, sd_of_rating, mean_occurence, sd_of_occurence, _, average_ratings, genre_occurence, without_unknown_genres = statistics_for_actors_directors_genres(
-        films, "GenreID", "GenreToFilm", "Overall", UNKNOWN_ID= 1) # where 1 is the id of the unknown id of a genre
+    profile = profile or UserProfile(films)
+    mean_rating, sd_of_rating, mean_occurence, sd_of_occurence, _, average_ratings, genre_occurence = statistics_for_actors_directors_genres(
+        films, "GenreID", "GenreToFilm", "Overall", UNKNOWN_ID= 1, profile= profile) # where 1 is the id of the unknown id of a genre
 
     if not mean_rating: # if all of the genres in the films are unknown
         return [[],[]]
     
-    grouped_data = groupings(without_unknown_genres)
-    itemised_grouped_data = list(grouped_data.items())
-    combinations = [] # all of the different combinations of genres
-    for index, film_data in enumerate(itemised_grouped_data): # film_data: is a tuple of the film id and all of the genres for that film
-        for _, all_genres in itemised_grouped_data[index+1:]:  # _ is the film_id but is not used
-            # allows the program to run faster as it is not looking looking at all of the items in the list again, as that comparison has already been made, or will be made in the future
-            # when "index+1" > len(itemised_grouped_data) then itemised_grouped_data[index+1:] will be an empty list and will not crash the program
-            in_common = set(film_data[1]) & set(all_genres) # looks to see if there are any common elements in the lists
-            if len(in_common) > 1: # if there is more than 1 genre which is in common
-                combinations += [tuple(sorted(in_common))]
-                # so that if there are combos which are the same but are in a different order, the sorted function allows them to be matched
-                # some functions only work with a list of tuples, as it requires immutability, since lists are unhashable, i have to convert all the combos to tuples.
+    ordered_combinations = counts_shared_genre_combinations(profile.genre_masks("GenreID", "GenreToFilm", 1))
+    # all of the combinations of more than 1 genre which pairs of films have in common, from the most occuring combination to the least
 
     combos_wanted = [] # will look like [[[genre_id1, genre_id2], 0], [[genre_id2, genre_id3], .83]]
     # a 2d list, with each element being identifying with a number which is used to indicate the percentage proportion of
     # how many of that combo should be in the films which are being recommended
     # if "0" then do not allow films with that combo. else it will be a float value, on the percentage of films which should have this combo
-    if combinations: # there are any combinations, does more than 1 film have 2 or more actors in common
-        amount_of_each_combination = Counter(combinations)
-        ordered_combinations = amount_of_each_combination.most_common() # orders the combinations from the most occuring combination to the least
+    if ordered_combinations: # there are any combinations, does more than 1 film have 2 or more actors in common
         top_combo = ordered_combinations[0] # the combo with the highest occurence
-        top_possible_combo_amount = combination_formula(len(films),2) # this will be the top possible amount of combinations, the position is 2 since each comparison is between 2 lists
+        top_possible_combo_amount = combination_formula(profile.amount_of_films(),2) # this will be the top possible amount of combinations, the position is 2 since each comparison is between 2 lists
         if top_combo[0] == top_possible_combo_amount:
             return [(top_combo[0],3),[]]
 
@@ -0,0 +1,296 @@
+from time import perf_counter
+from re import findall, fullmatch
+
+# imports from my project
+from core_algos.formulas import pool, telemetry, WhereStatement, loads_id_sets, empties_id_sets
+from core_algos.calc_recommendations import RecommendedFilms
+
+
+INDEXES = [
+    ("FavouritesUser", "Favourites", "UserID, FilmID"),
+    ("RatingsUser", "Ratings", "UserID, FilmID"),
+    ("RatingsFilm", "Ratings", "FilmID, Overall, Comedy, Actors, Quality"),
+    ("ActorIntegratorFilm", "ActorIntegrator", "FilmID, ActorID"),
+    ("DirectorIntegratorFilm", "DirectorIntegrator", "FilmID, DirectorID"),
+    ("GenreToFilmFilm", "GenreToFilm", "FilmID, GenreID"),
+    ("GenreToFilmGenre", "GenreToFilm", "GenreID, FilmID"),
+    ("LanguageToFilmFilm", "LanguageToFilm", "FilmID, LanguageID"),
+    ("LanguageToFilmLanguage", "LanguageToFilm", "LanguageID, FilmID"),
+    ("RecommendationsUser", "Recommendations", "UserID, FilmID, Liked"),
+    ("TopRatedChategory", "TopRated", "Chategory, Priority, FilmID"),
+]
+# (name of the index, table, fields) every index has all of the fields the query reads after the ones it filters on,
+# so sqlite can answer the query from the index alone without looking up each row in the table (a covering index).
+# These are created when the website starts, before any queries have been recorded. "advises_indexes" makes the same kind of index
+# for any recorded query which still scans a whole table, and prints any index here which none of the recorded queries use
+RETIRED_INDEXES = ["ActorIntegratorActor", "DirectorIntegratorDirector"]
+# indexes which earlier migrations created but no query uses anymore (the films of each person are found with the people index),
+# they are dropped so every write to the table does not have to update them aswell
+
+
+def records_query_shapes(user_ids: list = (1,)):
+    """
+    Makes the recommendations for the users without saving them, so the query telemetry records every statement
+    which the recommendations really run, in the same form as they are run. While the website is running the telemetry
+    records the statements for all of the other routes aswell, so there is no list of queries here which can go out of date
+
+    :param: user_ids: list
+
+    :return: TYPE: int - the amount of different select statements which have been recorded
+    """
+    for user_id in user_ids:
+        RecommendedFilms(user_id, saves_to_database= False)
+    return sum(1 for statement in telemetry.statements if statement.startswith("SELECT"))
+
+
+def collects_statements(film_ids: list = None):
+    """
+    Gets all of the select statements which have been recorded by the telemetry.
+    The ids in the temporary tables are not kept, so statements which used them are checked with the tables filled in with film_ids instead
+
+    :param: film_ids: list - the ids to put into the temporary tables
+
+    :return: statements: dict - {statement: (parameters, WhereStatement or None, table)}
+    """
+    film_ids = film_ids or list(range(1, 1001))
+    statements = {}
+    for statement, totals in list(telemetry.statements.items()):
+        if not statement.startswith("SELECT"):
+            continue
+        id_sets = {int(number) for number in findall(r"temp\.IdSet(\d+)", statement)}
+        where_statement = None
+        if id_sets:
+            where_statement = WhereStatement()
+            where_statement.id_sets = [film_ids]*(max(id_sets)+1)
+        statements[statement] = (totals.get("parameters", []), where_statement, totals["table"])
+    return statements
+
+
+def indexes_used(query_plan: list):
+    """
+    :param: query_plan: list
+
+    :return: TYPE: set - the names of the indexes which sqlite uses in the query plan
+    """
+    return {match for detail in query_plan for match in findall(r"USING (?:COVERING )?INDEX (\w+)", detail)}
+
+
+def finds_full_scans(statement: str, parameters, where_statement: WhereStatement = None):
+    """
+    Runs EXPLAIN QUERY PLAN on the statement, and finds each table which sqlite has to go through every row of.
+    Scans of the temporary tables are ignored since they only have the ids which are being looked up
+
+    :param: statement: str
+
+    :param: parameters: list
+
+    :param: where_statement: WhereStatement - if it has large lists of ids which need to be loaded first
+
+    :return: query_plan: list
+
+    :return: scans: list
+    """
+    with pool.connection() as db:
+        if where_statement is not None:
+            loads_id_sets(db, where_statement)
+        query_plan = [row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()]
+        if where_statement is not None:
+            empties_id_sets(db, where_statement)
+    scans = [detail for detail in query_plan if detail.startswith("SCAN") and "IdSet" not in detail and "CONSTANT ROW" not in detail]
+    return query_plan, scans
+
+
+def covering_index(statement: str):
+    """
+    The covering index for a select statement on one table, as it is built by formulas.builds_statement:
+    the fields which are compared with "=" or IN first, then one field which is compared with ">" or "<", then the fields it is ordered by,
+    and then every other field which it reads, so sqlite can find the rows and read them from the index alone.
+    Statements which join tables, or which do not filter on anything (they read the whole table anyway), do not get one
+
+    :param: statement: str
+
+    :return: TYPE: tuple or None - (table, fields)
+    """
+    match = fullmatch(r"SELECT (.+) FROM (\w+) WHERE (.+?)(?: ORDER BY (.+))?", statement)
+    if match is None:
+        return None
+    fields, table, where, ordering = match.groups()
+    equal, ranged, others = [], [], []
+    for condition in where.split(" AND "):
+        compared = fullmatch(r"(\w+) (=|IN|>|<|>=|<=|!=|NOT IN) .*", condition)
+        if compared is None:
+            continue # e.g. the "1" when there are no conditions, or a raw condition
+        field, operator = compared.groups()
+        if operator in ("=", "IN"):
+            equal += [field]
+        elif operator in (">", "<", ">=", "<=") and not ranged:
+            ranged += [field]
+        else:
+            others += [field] # can't be looked up with the index, but is still read from it
+    if not equal + ranged:
+        return None
+    ordered = [fullmatch(r"(\w+)(?: ASC| DESC)?", part.strip()) for part in (ordering or "").split(",") if part.strip()]
+    read = [findall(r"^(?:CAST\()?(\w+)", part.strip()) for part in fields.split(",")]
+    columns = equal + ranged + [part.group(1) for part in ordered if part] + others + [field[0] for field in read if field]
+    columns = [column for column in dict.fromkeys(columns) if column.lower() not in ("rowid", "count", "max", "min", "sum", "total")]
+    return table, ", ".join(columns)
+
+
+def generated_indexes(scanning_statements: list, known_indexes: list = None):
+    """
+    The covering indexes for the statements which scan a whole table, leaving out any where an index which is already known
+    starts with the same field and has all of the fields in it, since sqlite can already answer the statement from that index
+
+    :param: scanning_statements: list - of the statements which scan a whole table
+
+    :param: known_indexes: list - of (name, table, fields), INDEXES if not given
+
+    :return: indexes: list - of (name, table, fields)
+    """
+    known = [(table, fields.split(", ")) for _, table, fields in (INDEXES if known_indexes is None else known_indexes)]
+    indexes = []
+    for statement in scanning_statements:
+        index = covering_index(statement)
+        if index is None:
+            continue
+        table, fields = index
+        columns = fields.split(", ")
+        if any(table == known_table and known_columns[0] == columns[0] and set(columns) <= set(known_columns) for known_table, known_columns in known):
+            continue
+        known += [(table, columns)]
+        indexes += [(f"{table}By{''.join(fields.replace(' ', '').split(','))}", table, fields)]
+    return indexes
+
+
+def times_statement(statement: str, parameters, where_statement: WhereStatement = None, repeats: int = 20):
+    """
+    :param: statement: str
+
+    :param: parameters: list
+
+    :param: where_statement: WhereStatement
+
+    :param: repeats: int
+
+    :return: TYPE: float - the average time the statement takes to run in milliseconds
+    """
+    with pool.connection() as db:
+        if where_statement is not None:
+            loads_id_sets(db, where_statement)
+        start_time = perf_counter()
+        for _ in range(repeats):
+            db.execute(statement, parameters).fetchall()
+        seconds = perf_counter()-start_time
+        if where_statement is not None:
+            empties_id_sets(db, where_statement)
+    return seconds*1000/repeats
+
+
+def missing_indexes(extra_indexes: list = ()):
+    """
+    The indexes from INDEXES (and extra_indexes) which are not in the database yet, only for tables which are in the database
+
+    :param: extra_indexes: list - of (name, table, fields), e.g. from "generated_indexes"
+
+    :return: TYPE: list - of the CREATE INDEX statements to run
+    """
+    with pool.connection() as db:
+        existing = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()}
+        tables = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+    return [f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({fields})" for name, table, fields in INDEXES + list(extra_indexes)
+        if name not in existing and table in tables]
+
+
+def retired_indexes():
+    """
+    The indexes from RETIRED_INDEXES which are still in the database
+
+    :return: TYPE: list - of the DROP INDEX statements to run
+    """
+    with pool.connection() as db:
+        existing = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()}
+    return [f"DROP INDEX IF EXISTS {name}" for name in RETIRED_INDEXES if name in existing]
+
+
+def applies_index_migration(extra_indexes: list = ()):
+    """
+    Creates all of the indexes which are missing and drops the retired ones, it can be run any amount of times since indexes which are already
+    in the right state are skipped, and then runs ANALYZE so that sqlite knows how useful each index is when it is planning queries
+
+    :param: extra_indexes: list - of (name, table, fields), e.g. from "generated_indexes"
+
+    :return: created: list - the statements which were run
+    """
+    created = missing_indexes(extra_indexes) + retired_indexes()
+    if created:
+        with pool.connection() as db:
+            for statement in created:
+                db.execute(statement)
+            db.execute("ANALYZE")
+            db.commit()
+    return created
+
+
+def advises_indexes(apply: bool = False, film_ids: list = None):
+    """
+    Checks the query plan of every statement which the telemetry has recorded, printing the ones which scan a whole table and how long each statement takes.
+    A covering index is made for each statement which scans the whole of its table, unless an index in INDEXES already starts with the same fields.
+    If apply is True then those and the missing indexes from INDEXES are created, the query plans and times are checked again afterwards,
+    and any index from INDEXES which none of the statements use is printed, so the list can be kept in step with the queries which are really run
+
+    :param: apply: bool
+
+    :param: film_ids: list - the ids to put into the temporary tables
+
+    :return: report: list - of dictionaries, one for each statement
+    """
+    statements = collects_statements(film_ids)
+    report = []
+    for statement, (parameters, where_statement, table) in statements.items():
+        _, scans = finds_full_scans(statement, parameters, where_statement)
+        report += [{"statement": statement, "table": table, "scans_before": scans, "ms_before": times_statement(statement, parameters, where_statement)}]
+
+    generated = generated_indexes([row["statement"] for row in report if any(scan.startswith(f"SCAN {row['table']}") for scan in row["scans_before"])])
+    print("Missing indexes:")
+    for create_statement in missing_indexes(generated):
+        print(f"    {create_statement}")
+
+    if apply:
+        applies_index_migration(generated)
+        used = set()
+        for row in report:
+            parameters, where_statement, _ = statements[row["statement"]]
+            query_plan, row["scans_after"] = finds_full_scans(row["statement"], parameters, where_statement)
+            row["ms_after"] = times_statement(row["statement"], parameters, where_statement)
+            used |= indexes_used(query_plan)
+
+    for row in report:
+        line = f"{row['ms_before']:8.3f}ms"
+        if apply:
+            line += f" -> {row['ms_after']:8.3f}ms"
+        line += f"  {row['statement'][:110]}"
+        print(line)
+        for scan in row["scans_before"]:
+            print(f"{'':14}before: {scan}")
+        for scan in row.get("scans_after", []):
+            print(f"{'':14}after:  {scan}")
+
+    if apply:
+        print("Indexes which none of the recorded statements use:")
+        for name, table, fields in INDEXES:
+            if name not in used:
+                print(f"    {name} ON {table} ({fields})")
+    return report
+
+
+if __name__ == "__main__":
+    # creates a synthetic catalog, records the queries which the recommendations run,
+    # then shows which of them scan whole tables and how long they take before and after the indexes are added
+    from tempfile import TemporaryDirectory
+    from core_algos.synthetic_catalog import creates_synthetic_catalog
+
+    with TemporaryDirectory() as folder:
+        creates_synthetic_catalog(f"{folder}/synthetic.db")
+        records_query_shapes(user_ids= [1, 2, 3])
+        advises_indexes(apply= True, film_ids= list(range(1, 20000, 331)))
+        pool.closes_all()
@@ -0,0 +1,111 @@
+from threading import Lock
+from time import monotonic
+
+# imports from my project
+from core_algos.formulas import groupings, selects_info_from_database, WhereStatement
+from core_algos.table_versions import table_versions
+
+
+REFRESH_SECONDS = 5 # how often the link tables are checked for changes, the index is only read again if they have changed
+PERSON_TYPES = ("Actor", "Director") # the tables are "{person_type}Integrator" with the fields "FilmID, {person_type}ID"
+
+
+class PeopleIndex:
+    """
+    Every film each actor (or director) has been in, and every actor in each film, kept in memory so the films for a set of people are found
+    with set algebra rather than a query. Each direction is a ColumnarGroups, so all of the lists are stored as 2 flat arrays
+    (the film ids one after another, and where each person's films start) instead of a list for each person.
+    Each person's films are in order, smallest id first
+
+    :param: link_data: list - of (FilmID, PersonID) from the Integrator table
+    """
+    def __init__(self, link_data: list):
+        links = set(link_data) # the same person can be added to the same film more than once
+        self.films_of_person = groupings(sorted((person_id, film_id) for film_id, person_id in links))
+        self.people_of_film = groupings(sorted(links))
+
+
+    def films_of(self, person_id: int):
+        """
+        :param: person_id: int
+
+        :return: TYPE: list - the film ids, smallest first, empty if the person is not in the index
+        """
+        return self.films_of_person[person_id] if person_id in self.films_of_person else []
+
+
+    def films_of_any(self, person_ids):
+        """
+        :param: person_ids: iterable
+
+        :return: TYPE: set - every film which atleast one of the people has been in
+        """
+        films = set()
+        for person_id in set(person_ids):
+            films.update(self.films_of(person_id))
+        return films
+
+
+    def people_in(self, film_id: int):
+        """
+        :param: film_id: int
+
+        :return: TYPE: list - the person ids, smallest first, empty if the film is not in the index
+        """
+        return self.people_of_film[film_id] if film_id in self.people_of_film else []
+
+
+def table_version(person_type: str):
+    """
+    Changes whenever a row of the table is added, changed or removed, without reading the whole table
+
+    :param: person_type: str
+
+    :return: TYPE: tuple
+    """
+    return table_versions([f"{person_type}Integrator"])
+
+
+index_lock = Lock()
+index_state = {} # {person_type: (PeopleIndex, version, the time the version was last checked)}
+
+
+def loads_people_indexes():
+    """
+    Reads the actor and director indexes, e.g. when the website starts, so the first recommendation does not have to wait for them
+    """
+    for person_type in PERSON_TYPES:
+        people_index(person_type)
+
+
+def people_index(person_type: str):
+    """
+    The index shared by the whole process, read the first time it is needed,
+    and read again if the table has changed, which is checked at most once every REFRESH_SECONDS
+
+    :param: person_type: str - "Actor" or "Director"
+
+    :return: TYPE: PeopleIndex
+    """
+    if person_type not in PERSON_TYPES:
+        raise ValueError(f"{person_type} is not one of {PERSON_TYPES}") # it is put into the sql, so only these are allowed
+    with index_lock:
+        index, version, checked_at = index_state.get(person_type, (None, None, 0.0))
+        if index is None or monotonic() - checked_at > REFRESH_SECONDS:
+            new_version = table_version(person_type)
+            if index is None or new_version != version:
+                index = PeopleIndex(selects_info_from_database(f"FilmID, {person_type}ID", f"{person_type}Integrator", WhereStatement()))
+            index_state[person_type] = (index, new_version, monotonic())
+        return index
+
+
+def reloads_people_indexes():
+    """
+    Makes the indexes be read again the next time they are needed, without waiting for REFRESH_SECONDS
+    """
+    with index_lock:
+        index_state.clear()
+
+
+if __name__ == "__main__":
+    pass
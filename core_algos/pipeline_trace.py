@@ -0,0 +1,116 @@
+from contextlib import contextmanager, nullcontext
+from time import perf_counter, time
+import json
+import logging
+
+# imports from my project
+from core_algos.formulas import current_query_tally
+
+
+trace_log = logging.getLogger("films.recommendation_trace")
+
+
+class PipelineTrace:
+    """
+    Records how long each stage of a run took, how many queries it ran (and the rows and time of them) and any amounts it was given,
+    e.g. the amount of candidates which came out of that stage.
+    The queries are counted by the query telemetry, for every query run in the same thread (or context) while the trace is running.
+    When the run finishes the whole trace is logged as one line of JSON to "films.recommendation_trace"
+    e.g. with trace.runs():
+             with trace.stage("filtering"):
+                 ...
+             trace.counts("filtering", not_wanted= 10)
+
+    :param: name: str
+
+    :param: details: - anything to add to the trace, e.g. user_id= 1
+    """
+    def __init__(self, name: str, **details):
+        self.name = name
+        self.details = details
+        self.stages = {} # {stage: {"seconds": float, "queries": int, "query_seconds": float, "rows": int, and any amounts}} in the order they were run
+        self.seconds = 0.0
+        self.started_at = None
+        self.__tally = {"queries": 0, "seconds": 0.0, "rows": 0}
+
+
+    @contextmanager
+    def runs(self):
+        """
+        Around the whole run, so the queries are counted and the trace is logged at the end even if the run stops early or fails
+        """
+        self.started_at = time()
+        token = current_query_tally.set(self.__tally)
+        start_time = perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds = perf_counter()-start_time
+            current_query_tally.reset(token)
+            trace_log.info(json.dumps(self.as_dict()), extra= {"trace": self.as_dict()})
+
+
+    @contextmanager
+    def stage(self, stage: str):
+        """
+        Around one stage of the run, running the same stage again adds onto it
+
+        :param: stage: str
+        """
+        before = dict(self.__tally)
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(stage, {"seconds": 0.0, "queries": 0, "query_seconds": 0.0, "rows": 0})
+            totals["seconds"] += perf_counter()-start_time
+            totals["queries"] += self.__tally["queries"] - before["queries"]
+            totals["query_seconds"] += self.__tally["seconds"] - before["seconds"]
+            totals["rows"] += self.__tally["rows"] - before["rows"]
+
+
+    def counts(self, stage: str, **amounts):
+        """
+        Adds amounts to a stage, e.g. trace.counts("director_candidates", films= 120), counting the same stage again adds onto it
+
+        :param: stage: str
+
+        :param: amounts: int
+        """
+        totals = self.stages.setdefault(stage, {"seconds": 0.0, "queries": 0, "query_seconds": 0.0, "rows": 0})
+        for amount_name, amount in amounts.items():
+            totals[amount_name] = totals.get(amount_name, 0) + amount
+
+
+    def as_dict(self):
+        """
+        :return: TYPE: dict
+        """
+        return {"trace": self.name, **self.details, "started_at": self.started_at, "seconds": self.seconds,
+            "queries": self.__tally["queries"], "query_seconds": self.__tally["seconds"], "stages": self.stages}
+
+
+class NoTrace:
+    """
+    Used when tracing is turned off, it has the same methods as PipelineTrace but does not record anything
+    """
+    stages = {}
+
+    def runs(self):
+        return nullcontext(self)
+
+    def stage(self, stage: str):
+        return nullcontext()
+
+    def counts(self, stage: str, **amounts):
+        pass
+
+    def as_dict(self):
+        return {}
+
+
+NO_TRACE = NoTrace()
+
+
+if __name__ == "__main__":
+    pass
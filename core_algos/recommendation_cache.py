@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+
+
+RECOMMENDATION_CACHE_SIZE = 1000 # the amount of users whose last recommendation is kept, the least recently used are removed first
+
+
+def profile_fingerprint(favourites: list, ratings: list):
+    """
+    Changes whenever the user favourites, unfavourites or rates a film (or changes a rating), and is the same whatever order the rows are read in
+
+    :param: favourites: list - of (FilmID,)
+
+    :param: ratings: list - of (FilmID, Overall, Actors, Quality)
+
+    :return: TYPE: str
+    """
+    return blake2b(repr((sorted(favourites), sorted(ratings))).encode(), digest_size= 16).hexdigest()
+
+
+class RecommendationCache:
+    """
+    The last recommendation made for each user, along with the fingerprint of their favourites and ratings at the time,
+    so asking again without favouriting or rating anything new gives back the same recommendation straight away.
+    An entry is only used if the fingerprint still matches, and the write routes also remove the user's entry so it does not take up space
+
+    :param: size: int
+    """
+    def __init__(self, size: int = RECOMMENDATION_CACHE_SIZE):
+        self.size = size
+        self.__lock = Lock()
+        self.__entries = OrderedDict() # {user_id: (fingerprint, recommendation_created, recommendation_rows)}, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+
+    def gets(self, user_id: int, fingerprint: str):
+        """
+        :param: user_id: int
+
+        :param: fingerprint: str
+
+        :return: TYPE: tuple or None - (recommendation_created, recommendation_rows), None if there is not one for this fingerprint
+        """
+        with self.__lock:
+            entry = self.__entries.get(user_id)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1], list(entry[2])
+
+
+    def keeps(self, user_id: int, fingerprint: str, recommendation_created: bool, recommendation_rows: list):
+        """
+        :param: user_id: int
+
+        :param: fingerprint: str
+
+        :param: recommendation_created: bool
+
+        :param: recommendation_rows: list
+        """
+        with self.__lock:
+            self.__entries[user_id] = (fingerprint, recommendation_created, list(recommendation_rows))
+            self.__entries.move_to_end(user_id)
+            while len(self.__entries) > self.size:
+                self.__entries.popitem(last= False)
+                self.evictions += 1
+
+
+    def invalidates(self, user_id: int):
+        """
+        Removes the user's recommendation, called when they favourite, unfavourite or rate a film
+
+        :param: user_id: int
+        """
+        with self.__lock:
+            if self.__entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+
+    def stats(self):
+        """
+        :return: TYPE: dict
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.__entries), "size": self.size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits/lookups if lookups else 0.0, "invalidations": self.invalidations, "evictions": self.evictions}
+
+
+recommendation_cache = RecommendationCache()
+
+
+if __name__ == "__main__":
+    pass
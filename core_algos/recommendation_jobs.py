@@ -0,0 +1,134 @@
+from threading import Thread, Lock
+from queue import Queue
+from collections import OrderedDict
+from itertools import count
+from time import time
+import logging
+
+# imports from my project
+from core_algos.formulas import sets_route_label
+from core_algos.calc_recommendations import RecommendedFilms
+
+
+RECOMMENDATION_WORKERS = 2 # the amount of threads which make recommendations in the background
+JOB_HISTORY = 1000 # the amount of finished jobs which are kept so their status can still be read
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+job_log = logging.getLogger("films.recommendation_jobs")
+
+
+class RecommendationJobQueue:
+    """
+    Makes recommendations in background threads, so the request which asks for them does not wait for "RecommendedFilms" to finish.
+    Asking again for a user who already has a job waiting in the queue gives back the same job rather than adding another one,
+    so many clicks of "regenerate" only make the recommendations once.
+    If the user's job is already running then one more job is kept for them, since their favourites or ratings may have changed after it started,
+    it is only put on the queue once the running job has finished, so 2 jobs for the same user never run at the same time
+
+    :param: workers: int
+    """
+    def __init__(self, workers: int = RECOMMENDATION_WORKERS):
+        self.workers = workers
+        self.__queue = Queue()
+        self.__lock = Lock()
+        self.__jobs = OrderedDict() # {job_id: job dictionary}, oldest first
+        self.__queued_job_of_user = {} # {user_id: job_id} for the jobs which have not started yet
+        self.__running_users = set() # the users whose job is running
+        self.__held_job_of_user = {} # {user_id: job_id} for the jobs waiting for the same user's running job to finish before they are queued
+        self.__job_ids = count(1)
+        self.__threads = []
+
+
+    def __starts_threads(self):
+        """
+        The threads are only started the first time a job is submitted, so importing the module does not start them
+        """
+        if not self.__threads:
+            self.__threads = [Thread(target= self.__runs_jobs, name= f"recommendation-job-{i}", daemon= True) for i in range(self.workers)]
+            for thread in self.__threads:
+                thread.start()
+
+
+    def submits(self, user_id: int):
+        """
+        Adds a job to make the user's recommendations, unless they already have one waiting
+
+        :param: user_id: int
+
+        :return: TYPE: dict - the status of the job, the same as "status"
+        """
+        with self.__lock:
+            job_id = self.__queued_job_of_user.get(user_id)
+            if job_id is None: # coalesces with the job which is already waiting
+                job_id = next(self.__job_ids)
+                self.__jobs[job_id] = {"job_id": job_id, "user_id": user_id, "status": QUEUED, "recommendation_created": None,
+                    "from_cache": None, "error": None, "submitted_at": time(), "started_at": None, "finished_at": None}
+                self.__queued_job_of_user[user_id] = job_id
+                self.__forgets_old_jobs()
+                if user_id in self.__running_users:
+                    self.__held_job_of_user[user_id] = job_id # queued by "__runs_jobs" once the running job has finished
+                else:
+                    self.__queue.put(job_id)
+            self.__starts_threads()
+            return dict(self.__jobs[job_id])
+
+
+    def status(self, job_id: int):
+        """
+        :param: job_id: int
+
+        :return: TYPE: dict or None - None if there is no job with that id (or it is too old to be kept)
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            return dict(job) if job else None
+
+
+    def __forgets_old_jobs(self):
+        """
+        Removes the oldest finished jobs once there are more than JOB_HISTORY, jobs which have not finished are always kept
+        """
+        finished = [job_id for job_id, job in self.__jobs.items() if job["status"] in (DONE, FAILED)]
+        for job_id in finished[:max(len(self.__jobs) - JOB_HISTORY, 0)]:
+            del self.__jobs[job_id]
+
+
+    def __runs_jobs(self):
+        """
+        Each worker thread takes the next job from the queue and makes the recommendations, forever
+        """
+        while True:
+            job_id = self.__queue.get()
+            with self.__lock:
+                job = self.__jobs[job_id]
+                del self.__queued_job_of_user[job["user_id"]] # another request for this user now makes a new job
+                self.__running_users.add(job["user_id"])
+                job["status"], job["started_at"] = RUNNING, time()
+            sets_route_label("recommendation_job") # so the query telemetry adds these queries to their own route
+            try:
+                recommendation = RecommendedFilms(job["user_id"])
+                recommendation_created, from_cache, status, error = recommendation.recommendation_created, recommendation.from_cache, DONE, None
+            except Exception as exception:
+                job_log.exception("recommendation job %s for user %s failed", job_id, job["user_id"])
+                recommendation_created, from_cache, status, error = False, False, FAILED, repr(exception)
+            with self.__lock:
+                job.update(status= status, recommendation_created= recommendation_created, from_cache= from_cache, error= error, finished_at= time())
+                self.__running_users.discard(job["user_id"])
+                held_job_id = self.__held_job_of_user.pop(job["user_id"], None)
+                if held_job_id is not None:
+                    self.__queue.put(held_job_id) # before task_done, so "waits_for_all" also waits for it
+            self.__queue.task_done()
+
+
+    def waits_for_all(self):
+        """
+        Blocks until every job which has been submitted has finished, e.g. before the website is stopped
+        """
+        self.__queue.join()
+
+
+recommendation_jobs = RecommendationJobQueue()
+
+
+if __name__ == "__main__":
+    pass
@@ -1,9 +1,13 @@
 from spellchecker import SpellChecker
 from json import load
 from collections import Counter
+import logging
 
 # imports from my project
-from core_algos.formulas import binary_search, selects_info_from_database
+from core_algos.formulas import binary_search, selects_info_from_database, WhereStatement
+
+
+search_log = logging.getLogger("films.search")
 
 
 def spell_checks_query(query: list):
@@ -126,37 +130,29 @@ def gathering_data(corrected_querried: list, year_criteria: list, genre_criteria
         FIELD = "Actor"
     else:
         FIELD = "Director"
-    where_statement = "("
+    where_statement = WhereStatement().like_any(f"{FIELD}Name", corrected_querried)
     join_statement = ""
-    for index, element in enumerate(corrected_querried):
-        where_statement += f" {FIELD}Name like '%{element}%'"
-        if index+1 != len(corrected_querried):
-            where_statement += " OR"
-        else:
-            where_statement += ")"
 
     if not film_actor_or_director: # the user is searching for a film
         if year_criteria:
-            
-            
-            where_statement += f" AND ReleaseDate > {year_criteria[0]} AND ReleaseDate < {year_criteria[1]+1}" # adds it to the where statement
+            where_statement.greater_than("ReleaseDate", year_criteria[0]).less_than("ReleaseDate", year_criteria[1]+1) # adds it to the where statement
         if genre_criteria: # the genreid may be 0. So will need to send None if the user does not select anything
             # Menu on the website to select the genre.
             # The user select the genre name which they want to see films for, from a checklist
             # With the menu on the website the id of the item will be the genre id, so will pass the genre id into the function
             
-            where_statement += f" AND GenreID IN {'('+str(genre_criteria)[1:-1]+')'} AND GenreToFilm.FilmID = Films.FilmID"
+            where_statement.is_in("GenreID", genre_criteria).raw("GenreToFilm.FilmID = Films.FilmID")
             join_statement += " JOIN GenreToFilm"
         if language_criteria:
             # same principle as the genres
-            where_statement += f" AND LanguageID IN {'('+str(language_criteria)[1:-1]+')'} AND LanguageToFilm.FilmID = Films.FilmID" 
+            where_statement.is_in("LanguageID", language_criteria).raw("LanguageToFilm.FilmID = Films.FilmID")
             join_statement += " JOIN LanguageToFilm"
         return selects_info_from_database("Films.FilmID, Films.FilmName", "Films"+join_statement, where_statement)
         # selects and returns all of the Film IDs and Film Names from the database for the criteria
     
     else:
         if year_criteria: # Same as for films, just different field names
-            where_statement += f" AND DOB > {year_criteria[0]} AND DOB < {year_criteria[1]+1}"
+            where_statement.greater_than("DOB", year_criteria[0]).less_than("DOB", year_criteria[1]+1)
         return selects_info_from_database(f"{FIELD}ID, {FIELD}Name", f"{FIELD}s", where_statement)
 
 
@@ -261,7 +257,7 @@ def finding_top_data(tallied_data, original_query: str, film_actor_or_director:
                 all_ids.remove(id2)
 
         if not film_actor_or_director: # FOR FILMS
-            films = [i[0] for i in selects_info_from_database("FilmID", "Economy", f"FilmID IN {'('+(str(all_ids))[1:-1]+')'} ORDER BY GrossRevenue DESC")]
+            films = [i[0] for i in selects_info_from_database("FilmID", "Economy", WhereStatement().is_in("FilmID", all_ids).order_by("GrossRevenue DESC"))]
             for id3 in films:
                 all_ids.remove(id3) 
             # Calls the function it to just order it the films by revenue
@@ -287,7 +283,7 @@ def finding_top_data(tallied_data, original_query: str, film_actor_or_director:
         if not film_actor_or_director:
             for film_ids in grouped_occurence.values():
                 if film_ids:
-                    from_db = [i[0] for i in selects_info_from_database("FilmID", "Economy", f"FilmID IN {'('+(str(film_ids))[1:-1]+')'} ORDER BY GrossRevenue DESC")]
+                    from_db = [i[0] for i in selects_info_from_database("FilmID", "Economy", WhereStatement().is_in("FilmID", film_ids).order_by("GrossRevenue DESC"))]
                     to_display += from_db[:50-count]
                     count += len(from_db)
                     if count >= 50:
@@ -369,7 +365,7 @@ def searching_algorithm_gathers_film_ids_to_display(query: str, year_criteria: l
     data = gathering_data(common_words_removed, year_criteria, genre_criteria, language_criteria, film_actor_or_director)
     # where data is all of the potential, film, actor or director ids from the database
     amount_of_films_or_people_filtered_through = len(data)
-    print(f"CONSOLE OUTPUT ONLY: Amount of {film_actor_or_director} (number is type) found in database is --- {amount_of_films_or_people_filtered_through}")
+    search_log.debug("%s %s (number is type) found in the database", amount_of_films_or_people_filtered_through, film_actor_or_director)
     
     if not data: # no data gathered from the database
         tallied_data = []
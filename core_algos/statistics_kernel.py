@@ -0,0 +1,175 @@
+from math import comb, fsum, lgamma, log, exp, sqrt, inf
+from functools import lru_cache
+from itertools import accumulate, repeat
+from operator import mul, sub
+from array import array
+
+
+TABLE_CACHE_SIZE = 64 # the amount of binomial tables (one for each trial and probability) kept in memory
+SUMMED_RANGE = 1024 # ranges shorter than this are added up term by term, longer ones use the cdf table
+SMALLEST_CDF_DIFFERENCE = 1e-9 # below this, taking away two cdf values would lose too much to rounding
+CANCELLATION_RATIO = 1e-6 # a variance smaller than this times the squared mean is worked out again with the values shifted, see "means_and_sds"
+
+
+def means_and_sds(columns: list):
+    """
+    Calculates the mean and standard deviation for every list of values given, in one call.
+    The totals are added up with "fsum" and "map(mul)" so that all of the adding is done in C rather than in a python loop,
+    and fsum stops rounding errors building up when there are millions of values.
+    If the values are large compared to how spread out they are (e.g. dates as numbers), taking away the squared mean would lose
+    most of the variance to rounding, so they are worked out again shifted by the first value, which does not change the variance.
+    The variance is never allowed to be below 0, which rounding errors could otherwise cause when every value is the same
+
+    :param: columns: list - a list of lists of values
+
+    :return: TYPE: list - of (mean, sd) tuples, in the same order as the columns
+    """
+    results = []
+    for values in columns:
+        amount = len(values)
+        mean = fsum(values)/amount
+        variance = fsum(map(mul, values, values))/amount - mean*mean
+        if variance < mean*mean*CANCELLATION_RATIO:
+            shifted = list(map(sub, values, repeat(values[0], amount)))
+            shifted_mean = fsum(shifted)/amount
+            variance = fsum(map(mul, shifted, shifted))/amount - shifted_mean*shifted_mean
+        results += [(mean, sqrt(max(variance, 0.0)))]
+    return results
+
+
+def log_combination(total: int, position: int):
+    """
+    The natural log of nCr, this will never overflow, so it can be used for the amount of combinations for thousands of films
+
+    :param: total: int
+
+    :param: position: int
+
+    :return: TYPE: float
+    """
+    return lgamma(total+1) - lgamma(position+1) - lgamma(total-position+1)
+
+
+def combination(total: int, position: int):
+    """
+    nCr as a float, worked out exactly with "math.comb" then converted,
+    if it is too big to be a float then infinity is given instead of an error
+
+    :param: total: int
+
+    :param: position: int
+
+    :return: TYPE: float
+    """
+    try:
+        return float(comb(total, position))
+    except OverflowError:
+        return inf
+
+
+@lru_cache(maxsize= TABLE_CACHE_SIZE)
+def binomial_tables(trial: int, probability: float):
+    """
+    Works out the probability of every amount of successes from 0 to trial, along with the running total (cdf) of them.
+    Every term is worked out in log space, so nothing overflows or underflows to 0 part way through,
+    e.g. 1000 trials no longer needs 1000! which can't be turned into a float.
+    The tables are kept, so asking for another range for the same trial and probability does not need to work them out again
+
+    :param: trial: int
+
+    :param: probability: float
+
+    :return: pmf: array - pmf[i] is the probability of getting exactly i
+
+    :return: cdf: array - cdf[i] is the probability of getting i or less
+    """
+    if probability <= 0 or probability >= 1:
+        # every trial gives the same result, so all of the probability is on one value
+        pmf = array("d", bytes(8*(trial+1)))
+        pmf[trial if probability >= 1 else 0] = 1.0
+    else:
+        log_probability = log(probability)
+        log_opposite = log(1-probability)
+        log_trial_factorial = lgamma(trial+1)
+        pmf = array("d", (exp(log_trial_factorial - lgamma(i+1) - lgamma(trial-i+1) + i*log_probability + (trial-i)*log_opposite)
+            for i in range(trial+1)))
+    cdf = array("d", accumulate(pmf))
+    return pmf, cdf
+
+
+def binomial_pmf(successes: int, trial: int, probability: float):
+    """
+    The probability of getting exactly that amount of successes
+
+    :param: successes: int
+
+    :param: trial: int
+
+    :param: probability: float
+
+    :return: TYPE: float
+    """
+    if successes < 0 or successes > trial:
+        return 0.0
+    return binomial_tables(trial, probability)[0][successes]
+
+
+def binomial_cdf(successes: int, trial: int, probability: float):
+    """
+    The probability of getting that amount of successes or less
+
+    :param: successes: int
+
+    :param: trial: int
+
+    :param: probability: float
+
+    :return: TYPE: float
+    """
+    if successes < 0:
+        return 0.0
+    return min(binomial_tables(trial, probability)[1][min(successes, trial)], 1.0)
+
+
+def binomial_range(lower: int, upper: int, trial: int, probability: float):
+    """
+    The probability of getting between lower and upper successes (inclusive).
+    Long ranges take away two values from the cdf table, short ranges and very small probabilities add up the terms with fsum,
+    so that small tails are not lost to rounding
+
+    :param: lower: int
+
+    :param: upper: int
+
+    :param: trial: int
+
+    :param: probability: float
+
+    :return: TYPE: float or None - None if lower is greater than upper
+    """
+    if lower > upper:
+        return None
+    pmf, cdf = binomial_tables(trial, probability)
+    lower, upper = max(lower, 0), min(upper, trial)
+    if upper < lower:
+        return 0.0
+    if upper - lower >= SUMMED_RANGE:
+        value = cdf[upper] - (cdf[lower-1] if lower else 0.0)
+        if value > SMALLEST_CDF_DIFFERENCE:
+            return min(value, 1.0)
+    return fsum(pmf[lower: upper+1])
+
+
+def binomial_ranges(queries: list):
+    """
+    "binomial_range" for many queries in one call, queries with the same trial and probability share one table
+
+    :param: queries: list - of (lower, upper, trial, probability) tuples
+
+    :return: TYPE: list - the probability for each query, in the same order
+    """
+    return [binomial_range(lower, upper, trial, probability) for lower, upper, trial, probability in queries]
+
+
+if __name__ == "__main__":
+    pass
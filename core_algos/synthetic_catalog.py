@@ -0,0 +1,99 @@
+from sqlite3 import connect
+from random import Random
+
+# imports from my project
+from core_algos.formulas import configures_pool
+
+
+SCHEMA = [
+    "CREATE TABLE Films (FilmID INTEGER PRIMARY KEY, FilmName TEXT, Link INTEGER, Length INTEGER, Colour INTEGER, ReleaseDate TEXT, ImageURL TEXT)",
+    "CREATE TABLE Economy (FilmID INTEGER PRIMARY KEY, Budget INTEGER, GrossRevenue INTEGER)",
+    "CREATE TABLE Actors (ActorID INTEGER PRIMARY KEY, ActorName TEXT, ImageURL TEXT, DOB INTEGER)",
+    "CREATE TABLE Directors (DirectorID INTEGER PRIMARY KEY, DirectorName TEXT, ImageURL TEXT, DOB INTEGER)",
+    "CREATE TABLE ActorIntegrator (FilmID INTEGER, ActorID INTEGER)",
+    "CREATE TABLE DirectorIntegrator (FilmID INTEGER, DirectorID INTEGER)",
+    "CREATE TABLE GenreNames (GenreID INTEGER PRIMARY KEY, Genre TEXT)",
+    "CREATE TABLE GenreToFilm (FilmID INTEGER, GenreID INTEGER)",
+    "CREATE TABLE Language (LanguageID INTEGER PRIMARY KEY, Language TEXT)",
+    "CREATE TABLE LanguageToFilm (FilmID INTEGER, LanguageID INTEGER)",
+    "CREATE TABLE Favourites (FilmID INTEGER, UserID INTEGER, DateAdded TEXT)",
+    "CREATE TABLE Ratings (Overall INTEGER, Comedy INTEGER, Actors INTEGER, Quality INTEGER, FilmID INTEGER, UserID INTEGER)",
+    "CREATE TABLE Recommendations (FilmID INTEGER, UserID INTEGER, Liked INTEGER)",
+    "CREATE TABLE TopRated (FilmID INTEGER, AverageRating REAL, Chategory TEXT, Priority INTEGER)",
+]
+# the tables and fields which the project uses, without any indexes apart from the primary keys
+
+UNKNOWN_PERSON_ID = 888888888888 # the same unknown ids which are used in gathering_types.py
+UNKNOWN_GENRE_ID = 1
+UNKNOWN_LANGUAGE_ID = 75
+
+
+def creates_synthetic_catalog(database_path: str, films: int = 20000, actors: int = 8000, directors: int = 2000,
+        users: int = 200, rated_per_user: int = 40, favourited_per_user: int = 20, seed: int = 1):
+    """
+    Creates a database with the same tables as the real one filled in with random films, people, ratings and favourites,
+    so that the algorithms can be timed and checked without the real database. The same seed always creates the same database.
+    Afterwards the pool is pointed at the new database
+
+    :param: database_path: str
+
+    :param: films: int
+
+    :param: actors: int
+
+    :param: directors: int
+
+    :param: users: int
+
+    :param: rated_per_user: int
+
+    :param: favourited_per_user: int
+
+    :param: seed: int
+    """
+    random = Random(seed)
+    with connect(database_path) as db:
+        for statement in SCHEMA:
+            db.execute(statement)
+
+        db.executemany("INSERT INTO Films VALUES (?, ?, ?, ?, ?, ?, ?)", [(film_id, f"Film {film_id}", film_id, 
+            random.choice([-1] + [random.randint(70, 180)]*9), random.choice([-1, 1, 2, 2, 2, 2, 2, 2]),
+            f"{random.randint(1965, 2019)}-{random.randint(1, 12):02}-{random.randint(1, 28):02}", "U") for film_id in range(1, films+1)])
+        db.executemany("INSERT INTO Economy VALUES (?, ?, ?)", [(film_id, random.choice([-1, random.randint(10**5, 10**8)]),
+            random.choice([-1, random.randint(10**5, 10**9)])) for film_id in range(1, films+1) if random.random() < .6])
+        db.executemany("INSERT INTO Actors VALUES (?, ?, ?, ?)", [(actor_id, f"Actor {actor_id}", "U", random.randint(1920, 2000)) for actor_id in range(1, actors+1)])
+        db.executemany("INSERT INTO Directors VALUES (?, ?, ?, ?)", [(director_id, f"Director {director_id}", "U", random.randint(1920, 1990))
+            for director_id in range(1, directors+1)])
+        db.executemany("INSERT INTO GenreNames VALUES (?, ?)", [(genre_id, f"Genre {genre_id}") for genre_id in range(1, 29)])
+        db.executemany("INSERT INTO Language VALUES (?, ?)", [(language_id, f"Language {language_id}") for language_id in range(1, 81)])
+
+        actor_links = []
+        director_links = []
+        genre_links = []
+        language_links = []
+        for film_id in range(1, films+1):
+            # popular people are in more films, so that users end up with people in common between their films
+            actor_links += [(film_id, actor_id) for actor_id in {int(random.paretovariate(1.2)) % actors + 1 for _ in range(random.randint(1, 8))}]
+            director_links += [(film_id, random.choice([UNKNOWN_PERSON_ID, int(random.paretovariate(1.5)) % directors + 1]))]
+            genre_links += [(film_id, genre_id) for genre_id in (set(random.sample(range(2, 29), random.randint(1, 3))) if random.random() > .05 else {UNKNOWN_GENRE_ID})]
+            language_links += [(film_id, language_id) for language_id in ({1} | set(random.sample(range(2, 81), random.randint(0, 2))) if random.random() > .05 else {UNKNOWN_LANGUAGE_ID})]
+        db.executemany("INSERT INTO ActorIntegrator VALUES (?, ?)", actor_links)
+        db.executemany("INSERT INTO DirectorIntegrator VALUES (?, ?)", director_links)
+        db.executemany("INSERT INTO GenreToFilm VALUES (?, ?)", genre_links)
+        db.executemany("INSERT INTO LanguageToFilm VALUES (?, ?)", language_links)
+
+        ratings = []
+        favourites = []
+        for user_id in range(1, users+1):
+            for film_id in random.sample(range(1, films+1), rated_per_user):
+                ratings += [tuple(random.choice([-1, random.randint(1, 10)]) for _ in range(4)) + (film_id, user_id)]
+            for film_id in random.sample(range(1, films+1), favourited_per_user):
+                favourites += [(film_id, user_id, "2019-11-01")]
+        db.executemany("INSERT INTO Ratings VALUES (?, ?, ?, ?, ?, ?)", ratings)
+        db.executemany("INSERT INTO Favourites VALUES (?, ?, ?)", favourites)
+        db.commit()
+    configures_pool(database_path)
+
+
+if __name__ == "__main__":
+    pass
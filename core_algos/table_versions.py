@@ -0,0 +1,54 @@
+from threading import Lock
+
+# imports from my project
+from core_algos.formulas import current_pool, selects_info_from_database, WhereStatement
+
+
+VERSIONS_TABLE = "TableVersions"
+TRACKED_TABLES = ["Films", "LanguageToFilm", "GenreToFilm", "ActorIntegrator", "DirectorIntegrator"]
+# the tables which are kept in memory by film_catalog.py and people_index.py
+EVENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+def creates_version_triggers(tables: list = TRACKED_TABLES):
+    """
+    Creates a table with a number for each tracked table, and triggers which add 1 to it whenever a row of that table is added, changed or removed,
+    by anything which writes to the database (the website, a script adding films or the sqlite shell).
+    So whether a table has changed is found with one lookup rather than by reading the table, and unlike "COUNT(*), MAX(rowid)" it changes on an update aswell
+
+    :param: tables: list - some of TRACKED_TABLES
+    """
+    with current_pool().connection() as db:
+        db.execute(f"CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (TableName TEXT PRIMARY KEY, Version INTEGER)")
+        db.executemany(f"INSERT OR IGNORE INTO {VERSIONS_TABLE} VALUES (?, 0)", [(table,) for table in tables])
+        for table in tables:
+            for event in EVENTS:
+                db.execute(f"CREATE TRIGGER IF NOT EXISTS {table}Version{event.title()} AFTER {event} ON {table} "
+                    f"BEGIN UPDATE {VERSIONS_TABLE} SET Version = Version + 1 WHERE TableName = '{table}'; END")
+        db.commit()
+
+
+versions_lock = Lock()
+versioned_tables = set() # (database path, table) for every table which the triggers have been created for by this process
+
+
+def table_versions(tables: list):
+    """
+    The triggers are created the first time the versions of a database are needed, so the versions always start from when the triggers existed
+
+    :param: tables: list - some of TRACKED_TABLES
+
+    :return: TYPE: tuple - the path of the database then the version of each table, it is different whenever any of the tables have changed
+    """
+    database_path = current_pool().path
+    with versions_lock:
+        new_tables = [table for table in tables if (database_path, table) not in versioned_tables]
+        if new_tables:
+            creates_version_triggers(new_tables)
+            versioned_tables.update((database_path, table) for table in new_tables)
+    versions = dict(selects_info_from_database("TableName, Version", VERSIONS_TABLE, WhereStatement())) # only has a row for each tracked table
+    return (database_path, *(versions[table] for table in tables))
+
+
+if __name__ == "__main__":
+    pass
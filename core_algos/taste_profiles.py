@@ -0,0 +1,442 @@
+from contextlib import contextmanager
+from queue import Queue, Empty
+from sqlite3 import OperationalError
+from threading import Thread, Lock
+import logging
+
+# imports from my project
+from core_algos.formulas import pool, selects_info_from_database, sets_route_label, transaction, WhereStatement
+from core_algos.gathering_types import genre_mask
+from core_algos.recommendation_cache import recommendation_cache
+
+
+TABLE = "TasteProfiles"
+KEY_FIELDS = "UserID, Field, ID"
+AMOUNT_FIELDS = "Amount, Total, TotalOfSquares"
+CREATE_TABLE = (f"CREATE TABLE IF NOT EXISTS {TABLE} (UserID INTEGER, Field TEXT, ID INTEGER, Amount INTEGER, Total INTEGER, TotalOfSquares INTEGER, "
+    "PRIMARY KEY (UserID, Field, ID)) WITHOUT ROWID")
+# each user has one row for every thing which is counted about their favourited and rated films, e.g.
+# ("Films", 0) the amount of films the profile was made from, including any which are not in the Films table,
+# ("Length", 0) the amount of films, total runtime and total of the squared runtimes, ("Colour", 2) the amount of films in colour,
+# ("ActorID", 123) the amount of the user's films that actor is in and the ratings of those films added up
+REWEIGHTS_TABLE = "TasteProfileReweights"
+CREATE_REWEIGHTS_TABLE = (f"CREATE TABLE IF NOT EXISTS {REWEIGHTS_TABLE} (ChangeID INTEGER PRIMARY KEY, FilmID INTEGER, UserIDs TEXT, "
+    "Overall INTEGER, Actors INTEGER, Quality INTEGER)")
+# a change to the weights of a film which has not been added to the profiles of the other users who had the film yet,
+# UserIDs is those users seperated by commas, and Overall, Actors and Quality are how much each weight went up or down
+
+UNKNOWN_RUNTIME = -1 # the same unknown ids which are used in gathering_types.py
+UNKNOWN_LANGUAGE_ID = 75
+UNKNOWN_PERSON_ID = 888888888888
+UNKNOWN_GENRE_ID = 1
+LINKS = [("ActorID", "ActorIntegrator", "Actors", UNKNOWN_PERSON_ID), ("DirectorID", "DirectorIntegrator", "Quality", UNKNOWN_PERSON_ID),
+    ("GenreID", "GenreToFilm", "Overall", UNKNOWN_GENRE_ID)]
+# (field, table, the rating chategory which is added up for it, unknown id)
+RATING_CHATEGORIES = ("Overall", "Actors", "Quality")
+
+reweight_log = logging.getLogger("films.taste_profiles")
+
+
+def creates_taste_profiles_table(unit = None):
+    """
+    Creates the tables for the profiles and the changes of weights if they do not exist yet, so it can be run every time the website starts.
+    If a unit is given then they are created inside of its transaction, so the writes after it can use the tables straight away
+
+    :param: unit: UnitOfWork
+    """
+    if unit is not None:
+        for statement in (CREATE_TABLE, CREATE_REWEIGHTS_TABLE):
+            unit.db.execute(statement)
+        return
+    with pool.connection() as db:
+        for statement in (CREATE_TABLE, CREATE_REWEIGHTS_TABLE):
+            db.execute(statement)
+        db.commit()
+
+
+class PersistedUserProfile:
+    """
+    The user's profile which has already been added up, read with 1 query.
+    It has the same methods as gathering_types.UserProfile which the 7 analyses use, so it can be given to them instead,
+    the only differences are that ties are in order of the most common and then the smallest id, rather than the order the films were read in
+    (the totals are kept as films are favourited and rated, so the order they were read in is not known),
+    and a film without any ratings always counts as 5 for its actors, directors and genres
+
+    :param: user_id: int
+    """
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queries = 1
+        self.__rows = {} # {field: {id: (amount, total, total of squares)}}
+        for field, data_id, amount, total, total_of_squares in selects_info_from_database(f"Field, ID, {AMOUNT_FIELDS}", TABLE,
+                WhereStatement().equals("UserID", user_id).greater_than("Amount", 0).order_by("Field, Amount DESC, ID")):
+            self.__rows.setdefault(field, {})[data_id] = (amount, total, total_of_squares)
+
+
+    def __row(self, field: str, data_id: int):
+        return self.__rows.get(field, {}).get(data_id, (0, 0, 0))
+
+
+    def __known(self, field: str, UNKNOWN_ID: int):
+        return [(data_id, row) for data_id, row in self.__rows.get(field, {}).items() if data_id != UNKNOWN_ID]
+
+
+    def amount_of_films(self):
+        """
+        :return: TYPE: int
+        """
+        return self.__row("Films", 0)[0]
+
+
+    def runtime_totals(self, UNKNOWN_ID: int):
+        """
+        The same as "UserProfile.runtime_totals"
+        """
+        amount, total, total_of_squares = self.__row("Length", 0)
+        return total, total_of_squares, amount, self.__row("Length", UNKNOWN_ID)[0]
+
+
+    def year_totals(self):
+        """
+        The same as "UserProfile.year_totals"
+        """
+        amount, total, total_of_squares = self.__row("Year", 0)
+        return total, total_of_squares, amount
+
+
+    def colour_amounts(self):
+        """
+        The same as "UserProfile.colour_amounts"
+        """
+        return {colour_id: amount for colour_id, (amount, _, _) in self.__rows.get("Colour", {}).items()}
+
+
+    def language_amounts(self, field: str, table: str, UNKNOWN_ID: int):
+        """
+        The same as "UserProfile.language_amounts", the Total of each language is the amount of films where it is the only known language
+        """
+        known = self.__known(field, UNKNOWN_ID)
+        return (self.__row(field, UNKNOWN_ID)[0], {language_id: amount for language_id, (amount, _, _) in known},
+            {language_id: singles for language_id, (_, singles, _) in known if singles > 0})
+
+
+    def tallies(self, field: str, table: str, rating_chategory: str, UNKNOWN_ID: int):
+        """
+        The same as "UserProfile.tallies", the Total of each id is its ratings added up
+        """
+        known = self.__known(field, UNKNOWN_ID)
+        return (self.__row(field, UNKNOWN_ID)[0], {data_id: amount for data_id, (amount, _, _) in known},
+            {data_id: total for data_id, (_, total, _) in known if total > 0})
+
+
+    def genre_masks(self, field: str, table: str, UNKNOWN_ID: int):
+        """
+        The same as "UserProfile.genre_masks"
+        """
+        masks = []
+        for mask, (amount, _, _) in self.__rows.get("GenreMask", {}).items():
+            masks += [mask]*amount
+        return masks
+
+
+def film_weights(unit, film_id: int):
+    """
+    What each rating chategory of the film adds to its actors, directors and genres, from every user's ratings of it.
+    An unknown rating (-1) counts as 5, and if nobody has rated the film then it counts as 5
+
+    :param: unit: UnitOfWork
+
+    :param: film_id: int
+
+    :return: TYPE: dict - {rating chategory: weight}
+    """
+    ratings = unit.selects("Overall, Actors, Quality", "Ratings", WhereStatement().equals("FilmID", film_id))
+    if not ratings:
+        return {"Overall": 5, "Actors": 5, "Quality": 5}
+    weights = {}
+    for column, rating_chategory in enumerate(RATING_CHATEGORIES):
+        weights[rating_chategory] = sum(5 if row[column] == -1 else row[column] for row in ratings if row[column] == -1 or row[column] > 0)
+    return weights
+
+
+def film_facts(unit, film_id: int):
+    """
+    Everything about a film which is counted in the profiles
+
+    :param: unit: UnitOfWork
+
+    :param: film_id: int
+
+    :return: TYPE: dict - {"Films": (Length, Colour, ReleaseDate) or None, "LanguageID": [ids], "ActorID": [ids], "DirectorID": [ids], "GenreID": [ids]}
+    """
+    where = WhereStatement().equals("FilmID", film_id)
+    films_row = unit.selects("Length, Colour, ReleaseDate", "Films", where)
+    facts = {"Films": films_row[0] if films_row else None,
+        "LanguageID": [i[0] for i in unit.selects("LanguageID", "LanguageToFilm", where)]}
+    for field, table, _, _ in LINKS:
+        facts[field] = [i[0] for i in unit.selects(field, table, where)]
+    return facts
+
+
+def film_contribution(facts: dict, weights: dict):
+    """
+    The rows which one film adds onto a profile
+
+    :param: facts: dict - from "film_facts"
+
+    :param: weights: dict - from "film_weights"
+
+    :return: TYPE: list - of (Field, ID, Amount, Total, TotalOfSquares)
+    """
+    if facts["Films"] is None:
+        return [("Films", 0, 1, 0, 0)] # the film is not in the database, it is still one of the user's films the same as in gathering_types.UserProfile
+    length, colour_id, date = facts["Films"]
+    year = int(date[:4])
+    rows = [("Films", 0, 1, 0, 0), ("Length", 0, 1, length, length**2), ("Year", 0, 1, year, year**2), ("Colour", colour_id, 1, 0, 0)]
+    if length == UNKNOWN_RUNTIME:
+        rows += [("Length", UNKNOWN_RUNTIME, 1, 0, 0)]
+
+    known_languages = [language_id for language_id in facts["LanguageID"] if language_id != UNKNOWN_LANGUAGE_ID]
+    for language_id in facts["LanguageID"]:
+        rows += [("LanguageID", language_id, 1, int(len(known_languages) == 1 and language_id != UNKNOWN_LANGUAGE_ID), 0)]
+
+    for field, _, rating_chategory, UNKNOWN_ID in LINKS:
+        for data_id in facts[field]:
+            rows += [(field, data_id, 1, 0 if data_id == UNKNOWN_ID else weights[rating_chategory], 0)]
+
+    mask = genre_mask([genre_id for genre_id in facts["GenreID"] if genre_id != UNKNOWN_GENRE_ID])
+    if mask:
+        rows += [("GenreMask", mask, 1, 0, 0)]
+    return rows
+
+
+def profile_contains(unit, user_id: int, film_id: int):
+    """
+    :param: unit: UnitOfWork
+
+    :param: user_id: int
+
+    :param: film_id: int
+
+    :return: TYPE: bool - if the user has favourited or rated the film
+    """
+    where = WhereStatement().equals("FilmID", film_id).equals("UserID", user_id)
+    return bool(unit.selects("FilmID", "Favourites", where) or unit.selects("FilmID", "Ratings", where))
+
+
+def adds_to_profiles(unit, user_ids: list, rows: list, sign: int = 1):
+    """
+    Adds (or takes away if sign is -1) the rows onto every one of the users profiles
+
+    :param: unit: UnitOfWork
+
+    :param: user_ids: list
+
+    :param: rows: list - of (Field, ID, Amount, Total, TotalOfSquares)
+
+    :param: sign: int
+    """
+    unit.increments(TABLE, KEY_FIELDS, AMOUNT_FIELDS, [(user_id, field, data_id, sign*amount, sign*total, sign*total_of_squares)
+        for user_id in user_ids for field, data_id, amount, total, total_of_squares in rows])
+
+
+def weight_changes(facts: dict, differences: dict):
+    """
+    :param: facts: dict - from "film_facts"
+
+    :param: differences: dict - {rating chategory: how much its weight went up or down}
+
+    :return: TYPE: list - of (Field, ID, Amount, Total, TotalOfSquares) to add onto the profile of every user who has the film
+    """
+    return [(field, data_id, 0, differences[rating_chategory], 0)
+        for field, _, rating_chategory, UNKNOWN_ID in LINKS for data_id in facts[field] if data_id != UNKNOWN_ID]
+
+
+def applies_reweights(unit, film_id: int = None):
+    """
+    Adds the changes of weights which are waiting in REWEIGHTS_TABLE onto the profiles of the users who had the film when it changed,
+    and removes them from the table in the same transaction, so each one is only ever added once
+
+    :param: unit: UnitOfWork
+
+    :param: film_id: int - only adds the changes for this film, if None then every change is added
+
+    :return: TYPE: set - the users whose profiles have changed
+    """
+    where = WhereStatement() if film_id is None else WhereStatement().equals("FilmID", film_id)
+    reweights = unit.selects(f"ChangeID, FilmID, UserIDs, {', '.join(RATING_CHATEGORIES)}", REWEIGHTS_TABLE, where)
+    changed_users = set()
+    for _, reweighted_film_id, user_ids, *differences in reweights:
+        user_ids = [int(user_id) for user_id in user_ids.split(",") if user_id]
+        adds_to_profiles(unit, user_ids, weight_changes(film_facts(unit, reweighted_film_id), dict(zip(RATING_CHATEGORIES, differences))))
+        changed_users.update(user_ids)
+    if reweights:
+        unit.deletes(REWEIGHTS_TABLE, WhereStatement().is_in("ChangeID", [change_id for change_id, *_ in reweights]))
+    return changed_users
+
+
+class ReweightQueue:
+    """
+    Adds the changes of weights in REWEIGHTS_TABLE onto the other users' profiles in a background thread, once the request which rated the film has committed,
+    then removes those users' cached recommendations, since they were made from the old weights.
+    Every run adds all of the changes which are waiting, so any amount of requests while it is running only make it run once more
+    """
+    def __init__(self):
+        self.__queue = Queue()
+        self.__lock = Lock()
+        self.__thread = None
+
+
+    def submits(self):
+        """
+        Makes the thread add the changes which are waiting, the thread is only started the first time, so importing the module does not start it
+        """
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = Thread(target= self.__runs, name= "taste-profile-reweights", daemon= True)
+                self.__thread.start()
+        self.__queue.put(None)
+
+
+    def __runs(self):
+        """
+        Waits for a request, then adds every change which is waiting, forever
+        """
+        while True:
+            requests = [self.__queue.get()]
+            try:
+                while True:
+                    requests += [self.__queue.get_nowait()] # they are all covered by this run
+            except Empty:
+                pass
+            sets_route_label("taste_profile_reweights") # so the query telemetry adds these queries to their own route
+            try:
+                with transaction() as unit:
+                    changed_users = applies_reweights(unit)
+                for user_id in changed_users:
+                    recommendation_cache.invalidates(user_id)
+            except Exception:
+                reweight_log.exception("the changes of weights could not be added to the taste profiles, they are kept for the next run")
+            for _ in requests:
+                self.__queue.task_done()
+
+
+    def waits_for_all(self):
+        """
+        Blocks until every change which has been submitted has been added, e.g. before the website is stopped
+        """
+        self.__queue.join()
+
+
+profile_reweights = ReweightQueue()
+
+
+@contextmanager
+def updates_taste_profiles(unit, user_id: int, film_id: int):
+    """
+    Put around the writes to the Favourites or Ratings table for a film, in the same transaction.
+    Afterwards, if the film has been added to or removed from the user's profile, its contribution is added or taken away.
+    If the ratings of the film have changed, the difference is added to the user's own profile straight away,
+    and is kept in REWEIGHTS_TABLE along with every other user who has the film, so it is added to their profiles in the background
+    rather than the request waiting for all of them. The users are found now, so a user who adds the film before it runs
+    (and is given the new weights) is not changed, and any changes to the film which are still waiting are added first,
+    so a user who removes the film takes away exactly what their profile has.
+    Yields the set of the other users whose profiles were changed, which is filled in afterwards,
+    it should be given to "finishes_taste_profile_updates" once the transaction has committed
+    e.g. with transaction() as unit:
+             with updates_taste_profiles(unit, user_id, film_id) as changed_profiles:
+                 unit.inserts(...)
+         finishes_taste_profile_updates(changed_profiles)
+
+    :param: unit: UnitOfWork
+
+    :param: user_id: int
+
+    :param: film_id: int
+    """
+    creates_taste_profiles_table(unit) # otherwise the favourite or rating would be rolled back if the website was started without making the table
+    changed_profiles = applies_reweights(unit, film_id) - {user_id} # the changes to this film which are still waiting, see above
+    was_in_profile = profile_contains(unit, user_id, film_id)
+    old_weights = film_weights(unit, film_id)
+    yield changed_profiles
+    is_in_profile = profile_contains(unit, user_id, film_id)
+    new_weights = film_weights(unit, film_id)
+    if was_in_profile == is_in_profile and old_weights == new_weights:
+        return # nothing which is counted has changed
+
+    facts = film_facts(unit, film_id)
+    if new_weights != old_weights:
+        where = WhereStatement().equals("FilmID", film_id)
+        other_users = {i[0] for i in unit.selects("UserID", "Favourites", where) + unit.selects("UserID", "Ratings", where)} - {user_id}
+        # every other profile with this film in it, the user's own profile is changed below
+        differences = {rating_chategory: new_weights[rating_chategory] - old_weights[rating_chategory] for rating_chategory in RATING_CHATEGORIES}
+        if other_users:
+            unit.inserts(f"(FilmID, UserIDs, {', '.join(RATING_CHATEGORIES)})", REWEIGHTS_TABLE,
+                [(film_id, ",".join(map(str, sorted(other_users))), *(differences[rating_chategory] for rating_chategory in RATING_CHATEGORIES))])
+        if was_in_profile and is_in_profile:
+            adds_to_profiles(unit, [user_id], weight_changes(facts, differences))
+
+    if was_in_profile and not is_in_profile:
+        adds_to_profiles(unit, [user_id], film_contribution(facts, old_weights), -1)
+        unit.deletes(TABLE, WhereStatement().equals("UserID", user_id).equals("Amount", 0)) # removes anything which is no longer counted
+    elif is_in_profile and not was_in_profile:
+        adds_to_profiles(unit, [user_id], film_contribution(facts, new_weights))
+
+
+def finishes_taste_profile_updates(changed_profiles: set):
+    """
+    Called once the transaction with "updates_taste_profiles" has committed, removes the cached recommendations of the other users whose profiles it changed,
+    and starts adding any change of weights onto the profiles of the other users who have the film, in the background
+
+    :param: changed_profiles: set - yielded by "updates_taste_profiles"
+    """
+    for user_id in changed_profiles:
+        recommendation_cache.invalidates(user_id)
+    profile_reweights.submits()
+
+
+def rebuilds_taste_profile(user_id: int):
+    """
+    Works out the user's profile again from all of their favourited and rated films,
+    used for users whose profile was not made as they favourited and rated films (e.g. from before the profiles were added)
+
+    :param: user_id: int
+    """
+    with transaction() as unit:
+        changed_profiles = applies_reweights(unit) - {user_id} # so a change which is waiting is not added on top of the profile which is worked out here
+        where = WhereStatement().equals("UserID", user_id)
+        unit.deletes(TABLE, where)
+        films = {i[0] for i in unit.selects("FilmID", "Favourites", where) + unit.selects("FilmID", "Ratings", where)}
+        rows = []
+        for film_id in films:
+            rows += film_contribution(film_facts(unit, film_id), film_weights(unit, film_id))
+        adds_to_profiles(unit, [user_id], rows)
+    for other_user_id in changed_profiles:
+        recommendation_cache.invalidates(other_user_id)
+
+
+def loads_taste_profile(user_id: int, films: list):
+    """
+    Reads the user's profile, if it was not made from the same amount of films as the user has favourited and rated
+    (e.g. they have not been added up yet) then it is worked out again first.
+    Films which are not in the Films table are counted aswell, so they do not make it be worked out again every time
+
+    :param: user_id: int
+
+    :param: films: list - all of the films which the user has favourited and rated
+
+    :return: profile: PersistedUserProfile
+    """
+    try:
+        profile = PersistedUserProfile(user_id)
+    except OperationalError: # the table has not been made yet, e.g. the website has not been started since the profiles were added
+        creates_taste_profiles_table()
+        profile = PersistedUserProfile(user_id)
+    if profile.amount_of_films() != len(films):
+        rebuilds_taste_profile(user_id)
+        profile = PersistedUserProfile(user_id)
+    return profile
+
+
+if __name__ == "__main__":
+    pass
@@ -1,14 +1,19 @@
 from flask import Flask, render_template, url_for, flash, redirect, jsonify, session, request
 from datetime import datetime, timedelta
 from math import ceil
-from threading import Thread
+from asyncio import gather
 import json
 
 # imports from my project
-from core_algos.formulas import selects_info_from_database, deletes_from_database, inserts_info_to_database
+from core_algos.formulas import selects_info_from_database, transaction, sets_route_label, WhereStatement
 from core_algos.searching_algorithm import searching_algorithm_gathers_film_ids_to_display
 from searching.leaderboards import gathers_top_films_from_database_on_request, creating_and_updating_top_ratings_for_leaderboards
-from core_algos.calc_recommendations import RecommendedFilms
+from core_algos.index_advisor import applies_index_migration
+from core_algos.async_formulas import database_executor, selects_all_at_once, selects_info_from_database_async
+from core_algos.taste_profiles import creates_taste_profiles_table, updates_taste_profiles, finishes_taste_profile_updates, profile_reweights
+from core_algos.recommendation_jobs import recommendation_jobs
+from core_algos.people_index import people_index, loads_people_indexes
+from core_algos.recommendation_cache import recommendation_cache
 
 from searching.format_film_dict import turning_film_information_into_dictionary
 
@@ -24,6 +29,32 @@ user_login = json.loads("user_login.json", "r")
 app = Flask(__name__)
 app.permanent_session_lifetime = timedelta(hours = 4.0) # logs user out after 4 hours
 
+
+async def users_favourites_and_ratings(user_id: int):
+    """
+    Gathers the films the user has favourited and the films they have rated at the same time,
+    these are needed by every page which displays films
+
+    :param: user_id: int
+
+    :return: current_favourites: list
+
+    :return: rated_films: list
+    """
+    favourites, ratings = await selects_all_at_once(
+        ("FilmID", "Favourites", WhereStatement().equals("UserID", user_id)),
+        ("FilmID", "Ratings", WhereStatement().equals("UserID", user_id)))
+    return [i[0] for i in favourites], [i[0] for i in ratings]
+
+
+@app.before_request
+def labels_queries_with_route():
+    """
+    Tells the query telemetry which route is being loaded, so every query run for this request is added to the totals for that route
+    """
+    sets_route_label(request.endpoint or request.path)
+
+
 @app.route("/") # blank route will be redirected to this page
 @app.route("/home") # the main route to this page
 def home_page():
@@ -92,7 +123,7 @@ def gathering_film_search_query_information():
 
 
 @app.route("/films-gathered-1")
-def films_gathered():
+async def films_gathered():
     """
     Gathers all of the top 50 film ids for the query the user has entered, with the filters applied.
     for the top 10 films from the algorithm, it will fetch the information about those and display
@@ -135,10 +166,8 @@ def films_gathered():
             return redirect(url_for("home_page"))
 
         else:
-            current_favourites = [i[0] for i in selects_info_from_database("FilmID", "Favourites", f"UserID ={session['user_id']}")]
-            # These are all of the films which the user has favourited
-            rated_films = [i[0] for i in selects_info_from_database("FilmID", "Ratings", f"UserID ={session['user_id']}")]
-            # used to tell the user which films they have rated
+            user_id = session["user_id"]
+            # the favourited films and the rated films are gathered while the search is running
 
             year_criteria = []
             genre_criteria = []
@@ -161,10 +190,11 @@ def films_gathered():
             else: 
                 language_criteria = []
         
-            film_ids, amount_of_films_filtered_through = searching_algorithm_gathers_film_ids_to_display(
-                    user_input, year_criteria, genre_criteria, language_criteria, 0)
-            # all of the film ids from the search query which the user has entered
-            films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = turning_film_information_into_dictionary(film_ids[:10], True)
+            (current_favourites, rated_films), (film_ids, amount_of_films_filtered_through) = await gather(
+                users_favourites_and_ratings(user_id),
+                database_executor.runs(searching_algorithm_gathers_film_ids_to_display, user_input, year_criteria, genre_criteria, language_criteria, 0))
+            # the films the user has favourited and rated, and all of the film ids from the search query which the user has entered
+            films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = await database_executor.runs(turning_film_information_into_dictionary, film_ids[:10], True)
             # gets information about the first 10 films, (the ones which are most likely what the user is looking for)
 
         return render_template("search/films/display_film_information.html", films = films, actors = actor_dictionary, directors = director_dictionary,
@@ -179,7 +209,7 @@ def films_gathered():
 
 # a form tag has been used in the html code with the POST method, the route must identify which method is used so it can get the data
 @app.route("/films-gathered/<page_number>", methods = ["POST"])
-def displaying_10_films(page_number: str):
+async def displaying_10_films(page_number: str):
     """
     Renders the template for the next 10 films for the user,
     Similar to the "films_gathered" route but the film ids have already been gathered
@@ -209,13 +239,12 @@ def displaying_10_films(page_number: str):
             # then the page will display extra information and options to the user
             recommendation_page = True
         
-        current_favourites = [i[0] for i in selects_info_from_database("FilmID", "Favourites", f"UserID ={session['user_id']}")]
-        rated_films = [i[0] for i in selects_info_from_database("FilmID", "Ratings", f"UserID ={session['user_id']}")]
-
         lower = (int(page_number)-1)*10 # the lower index of the film ids
         upper = lower +10
-        films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = turning_film_information_into_dictionary(film_ids[lower:upper], True)
-        # gets the information about the 10 film ids specified
+        (current_favourites, rated_films), (films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary) = await gather(
+            users_favourites_and_ratings(session["user_id"]),
+            database_executor.runs(turning_film_information_into_dictionary, film_ids[lower:upper], True))
+        # gets the information about the 10 film ids specified, at the same time as the user's favourites and ratings
 
         return render_template("search/films/display_film_information.html", films = films, actors = actor_dictionary, directors = director_dictionary,
             genres = genre_dictionary, languages = language_dictionary,
@@ -253,8 +282,8 @@ def order_films_from_requested_attribute():
         if "Recommendation" in title:
             recommendation_page = True
 
-        current_favourites = [i[0] for i in selects_info_from_database("FilmID", "Favourites", f"UserID ={session['user_id']}")]
-        rated_films = [i[0] for i in selects_info_from_database("FilmID", "Ratings", f"UserID ={session['user_id']}")]
+        current_favourites = [i[0] for i in selects_info_from_database("FilmID", "Favourites", WhereStatement().equals("UserID", session["user_id"]))]
+        rated_films = [i[0] for i in selects_info_from_database("FilmID", "Ratings", WhereStatement().equals("UserID", session["user_id"]))]
         
         is_reverse = {"↓": True, "↑": False}[sort_attribute[-1]]
         attr_sort_key = sort_attribute[:-1].lower()
@@ -288,8 +317,12 @@ def favourite_a_films():
     """
     try:
         film_id = request.args.get("film_id") 
-        if not selects_info_from_database("FilmID","Favourites", f"FilmID = {film_id} AND UserID = {session['user_id']}"):
-            inserts_info_to_database("(FilmID, UserID, DateAdded)", "Favourites", [(film_id, session["user_id"], datetime.now().strftime("%Y-%m-%d"))])
+        with transaction() as unit: # the user's taste profile is updated along with the favourite
+            with updates_taste_profiles(unit, session["user_id"], film_id) as changed_profiles:
+                if not unit.selects("FilmID","Favourites", WhereStatement().equals("FilmID", film_id).equals("UserID", session["user_id"])):
+                    unit.inserts("(FilmID, UserID, DateAdded)", "Favourites", [(film_id, session["user_id"], datetime.now().strftime("%Y-%m-%d"))])
+        recommendation_cache.invalidates(session["user_id"]) # the next recommendation has to be made again
+        finishes_taste_profile_updates(changed_profiles) # and the other users' profiles which the film's weights changed
         return jsonify()
 
     except:
@@ -307,7 +340,11 @@ def remove_a_favourited_films():
     """
     try:
         film_id = request.args.get("film_id")
-        deletes_from_database("Favourites", f"FilmID = {film_id} AND UserID = {session['user_id']}")
+        with transaction() as unit: # the user's taste profile is updated along with the favourite
+            with updates_taste_profiles(unit, session["user_id"], film_id) as changed_profiles:
+                unit.deletes("Favourites", WhereStatement().equals("FilmID", film_id).equals("UserID", session["user_id"]))
+        recommendation_cache.invalidates(session["user_id"]) # the next recommendation has to be made again
+        finishes_taste_profile_updates(changed_profiles) # and the other users' profiles which the film's weights changed
         return jsonify()
 
     except:
@@ -317,7 +354,7 @@ def remove_a_favourited_films():
 
 
 @app.route("/favourite-films")
-def favourite_films():
+async def favourite_films():
     """
     Displays the user's favourited films, only the first 10, they can select to see the next page if they wish,
     and they will be redirected to the "displaying_10_films" route
@@ -330,14 +367,13 @@ def favourite_films():
             flash(["Login before entering: Favourites", "unsuccessful"])   
             return redirect(url_for("login"))
 
-        current_favourites = [i[0] for i in selects_info_from_database("FilmID", "Favourites", f"UserID ={session['user_id']}")]
-        rated_films = [i[0] for i in selects_info_from_database("FilmID", "Ratings", f"UserID ={session['user_id']}")]
+        current_favourites, rated_films = await users_favourites_and_ratings(session["user_id"])
         
         if not current_favourites:
             flash(["No films in your favourite list", "unsuccessful"])
             return redirect(url_for("home_page"))
         
-        films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = turning_film_information_into_dictionary(current_favourites[:10]) 
+        films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = await database_executor.runs(turning_film_information_into_dictionary, current_favourites[:10])
         return render_template("search/films/display_film_information.html", films = films, actors = actor_dictionary,
             directors = director_dictionary, genres = genre_dictionary, languages = language_dictionary,
             title = "Favourites: 1", current_favourites = current_favourites, rated_film = rated_films,
@@ -350,7 +386,7 @@ def favourite_films():
 
 
 @app.route("/recommendations")
-def recommendations():
+async def recommendations():
     """
     Displays the recommendations for the user,
     it will order the film_ids for that, the highest priority films are nearer the front of the list,
@@ -371,7 +407,10 @@ def recommendations():
         # these are the priorities, where 7 is for black and white films
         # 10 are the highest weighted films, followed by 9, 8, 0
 
-        all_current_recommendations_from_database = selects_info_from_database("FilmID, Liked", "Recommendations", f"UserID={session['user_id']}")
+        user_id = session["user_id"]
+        all_current_recommendations_from_database, (current_favourites, rated_films) = await gather(
+            selects_info_from_database_async("FilmID, Liked", "Recommendations", WhereStatement().equals("UserID", user_id)),
+            users_favourites_and_ratings(user_id))
         if len(all_current_recommendations_from_database) == 0:
             # the user has no recommendations, and need to rate and favourite more films
             films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = [], [], [], [], []
@@ -398,12 +437,9 @@ def recommendations():
 
                         if len(film_ids) > 0 and len(film_ids)%10 == 0: break
                         
-            films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = turning_film_information_into_dictionary(film_ids[:10])
+            films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = await database_executor.runs(turning_film_information_into_dictionary, film_ids[:10])
                 # they are not in any order for their sets of 10
 
-        current_favourites = [i[0] for i in selects_info_from_database("FilmID", "Favourites", f"UserID ={session['user_id']}")]
-        rated_films = [i[0] for i in selects_info_from_database("FilmID", "Ratings", f"UserID ={session['user_id']}")]
-
         return render_template("search/films/display_film_information.html", films = films, actors = actor_dictionary,
             directors = director_dictionary, genres = genre_dictionary, languages = language_dictionary,
             title= "Recommendations: 1", current_favourites = current_favourites, rated_film = rated_films,
@@ -426,11 +462,15 @@ def recommendation_liked_or_not_liked():
     try:
         film_id = request.args.get("film_id")
         val = request.args.get("value")
-        deletes_from_database("Ratings", f"FilmID = {film_id} AND UserID = {session['user_id']}")
-        # if the user already has already rated or commented on this recommendtion of the film, it is removed from the database
-        # so that the new rating can be added
-        inserts_info_to_database("(Overall, Comedy, Actors, Quality, FilmID, UserID)", "Ratings",
-            [(val,val,val,val, film_id, session["user_id"])])
+        with transaction() as unit: # so the old rating is only removed if the new one is added
+            with updates_taste_profiles(unit, session["user_id"], film_id) as changed_profiles: # and the taste profiles are changed in the same transaction
+                unit.deletes("Ratings", WhereStatement().equals("FilmID", film_id).equals("UserID", session["user_id"]))
+                # if the user already has already rated or commented on this recommendtion of the film, it is removed from the database
+                # so that the new rating can be added
+                unit.inserts("(Overall, Comedy, Actors, Quality, FilmID, UserID)", "Ratings",
+                    [(val,val,val,val, film_id, session["user_id"])])
+        recommendation_cache.invalidates(session["user_id"]) # the next recommendation has to be made again
+        finishes_taste_profile_updates(changed_profiles) # and the other users' profiles which the film's weights changed
         return jsonify()
 
     except:
@@ -441,21 +481,55 @@ def recommendation_liked_or_not_liked():
 @app.route("/placeholder-9")
 def saving_the_recommendations_to_database():
     """
-    Creates new recommendations for the user by calling the class "RecommendedFilms",
-    then it redirects back to the "recommendations" route to display all of the new recommendations
+    Adds a job to create new recommendations for the user in the background, by calling the class "RecommendedFilms",
+    then it redirects back straight away rather than waiting for the recommendations to be made.
+    If it is called from javascript (?format=json) then the job is returned, so "recommendation_job_status" can be polled until it has finished
 
     :return: flask-redirect: flask.redirect
+
+    :return: javascript-response: flask.jsonify - the job, with its id and status
     """
     try:
-        rec = RecommendedFilms(session["user_id"])
-        # creates new recommendations for the user
-        # the class "RecommendedFilms" is run, with all of its functions inside of it
-        if rec.recommendation_created:
-            flash(["Your recommendations have been created", "success"])
-        else:
-            flash(["Recommendation can't be created, there are not enough films rated and favourited", "unsuccessful"])
+        job = recommendation_jobs.submits(session["user_id"])
+        # if the user already has a job waiting then that job is given back, so clicking many times only makes the recommendations once
+        session["recommendation_job_id"] = job["job_id"]
+        if request.args.get("format") == "json":
+            return jsonify(job)
+        flash(["Your recommendations are being created", "success"])
         return redirect(url_for("home_page"))
-        # then redirect back to the recommendation page, so that the recommendations can be displayed to the user
+
+    except:
+        flash(["An error has occured, please try again.", "unsuccessful"])   
+    return redirect(url_for("home_page"))
+
+
+@app.route("/placeholder-9/cache")
+def recommendation_cache_stats():
+    """
+    The hits and misses of the recommendation cache, to see how often a recommendation did not need to be made again
+
+    :return: javascript-response: flask.jsonify - the counters from "RecommendationCache.stats"
+    """
+    return jsonify(recommendation_cache.stats())
+
+
+@app.route("/placeholder-9/status")
+@app.route("/placeholder-9/status/<int:job_id>")
+def recommendation_job_status(job_id: int = None):
+    """
+    The status of the user's recommendation job, which is polled by javascript until it is "done" or "failed",
+    "recommendation_created" is False when there are not enough films rated and favourited.
+    Without a job id the user's last job is given
+
+    :param: job_id: int
+
+    :return: javascript-response: flask.jsonify - the job, or an empty response if there is not one
+    """
+    try:
+        job = recommendation_jobs.status(job_id or session.get("recommendation_job_id"))
+        if job is None or job["user_id"] != session["user_id"]: # users can only see their own jobs
+            return jsonify({}), 404
+        return jsonify(job)
 
     except:
         flash(["An error has occured, please try again.", "unsuccessful"])   
@@ -487,7 +561,7 @@ def leaderboard():
 
 
 @app.route("/displaying-leaderboard", methods = ["POST"])
-def displaying_the_leaderboard_requestion():
+async def displaying_the_leaderboard_requestion():
     """
     Displays the information about the leaderboard requested by the user,
     with all of the filters applied, it will gather all of the film ids,
@@ -512,11 +586,11 @@ def displaying_the_leaderboard_requestion():
         if year_criteria[0] == 1965 and year_criteria[1] == datetime.now().year:
             year_criteria = []
 
-        film_ids = gathers_top_films_from_database_on_request(board, language_criteria, genre_criteria, year_criteria)
-        current_favourites = [i[0] for i in selects_info_from_database("FilmID", "Favourites", f"UserID ={session['user_id']}")]
-        rated_films = [i[0] for i in selects_info_from_database("FilmID", "Ratings", f"UserID ={session['user_id']}")]
+        film_ids, (current_favourites, rated_films) = await gather(
+            database_executor.runs(gathers_top_films_from_database_on_request, board, language_criteria, genre_criteria, year_criteria),
+            users_favourites_and_ratings(session["user_id"]))
 
-        films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = turning_film_information_into_dictionary(film_ids[:10], True)
+        films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = await database_executor.runs(turning_film_information_into_dictionary, film_ids[:10], True)
 
         return render_template("search/films/display_film_information.html", films=films, actors=actor_dictionary,
             directors=director_dictionary, genres=genre_dictionary,
@@ -530,7 +604,7 @@ def displaying_the_leaderboard_requestion():
 
 
 @app.route("/films-gathered-which-have-been-in", methods = ["POST"])
-def films_person_has_been_associated_with():
+async def films_person_has_been_associated_with():
     """
     This gets all of the films which the actors and directors have been in or directed,
     Gathers all of the film ids and displays the first 10
@@ -544,12 +618,10 @@ def films_person_has_been_associated_with():
         # gets the actor or director id from the html document from the form tag,
         # along with if its an actor or a director as person_type
 
-        current_favourites = [i[0] for i in selects_info_from_database("FilmID", "Favourites", f"UserID ={session['user_id']}")]
-        rated_films = [i[0] for i in selects_info_from_database("FilmID", "Ratings", f"UserID ={session['user_id']}")]
-
-        film_ids = [i[0] for i in selects_info_from_database("FilmID", f"{person_type}Integrator", f"{person_type}ID = {person_id} ORDER BY FilmID DESC")]
+        current_favourites, rated_films = await users_favourites_and_ratings(session["user_id"])
+        film_ids = people_index(person_type).films_of(int(person_id))[::-1] # from the index in memory, the newest films (largest ids) first
 
-        films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = turning_film_information_into_dictionary(film_ids[:10])
+        films, actor_dictionary, director_dictionary, genre_dictionary, language_dictionary = await database_executor.runs(turning_film_information_into_dictionary, film_ids[:10])
         # gets the information about the films they have been in.
 
         return render_template("search/films/display_film_information.html",  films = films, actors = actor_dictionary,
@@ -596,9 +668,9 @@ def login():
                 return redirect(url_for("login"))
             else:
                 session["user_id"] = validator_or_user_id 
-                Thread(target = RecommendedFilms, args = [validator_or_user_id]).start() 
-                # the recommendation class is called to generate the recommendations for the user
-                # everytime they login to the website
+                session["recommendation_job_id"] = recommendation_jobs.submits(validator_or_user_id)["job_id"]
+                # the recommendations are generated for the user in the background everytime they login to the website,
+                # using the same job queue as "saving_the_recommendations_to_database" so it is not made twice if they also ask for it
 
                 if "next_page" in session.keys():
                     new_route = session["next_page"]
@@ -623,4 +695,8 @@ def login():
 
 
 if __name__ == "__main__":
+    applies_index_migration() # creates any indexes which the database does not have yet, does nothing if they are all there
+    creates_taste_profiles_table()
+    profile_reweights.submits() # adds any changes of weights which were still waiting when the website was last stopped
+    loads_people_indexes() # so the first recommendation does not have to wait for them to be read
     app.run()
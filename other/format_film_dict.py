@@ -1,8 +1,13 @@
 from threading import Thread, active_count
-from time import time
+from contextvars import copy_context
+from time import perf_counter
+import logging
 
 # imports from my project
-from core_algos.formulas import selects_info_from_database
+from core_algos.formulas import selects_info_from_database, WhereStatement
+
+
+timing_log = logging.getLogger("films.timings") # debug messages for how long the python work between the queries takes, the queries are timed by the query telemetry
 
 class AllFilmAttributes:
     def __init__(self, film_id: int, film_title: str, link: int, length: int, colour: int, release: str, img_url: str):
@@ -46,7 +51,7 @@ def information_about_films_as_objects(film_ids: list):
 
     :return: all_objects_of_film_information: list
     """
-    film_data = selects_info_from_database("*", "Films", f"FilmID IN {'('+str(film_ids)[1:-1]+')'}")
+    film_data = selects_info_from_database("*", "Films", WhereStatement().is_in("FilmID", film_ids))
     all_objects_of_film_information = [AllFilmAttributes(film_id, name, link, length, colour, release_date, img_url) for
                 film_id, name, link, length, colour, release_date, img_url in film_data]
 
@@ -81,7 +86,7 @@ def adds_to_information_to_display_dictionary_for_films(information_about_films:
     else:
         img= "https://m.media-amazon.com/images" + film_object.img
 
-    economy = selects_info_from_database("Budget, GrossRevenue", "Economy", f"FilmID = {film_object.film_id}")
+    economy = selects_info_from_database("Budget, GrossRevenue", "Economy", WhereStatement().equals("FilmID", film_object.film_id))
     # the budget and revenue of the film is not stored in the main table, so will have to gather the information from a seperate table
     # it is not stored in the same table as quite alot of films have both the budget and the revenue unknown so that field would
     # of just been filled with alot of unknown values, and this method will reduce the file size of the database
@@ -110,13 +115,13 @@ def adds_to_information_to_display_dictionary_for_films(information_about_films:
         date += film_object.month + "/"
 
     # Genrs, Languags, Actors and directors
-    genre = [i[0] for i in selects_info_from_database("CAST(GenreID AS VARCHAR(11))", "GenreToFilm", f"FilmID = {film_object.film_id}")]
+    genre = [i[0] for i in selects_info_from_database("CAST(GenreID AS VARCHAR(11))", "GenreToFilm", WhereStatement().equals("FilmID", film_object.film_id))]
     # If they have have the same film_id then they will match genre_link is a list, ect... for other things.  removed it so that it is not a list of tuples
     # It is converted into a string with the CAST function in SQL, so that when the films are reordered by an attribute,
     # it works, since json.loads require all elements in a dictionary to have "double quotes" around them
-    language = [i[0] for i in selects_info_from_database("CAST(LanguageID AS VARCHAR(11))", "LanguageToFilm", f"FilmID = {film_object.film_id}")]
-    actor = [i[0] for i in selects_info_from_database("CAST(ActorID AS VARCHAR(11))", "ActorIntegrator", f"FilmID = {film_object.film_id}")]
-    director = [i[0] for i in selects_info_from_database("CAST(DirectorID AS VARCHAR(11))", "DirectorIntegrator", f"FilmID = {film_object.film_id}")]
+    language = [i[0] for i in selects_info_from_database("CAST(LanguageID AS VARCHAR(11))", "LanguageToFilm", WhereStatement().equals("FilmID", film_object.film_id))]
+    actor = [i[0] for i in selects_info_from_database("CAST(ActorID AS VARCHAR(11))", "ActorIntegrator", WhereStatement().equals("FilmID", film_object.film_id))]
+    director = [i[0] for i in selects_info_from_database("CAST(DirectorID AS VARCHAR(11))", "DirectorIntegrator", WhereStatement().equals("FilmID", film_object.film_id))]
 
     # adds the ids for the actors, directors, genres and languages, to the list which contains all of the ids for the page which
     # will be displayed, so that later on it can gather information specifically about each one, without passing in repeated info
@@ -158,7 +163,7 @@ def turning_film_information_into_dictionary(film_ids: list, ordered: bool = Fal
 
     :return: languages: dict
     """
-    start_time = time()
+    start_time = perf_counter()
 
     all_film_information_objects = information_about_films_as_objects(film_ids)
     # gathers all of the main information about the films from the film table in the database, and turns them into objects
@@ -170,14 +175,15 @@ def turning_film_information_into_dictionary(film_ids: list, ordered: bool = Fal
     all_genre_ids_related_to_films = []
     all_language_ids_related_to_films = []
 
-    print(f"CONSOLE OUTPUT ONLY: Time to make object for data--- {time()-start_time}")
-    start_time = time()
+    timing_log.debug("made the objects for %s films in %.4fs", len(all_film_information_objects), perf_counter()-start_time)
+    start_time = perf_counter()
     for index, film_object in enumerate(all_film_information_objects):
         flag = True
         while flag:
             if active_count() <150:
-                running_threads += [Thread(target = adds_to_information_to_display_dictionary_for_films, args = (information_about_films, 
+                running_threads += [Thread(target = copy_context().run, args = (adds_to_information_to_display_dictionary_for_films, information_about_films, 
                     film_object, all_actor_ids_related_to_films, all_director_ids_related_to_films, all_genre_ids_related_to_films, all_language_ids_related_to_films))]
+                # run in a copy of the current context, so the queries in the thread are still recorded against the route which started it
                 running_threads[index].start()
                 flag = False
             else: flag = True
@@ -200,7 +206,7 @@ def turning_film_information_into_dictionary(film_ids: list, ordered: bool = Fal
             # only need the name and the url so that the user can see which actors were in the film
             # then if they are interested in more information then they can click on them and find the films they have been in
             actor_data = selects_info_from_database("CAST(ActorID AS VARCHAR(11)), ActorName, ImageURL",
-                "Actors", f"ActorID IN {'('+str(set(all_actor_ids_related_to_films))[1:-1]+')'}")
+                "Actors", WhereStatement().is_in("ActorID", set(all_actor_ids_related_to_films)))
             for actor_id, name, img_url in actor_data:
                 if img_url == "U": # there is no image
                     # appends it to the dictionary
@@ -211,7 +217,7 @@ def turning_film_information_into_dictionary(film_ids: list, ordered: bool = Fal
         if all_director_ids_related_to_films:
             # same principal as actors
             director_data = selects_info_from_database("CAST(DirectorID AS VARCHAR(11)), DirectorName, ImageURL",
-                "Directors", f"DirectorID IN {'('+str(set(all_director_ids_related_to_films))[1:-1]+')'}")
+                "Directors", WhereStatement().is_in("DirectorID", set(all_director_ids_related_to_films)))
             for director_id, name, img_url in director_data:
                 if img_url == "U":
                     directors[director_id] = [name, NO_IMAGE]
@@ -222,14 +228,14 @@ def turning_film_information_into_dictionary(film_ids: list, ordered: bool = Fal
             # if there are any genres known then will gather the name of the genre
             # then it will assign it to the dictionary
             genres = dict(selects_info_from_database("CAST(GenreID AS VARCHAR(11)), Genre", "GenreNames",
-                f"GenreID IN {'('+str(set(all_genre_ids_related_to_films))[1:-1]+')'}"))
+                WhereStatement().is_in("GenreID", set(all_genre_ids_related_to_films))))
 
         if all_language_ids_related_to_films:
             # same principal as genres 
             languages = dict(selects_info_from_database("CAST(LanguageID AS VARCHAR(11)), Language", "Language",
-                f"LanguageID IN {'('+str(set(all_language_ids_related_to_films))[1:-1]+')'}"))
+                WhereStatement().is_in("LanguageID", set(all_language_ids_related_to_films))))
 
-    print(f"CONSOLE OUTPUT ONLY: Took this long to create dictionary--- {time()-start_time}")
+    timing_log.debug("made the dictionary for %s films in %.4fs", len(all_film_information_objects), perf_counter()-start_time)
     
     return gathered_and_formatted_information_about_films, actors, directors, genres, languages # Then display this on the webiste
 
@@ -1,7 +1,8 @@
-from time import time, sleep
+from time import sleep
+from operator import mul
 
 # imports from my project
-from core_algos.formulas import selects_info_from_database, mean_and_sd, groupings, inserts_info_to_database, deletes_from_database
+from core_algos.formulas import selects_info_from_database, streams_info_from_database, mean_and_sd_from_totals, transaction, groupings, WhereStatement, FETCH_SIZE
 
 
 def gathers_top_films_from_database_on_request(chategory: str, language_criteria: list, genre_criteria: list, year_criteria: list):
@@ -23,20 +24,17 @@ def gathers_top_films_from_database_on_request(chategory: str, language_criteria
 
     :return: TYPE: list - a list of film ids if there are any
     """
-    start_time = time()
-
     if chategory == "Profit":
-        data = selects_info_from_database("FilmID", "Economy", f"Budget NOT IN (-1, 0) AND GrossRevenue <> -1 ORDER BY (GrossRevenue-Budget) DESC")
+        data = selects_info_from_database("FilmID", "Economy", WhereStatement().not_in("Budget", (-1, 0)).not_equals("GrossRevenue", -1).order_by("(GrossRevenue-Budget) DESC"))
         # Orders the films by the highest profit aslong as the budget and the revenue are both known
     elif chategory in ("Comedy", "Overall"):
         chategory_number = {"Overall": 1, "Comedy": 2}[chategory]
-        data = selects_info_from_database("FilmID", "TopRated", f"Chategory = '{chategory_number}' ORDER BY Priority DESC")
+        data = selects_info_from_database("FilmID", "TopRated", WhereStatement().equals("Chategory", str(chategory_number)).order_by("Priority DESC"))
     else:
-        data = selects_info_from_database("FilmID", "Economy", f"1 ORDER BY {chategory} DESC")
+        data = selects_info_from_database("FilmID", "Economy", WhereStatement().order_by(f"{chategory} DESC"))
         # since there is no where statement it checks to see if 1 is equal to 1, and since it is true it ignores it
 
-    # gathered all of the film ids now need to filter them down depending the criteria
-    print(f"CONSOLE OUTPUT ONLY: Time to get film ids for leaderboard is--- {time()-start_time}. Amount is {len(data)}")
+    # gathered all of the film ids now need to filter them down depending the criteria, the time each query took is recorded by the query telemetry
 
     if not data:
         # there are no films in the chategory which the user wanted
@@ -51,32 +49,29 @@ def gathers_top_films_from_database_on_request(chategory: str, language_criteria
         # no criteria havs been specified
         return all_film_ids[:50]
     
-    where_statement = f"Films.FilmID IN {'('+str(all_film_ids)[1:-1]+')'}"
+    where_statement = WhereStatement().is_in("Films.FilmID", all_film_ids)
     # the film ids for the criteria specified must be in top 100 gathered earlier from the database
     join_statement = ""
     if language_criteria:
-            where_statement += f" AND LanguageID IN {'('+str(language_criteria)[1:-1]+')'} AND LanguageToFilm.FilmID = Films.FilmID" 
+            where_statement.is_in("LanguageID", language_criteria).raw("LanguageToFilm.FilmID = Films.FilmID")
             join_statement += " JOIN LanguageToFilm"
             # since the langauges are in a seperate table to all the other information about the films they have to be
             # fetched and joined from the "LanguageToFilm" table
     
     if genre_criteria:
-            where_statement += f" AND GenreID IN {'('+str(genre_criteria)[1:-1]+')'} AND GenreToFilm.FilmID = Films.FilmID"
+            where_statement.is_in("GenreID", genre_criteria).raw("GenreToFilm.FilmID = Films.FilmID")
             join_statement += " JOIN GenreToFilm"
 
     if year_criteria:
-        where_statement += f" AND ReleaseDate > {year_criteria[0]} AND ReleaseDate < {year_criteria[1]+1}"
+        where_statement.greater_than("ReleaseDate", year_criteria[0]).less_than("ReleaseDate", year_criteria[1]+1)
         # lowerbound and upperbound of the release date which they user has requested the film to be between
     
-    start_time = time()
     film_ids_wanted_to_display = [j[0] for j in selects_info_from_database("Films.FilmID", "Films"+join_statement, where_statement)]
     # instead of being a list of tupels with 1 element it is now a list of integers 
 
     ordered_film_ids = [k for k in all_film_ids if k in film_ids_wanted_to_display]
     # puts the film_ids orders of what they were gathered in from the database
 
-    print(f"CONSOLE OUTPUT ONLY: Time to filter film ids for leaderboard is--- {time()-start_time}. Amount is {len(ordered_film_ids)}")
-
     return ordered_film_ids[:50]
 
 
@@ -95,25 +90,39 @@ def updates_database_with_top_rated_films(chategory: str):
     TABLE = "TopRated"
     chategory_number = {"Overall": 1, "Comedy": 2}[chategory]
 
-    deletes_from_database(TABLE, f"Chategory = '{chategory_number}'")
-    # deletes all of the current top rated or funniest films from the database, so new ones can be added without duplication
-
-    gathered_films = selects_info_from_database(f"FilmID, {chategory}", "Ratings", f"{chategory} <> -1")
-    # all of the film ids and ratings in the specified chategory which the user has rated where the rating is not unknown
-    if not gathered_films:
+    total = 0
+    total_of_squares = 0
+    amount = 0
+    totals_for_each_film = {} # {film_id: [total of the ratings, amount of ratings]}
+    for rows in streams_info_from_database(f"FilmID, {chategory}", "Ratings", WhereStatement().not_equals(chategory, -1), FETCH_SIZE):
+        # all of the film ids and ratings in the specified chategory which the user has rated where the rating is not unknown
+        # they are added up a batch at a time as they are read from the database, so that the whole Ratings table is never held in memory at once
+        grouped_ratings = groupings(rows) # the ratings for each film in this batch, so they are added up for each film rather than for each rating
+        ratings = grouped_ratings.column
+        total += sum(ratings)
+        total_of_squares += sum(map(mul, ratings, ratings))
+        amount += len(ratings)
+        for film_id, film_total, film_amount in zip(grouped_ratings.group_keys, grouped_ratings.sums().values(), grouped_ratings.counts().values()):
+            if film_id in totals_for_each_film:
+                totals_for_each_film[film_id][0] += film_total
+                totals_for_each_film[film_id][1] += film_amount
+            else:
+                totals_for_each_film[film_id] = [film_total, film_amount]
+
+    if not amount:
         # there are none rated in this chategory so, the function does not need to run any longer
+        with transaction() as unit:
+            unit.deletes(TABLE, WhereStatement().equals("Chategory", str(chategory_number)))
         return
 
-    rating_values = [i[1] for i in gathered_films] # all of the ratings without the film ids
-    grouped_films_with_ratings = groupings(gathered_films)
-    mean, sd = mean_and_sd(rating_values) # the mean rating of this chategory and standard deviation
+    mean, sd = mean_and_sd_from_totals(total, total_of_squares, amount) # the mean rating of this chategory and standard deviation
 
     above_2sd = []
     above_1sd = []
     above_mean = []
 
-    for film_id, rating in grouped_films_with_ratings.items():
-        mean_rating_for_film = sum(rating)/len(rating)
+    for film_id, (film_total, film_amount) in totals_for_each_film.items():
+        mean_rating_for_film = film_total/film_amount
         if mean_rating_for_film >= mean + 2*sd:
             above_2sd += [[film_id, mean_rating_for_film]]
         elif mean_rating_for_film >= mean + sd:
@@ -122,20 +131,25 @@ def updates_database_with_top_rated_films(chategory: str):
             above_mean += [[film_id, mean_rating_for_film]]
         # else it does not matter, and is not important to the algorithm
     
-    count = 0 # limits it so that there is not more than 100 films in the database for that chategory
-    if above_2sd:   
-        extra_info_2sd = list(map(lambda x: tuple(x+[chategory_number, 2]), above_2sd))
-        inserts_info_to_database(FIELD, TABLE, extra_info_2sd) # needs to be a list of tuples when added to the database
-        count += len(above_2sd)
-    
-    if above_1sd and count <= 100:
-        extra_info_1sd = list(map(lambda x: tuple(x+[chategory_number, 1]), above_1sd))
-        inserts_info_to_database(FIELD, TABLE, extra_info_1sd)
-        count += len(above_1sd)
-
-    if above_mean and count <= 100:
-        extra_info_above = list(map(lambda x: tuple(x+[chategory_number, 0]), above_mean))
-        inserts_info_to_database(FIELD, TABLE, extra_info_above)
+    with transaction() as unit:
+        # the old films are replaced in one transaction so the leaderboard is never empty while it is being updated
+        unit.deletes(TABLE, WhereStatement().equals("Chategory", str(chategory_number)))
+        # deletes all of the current top rated or funniest films from the database, so new ones can be added without duplication
+
+        count = 0 # limits it so that there is not more than 100 films in the database for that chategory
+        if above_2sd:   
+            extra_info_2sd = list(map(lambda x: tuple(x+[chategory_number, 2]), above_2sd))
+            unit.inserts(FIELD, TABLE, extra_info_2sd) # needs to be a list of tuples when added to the database
+            count += len(above_2sd)
+        
+        if above_1sd and count <= 100:
+            extra_info_1sd = list(map(lambda x: tuple(x+[chategory_number, 1]), above_1sd))
+            unit.inserts(FIELD, TABLE, extra_info_1sd)
+            count += len(above_1sd)
+
+        if above_mean and count <= 100:
+            extra_info_above = list(map(lambda x: tuple(x+[chategory_number, 0]), above_mean))
+            unit.inserts(FIELD, TABLE, extra_info_above)
 
 
 def creating_and_updating_top_ratings_for_leaderboards():
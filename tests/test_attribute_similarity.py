@@ -0,0 +1,70 @@
+import pytest
+
+# imports from my project
+from core_algos.attribute_similarity import attribute_index, builds_attribute_index, film_vectors, RandomProjections, NEIGHBOURS, \
+    UNKNOWN_GENRE_ID, UNKNOWN_LANGUAGE_ID
+from core_algos.formulas import configures_pool, selects_info_from_database, WhereStatement
+from core_algos.synthetic_catalog import creates_synthetic_catalog
+
+
+FILMS = [(1, 100, 2, "2000-01-01"), (2, 100, 2, "2000-01-01"), (3, 100, 2, "2000-01-01")]
+SCORE_TOLERANCE = 1e-6 # the scores in the index are saved as 32 bit floats
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """
+    A small synthetic catalog which the pool points at, with the attribute index built from it, the pool is put back afterwards
+    """
+    creates_synthetic_catalog(str(tmp_path / "catalog.db"), films= 400, actors= 50, directors= 10, users= 2, seed= 3)
+    builds_attribute_index()
+    yield
+    configures_pool()
+
+
+def catalog_vectors():
+    """
+    :return: vectors: dict - {film_id: [(position, value)]} of every film in the catalog
+
+    :return: dimensions: int
+    """
+    return film_vectors(selects_info_from_database("FilmID, Length, Colour, ReleaseDate", "Films", WhereStatement().order_by("FilmID")),
+        selects_info_from_database("FilmID, LanguageID", "LanguageToFilm", WhereStatement()),
+        selects_info_from_database("FilmID, GenreID", "GenreToFilm", WhereStatement()))
+
+
+def test_unknown_genres_and_languages_are_not_features():
+    vectors, dimensions = film_vectors(FILMS, [(1, UNKNOWN_LANGUAGE_ID), (2, 4), (2, UNKNOWN_LANGUAGE_ID), (3, 4)],
+        [(1, UNKNOWN_GENRE_ID), (2, 5), (2, UNKNOWN_GENRE_ID), (3, 5)])
+    assert dimensions == 4+2 # the runtime, year, mono and colour, then genre 5 and language 4
+    assert vectors[2] == vectors[3] # the unknown ids make no difference next to a known one
+    assert vectors[1] == [(3, 1.0)] # the runtime and year are the same as the mean, so only the colour is left
+
+
+def test_films_with_only_unknown_genres_and_languages_in_common_are_not_similar():
+    # before, the unknown genre and language made up most of both vectors, so these films came out as very similar
+    vectors, _ = film_vectors([(1, -1, 2, "2000-01-01"), (2, -1, 1, "2010-01-01")],
+        [(film_id, UNKNOWN_LANGUAGE_ID) for film_id in (1, 2)], [(film_id, UNKNOWN_GENRE_ID) for film_id in (1, 2)])
+    other_vector = dict(vectors[2])
+    assert sum(value*other_vector.get(position, 0.0) for position, value in vectors[1]) < 0
+
+
+def test_index_neighbours_are_close_to_scoring_every_film(catalog):
+    vectors, dimensions = catalog_vectors()
+    projections, index = RandomProjections(vectors, dimensions), attribute_index()
+    found_best = found = total = 0
+    for film_id, vector in vectors.items():
+        nearest = projections.nearest(vector, NEIGHBOURS, {film_id}, film_ids= vectors)
+        neighbours = index.neighbours(film_id)
+        assert neighbours == sorted(neighbours, key= lambda item: (-item[1], item[0]))
+        for neighbour_id, score in neighbours:
+            # every neighbour is scored exactly, even if the projections did not find all of the nearest films
+            other_vector = dict(vectors[neighbour_id])
+            assert score == pytest.approx(sum(value*other_vector.get(position, 0.0) for position, value in vector), abs= SCORE_TOLERANCE)
+        if nearest:
+            # films with the same score as the last of the real nearest films could have been picked instead of it, so they count aswell
+            found_best += bool(neighbours) and neighbours[0][1] >= nearest[0][1] - SCORE_TOLERANCE
+            found += len([score for _, score in neighbours[:10] if score >= nearest[:10][-1][1] - SCORE_TOLERANCE])
+            total += len(nearest[:10])
+    assert found_best/len(vectors) > 0.9
+    assert found/total > 0.7
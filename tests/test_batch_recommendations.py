@@ -0,0 +1,40 @@
+import pytest
+
+# imports from my project
+from core_algos.batch_recommendations import users_signatures
+from core_algos.formulas import configures_pool, transaction, WhereStatement
+from core_algos.synthetic_catalog import creates_synthetic_catalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """
+    A small synthetic catalog which the pool points at, the pool is put back afterwards
+    """
+    creates_synthetic_catalog(str(tmp_path / "catalog.db"), films= 100, actors= 40, directors= 10, users= 3, rated_per_user= 4, favourited_per_user= 2)
+    yield
+    configures_pool()
+
+
+def replaces_films(user_id: int, favourites: list, ratings: list):
+    with transaction() as unit:
+        unit.deletes("Favourites", WhereStatement().equals("UserID", user_id))
+        unit.deletes("Ratings", WhereStatement().equals("UserID", user_id))
+        unit.inserts("(FilmID, UserID, DateAdded)", "Favourites", [(film_id, user_id, "2020-01-01") for film_id in favourites])
+        unit.inserts("(Overall, Comedy, Actors, Quality, FilmID, UserID)", "Ratings", [(*rating, film_id, user_id) for film_id, rating in ratings])
+
+
+def test_different_films_with_the_same_totals_have_different_signatures(catalog):
+    # both users have 2 favourites adding up to 5, and 2 ratings where the film ids and the film ids times each rating add up to the same totals
+    replaces_films(1, [1, 4], [(10, (5, 5, 5, 5)), (20, (5, 5, 5, 5))])
+    replaces_films(2, [2, 3], [(5, (5, 5, 5, 5)), (25, (5, 5, 5, 5))])
+    signatures = users_signatures()
+    assert signatures[1] != signatures[2]
+
+
+def test_signature_only_changes_when_the_films_change(catalog):
+    before = users_signatures()
+    assert users_signatures() == before
+    replaces_films(3, [5, 6], [(7, (1, 1, 1, 1))])
+    after = users_signatures()
+    assert after[3] != before[3] and {user_id: after[user_id] for user_id in (1, 2)} == {user_id: before[user_id] for user_id in (1, 2)}
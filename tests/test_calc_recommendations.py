@@ -0,0 +1,162 @@
+from random import Random
+
+import pytest
+
+# imports from my project
+from core_algos import calc_recommendations
+from core_algos.calc_recommendations import RecommendedFilms, resolves_recommendation_priorities, recommendation_score, RECOMMENDATION_SIZE, \
+    LIKED_FIRST, LIKED_MONO, LIKED_SECOND, LIKED_THIRD, LIKED_REMAINDER
+from core_algos.formulas import configures_pool, selects_info_from_database, WhereStatement
+from core_algos.recommendation_cache import RecommendationCache
+from core_algos.synthetic_catalog import creates_synthetic_catalog
+
+
+USER_ID = 7
+
+
+def sorts_every_film(user_id, first_weighting, not_wanted, mono, second_weighting, third_weighting, film_ids_gathered_to_recommend, shared_people):
+    """
+    Scores and sorts every film, which "resolves_recommendation_priorities" does with a heap instead
+    """
+    liked_of_film = {}
+    for liked, film_ids in ((LIKED_FIRST, first_weighting), (None, not_wanted), (LIKED_MONO, mono[1:]), (LIKED_SECOND, second_weighting),
+            (LIKED_THIRD, third_weighting), (LIKED_REMAINDER, film_ids_gathered_to_recommend)):
+        for film_id in film_ids:
+            liked_of_film.setdefault(film_id, liked)
+    scored = sorted(((recommendation_score(liked, shared_people.get(film_id, 0)), -film_id, liked) for film_id, liked in liked_of_film.items()
+        if liked is not None), reverse= True)
+    mono_rows = [row for row in scored if row[2] == LIKED_MONO][:round(mono[0]*RECOMMENDATION_SIZE) if mono else 0]
+    other_rows = [row for row in scored if row[2] != LIKED_MONO][:RECOMMENDATION_SIZE-len(mono_rows)]
+    return [(-negative_id, user_id, liked) for _, negative_id, liked in sorted(mono_rows+other_rows, reverse= True)]
+
+
+def test_never_more_than_30_films_smallest_id_first():
+    rows = resolves_recommendation_priorities(USER_ID, [], [], [], [], [], list(range(100, 0, -1)))
+    assert rows == [(film_id, USER_ID, LIKED_REMAINDER) for film_id in range(1, RECOMMENDATION_SIZE+1)]
+
+
+def test_fewer_films_than_places():
+    rows = resolves_recommendation_priorities(USER_ID, [3], [], [], [2], [1], [1, 2, 3, 4])
+    assert rows == [(3, USER_ID, LIKED_FIRST), (2, USER_ID, LIKED_SECOND), (1, USER_ID, LIKED_THIRD), (4, USER_ID, LIKED_REMAINDER)]
+
+
+def test_films_in_several_lists_are_only_picked_once_for_the_highest_list():
+    rows = resolves_recommendation_priorities(USER_ID, [5, 5], [], [], [5, 6, 6], [6, 7], [5, 6, 7, 7, 8])
+    assert rows == [(5, USER_ID, LIKED_FIRST), (6, USER_ID, LIKED_SECOND), (7, USER_ID, LIKED_THIRD), (8, USER_ID, LIKED_REMAINDER)]
+
+
+def test_not_wanted_films_are_left_out_unless_they_are_in_the_first_weighting():
+    rows = resolves_recommendation_priorities(USER_ID, [1], [1, 2, 3], [0.5, 3], [2], [], [1, 2, 3, 4])
+    assert rows == [(1, USER_ID, LIKED_FIRST), (4, USER_ID, LIKED_REMAINDER)]
+
+
+def test_monochrome_films_only_get_their_share_of_the_places():
+    gathered = list(range(1, 101))
+    mono = [0.1] + list(range(50, 60)) # round(0.1*30) = 3 places for 10 monochrome films
+    rows = resolves_recommendation_priorities(USER_ID, [], [], mono, [], [], gathered, {55: 3, 57: 1, 20: 2})
+    assert len(rows) == RECOMMENDATION_SIZE
+    # the monochrome films with the most wanted actors and directors, then the smallest id, the other 7 are not recommended
+    assert rows[:3] == [(55, USER_ID, LIKED_MONO), (57, USER_ID, LIKED_MONO), (50, USER_ID, LIKED_MONO)]
+    assert rows[3:] == [(20, USER_ID, LIKED_REMAINDER)] + [(film_id, USER_ID, LIKED_REMAINDER) for film_id in range(1, 28) if film_id != 20]
+
+
+def test_other_films_fill_the_places_the_monochrome_films_can_not():
+    rows = resolves_recommendation_priorities(USER_ID, [], [], [0.5, 5, 6], [], [], list(range(1, 101)))
+    assert [row for row in rows if row[2] == LIKED_MONO] == [(5, USER_ID, LIKED_MONO), (6, USER_ID, LIKED_MONO)]
+    assert len(rows) == RECOMMENDATION_SIZE
+
+
+def test_no_films():
+    assert resolves_recommendation_priorities(USER_ID, [], [], [], [], [], []) == []
+
+
+def random_lists(random: Random, size: int):
+    gathered = random.sample(range(1, size*10), size)
+    def some():
+        return [random.choice(gathered) for _ in range(random.randint(0, size//random.choice((2, 5, 20, 100))))] if random.random() < 0.8 else []
+    mono = [random.random()] + list(dict.fromkeys(some())) if random.random() < 0.5 else []
+    shared_people = {film_id: random.randint(0, 4) for film_id in gathered if random.random() < 0.6}
+    return [USER_ID, some(), some(), mono, some(), some(), gathered, shared_people]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_picks_the_same_films_as_sorting_every_film(seed):
+    random = Random(seed)
+    for _ in range(50):
+        lists = random_lists(random, random.randint(1, 80))
+        rows = resolves_recommendation_priorities(*lists)
+        assert rows == sorts_every_film(*lists)
+        film_ids = [film_id for film_id, _, _ in rows]
+        assert len(rows) <= RECOMMENDATION_SIZE
+        assert len(set(film_ids)) == len(film_ids)
+        assert not set(film_ids) & (set(lists[2]) - set(lists[1])) # none are not wanted, unless they are also in the first weighting
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    """
+    A small synthetic catalog which the pool points at, with an empty recommendation cache, the pool is put back afterwards
+    """
+    creates_synthetic_catalog(str(tmp_path / "catalog.db"), films= 2000, actors= 300, directors= 80, users= 4, rated_per_user= 30, favourited_per_user= 10)
+    cache = RecommendationCache()
+    monkeypatch.setattr(calc_recommendations, "recommendation_cache", cache)
+    yield cache
+    configures_pool()
+
+
+def saved_rows(user_id: int):
+    return sorted(selects_info_from_database("FilmID, UserID, Liked", "Recommendations", WhereStatement().equals("UserID", user_id)))
+
+
+def test_recommendation_is_cached_once_it_is_saved(catalog):
+    recommendation = RecommendedFilms(1)
+    assert recommendation.recommendation_created and not recommendation.from_cache
+    assert catalog.gets(1, recommendation.fingerprint) == (True, recommendation.recommendation_rows)
+    assert saved_rows(1) == sorted(recommendation.recommendation_rows)
+    assert RecommendedFilms(1).from_cache
+
+
+def test_recommendation_which_is_not_saved_is_not_cached(catalog):
+    recommendation = RecommendedFilms(1, saves_to_database= False)
+    assert recommendation.recommendation_created
+    assert catalog.gets(1, recommendation.fingerprint) is None
+    assert saved_rows(1) == []
+    assert not RecommendedFilms(1).from_cache # so the rows are still saved the next time
+
+
+def test_recommendation_is_not_cached_if_saving_it_fails(catalog, monkeypatch):
+    def fails(user_ids, rows_to_add):
+        raise RuntimeError("the database is locked")
+    monkeypatch.setattr(calc_recommendations, "replaces_recommendations", fails)
+    with pytest.raises(RuntimeError):
+        RecommendedFilms(1)
+    monkeypatch.undo()
+    monkeypatch.setattr(calc_recommendations, "recommendation_cache", catalog)
+    recommendation = RecommendedFilms(1)
+    assert not recommendation.from_cache and saved_rows(1) == sorted(recommendation.recommendation_rows)
+
+
+def test_recommendations_for_several_users_are_cached_once_they_are_saved(catalog):
+    recommendations = RecommendedFilms.for_users([1, 2, 3])
+    for user_id, recommendation in recommendations.items():
+        assert catalog.gets(user_id, recommendation.fingerprint) == (recommendation.recommendation_created, recommendation.recommendation_rows)
+        assert saved_rows(user_id) == sorted(recommendation.recommendation_rows)
+
+
+def test_recommendations_for_several_users_are_not_cached_if_saving_them_fails(catalog, monkeypatch):
+    def fails(user_ids, rows_to_add):
+        raise RuntimeError("the database is locked")
+    monkeypatch.setattr(calc_recommendations, "replaces_recommendations", fails)
+    with pytest.raises(RuntimeError):
+        RecommendedFilms.for_users([1, 2, 3])
+    assert catalog.stats()["entries"] == 0
+    monkeypatch.undo()
+    monkeypatch.setattr(calc_recommendations, "recommendation_cache", catalog)
+    for user_id in (1, 2, 3): # made one at a time afterwards, e.g. by batch_recommendations.py, they are saved rather than taken from the cache
+        recommendation = RecommendedFilms(user_id)
+        assert not recommendation.from_cache and saved_rows(user_id) == sorted(recommendation.recommendation_rows)
+
+
+def test_recommendations_for_several_users_which_are_not_saved_are_not_cached(catalog):
+    for user_id, recommendation in RecommendedFilms.for_users([1, 2], saves_to_database= False).items():
+        assert catalog.gets(user_id, recommendation.fingerprint) is None
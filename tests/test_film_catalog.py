@@ -0,0 +1,55 @@
+import pytest
+
+# imports from my project
+from core_algos import film_catalog as film_catalog_module
+from core_algos.film_catalog import film_catalog, reloads_film_catalog
+from core_algos.formulas import configures_pool, deletes_from_database, inserts_info_to_database, updates_database, WhereStatement
+from core_algos.synthetic_catalog import creates_synthetic_catalog
+
+
+EDITED_LENGTH = 999 # a length which none of the synthetic films have
+EDITED_FILM_ID = 7
+EDITED_GENRE_ID = 2
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    """
+    A small synthetic catalog which the pool points at, checked for changes every time it is used, the pool is put back afterwards
+    """
+    creates_synthetic_catalog(str(tmp_path / "catalog.db"), films= 100, actors= 40, directors= 10, users= 2)
+    monkeypatch.setattr(film_catalog_module, "REFRESH_SECONDS", -1)
+    reloads_film_catalog()
+    yield
+    reloads_film_catalog()
+    configures_pool()
+
+
+def test_editing_a_film_changes_the_filter_result(catalog):
+    assert film_catalog().film_ids_in(film_catalog().lengths_between(EDITED_LENGTH, EDITED_LENGTH)) == []
+    updates_database("Length", "Films", WhereStatement().equals("FilmID", EDITED_FILM_ID), (EDITED_LENGTH,))
+    assert film_catalog().film_ids_in(film_catalog().lengths_between(EDITED_LENGTH, EDITED_LENGTH)) == [EDITED_FILM_ID]
+
+
+def test_changing_the_genres_of_a_film_changes_the_filter_result(catalog):
+    deletes_from_database("GenreToFilm", WhereStatement().equals("FilmID", EDITED_FILM_ID))
+    assert EDITED_FILM_ID not in film_catalog().film_ids_in(film_catalog().with_genre(EDITED_GENRE_ID))
+    inserts_info_to_database("(FilmID, GenreID)", "GenreToFilm", [(EDITED_FILM_ID, EDITED_GENRE_ID)])
+    assert EDITED_FILM_ID in film_catalog().film_ids_in(film_catalog().with_genre(EDITED_GENRE_ID))
+
+
+def test_catalog_is_kept_while_nothing_has_changed(catalog):
+    catalog = film_catalog()
+    updates_database("Length", "Films", WhereStatement().equals("FilmID", EDITED_FILM_ID), (EDITED_LENGTH,))
+    edited = film_catalog()
+    assert edited is not catalog
+    assert film_catalog() is edited
+
+
+def test_catalog_is_only_checked_after_refresh_seconds(catalog, monkeypatch):
+    monkeypatch.setattr(film_catalog_module, "REFRESH_SECONDS", 300)
+    catalog = film_catalog()
+    updates_database("Length", "Films", WhereStatement().equals("FilmID", EDITED_FILM_ID), (EDITED_LENGTH,))
+    assert film_catalog([EDITED_FILM_ID]) is catalog # the film is in the catalog so it is not checked yet
+    reloads_film_catalog()
+    assert film_catalog().film_ids_in(film_catalog().lengths_between(EDITED_LENGTH, EDITED_LENGTH)) == [EDITED_FILM_ID]
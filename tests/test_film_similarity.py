@@ -0,0 +1,79 @@
+from array import array
+from os import remove
+
+import pytest
+
+# imports from my project
+from core_algos import film_similarity
+from core_algos.film_similarity import rebuilds_similarity_index, similarity_file_path, SimilarityIndex
+from core_algos.formulas import configures_pool, transaction, WhereStatement
+from core_algos.synthetic_catalog import creates_synthetic_catalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """
+    A small synthetic catalog which the pool points at, with the similarity index built from the start, the pool is put back afterwards
+    """
+    creates_synthetic_catalog(str(tmp_path / "catalog.db"), films= 200, actors= 60, directors= 20, users= 30, rated_per_user= 15, favourited_per_user= 8)
+    rebuilds_similarity_index(full= True)
+    yield
+    configures_pool()
+
+
+def changes_users_films():
+    """
+    Adds films to some users and removes films from others, so the next rebuild has something to count
+    """
+    with transaction() as unit:
+        unit.inserts("(FilmID, UserID, DateAdded)", "Favourites", [(film_id, 1, "2020-01-01") for film_id in (3, 50, 120)])
+        unit.inserts("(Overall, Comedy, Actors, Quality, FilmID, UserID)", "Ratings", [(8, 5, 7, 6, 77, 2)])
+        unit.deletes("Favourites", WhereStatement().equals("UserID", 3))
+
+
+def saved_neighbours():
+    """
+    :return: TYPE: dict - {film_id: [(neighbour_id, score)]} from the file
+    """
+    return SimilarityIndex.loads(similarity_file_path()).all_neighbours()
+
+
+def full_rebuild_neighbours():
+    """
+    :return: TYPE: dict - the neighbours after counting everything again from the start
+    """
+    rebuilds_similarity_index(full= True)
+    return saved_neighbours()
+
+
+def test_incremental_rebuild_is_the_same_as_a_full_rebuild(catalog):
+    changes_users_films()
+    result = rebuilds_similarity_index()
+    assert result["changed_users"] == 3
+    incremental = saved_neighbours()
+    assert incremental == full_rebuild_neighbours()
+
+
+def removes_file():
+    remove(similarity_file_path())
+
+
+def saves_other_version():
+    with open(similarity_file_path(), "wb") as file:
+        array("q", [film_similarity.FILE_VERSION+1, 0, 0]).tofile(file)
+
+
+@pytest.mark.parametrize("replaces_file", [removes_file, saves_other_version])
+def test_incremental_rebuild_without_a_usable_file_is_the_same_as_a_full_rebuild(catalog, replaces_file):
+    changes_users_films()
+    replaces_file()
+    rebuilds_similarity_index()
+    incremental = saved_neighbours()
+    assert len(incremental) > 100 # not only the films which have changed
+    assert incremental == full_rebuild_neighbours()
+
+
+def test_incremental_rebuild_with_nothing_changed_keeps_the_file(catalog):
+    before = saved_neighbours()
+    assert rebuilds_similarity_index()["recalculated_films"] == 0
+    assert saved_neighbours() == before
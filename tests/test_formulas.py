@@ -0,0 +1,86 @@
+from random import Random
+from sqlite3 import connect
+
+import pytest
+
+# imports from my project
+from core_algos.formulas import configures_pool, current_pool, selects_info_from_database, builds_statement, padded_placeholders, WhereStatement, \
+    MAX_BOUND_IDS
+
+
+AMOUNT_OF_FILMS = 200000
+
+
+@pytest.fixture(scope= "module")
+def films(tmp_path_factory):
+    """
+    A database with a Films table of AMOUNT_OF_FILMS films, the pool only has 1 connection so the temporary tables it used can be checked afterwards
+    """
+    database_path = str(tmp_path_factory.mktemp("formulas") / "films.db")
+    with connect(database_path) as db:
+        db.execute("CREATE TABLE Films (FilmID INTEGER PRIMARY KEY, Length INTEGER)")
+        db.executemany("INSERT INTO Films VALUES (?, ?)", ((film_id, film_id % 200) for film_id in range(AMOUNT_OF_FILMS)))
+    configures_pool(database_path, size= 1)
+    yield set(range(AMOUNT_OF_FILMS))
+    configures_pool()
+
+
+def film_ids(where_statement: WhereStatement):
+    return {i[0] for i in selects_info_from_database("FilmID", "Films", where_statement)}
+
+
+@pytest.mark.parametrize("amount", [0, 1, 511, 512, 513, 100000])
+def test_is_in_and_not_in_give_the_right_films(films, amount):
+    ids = Random(amount).sample(range(AMOUNT_OF_FILMS), amount)
+    is_in = WhereStatement().is_in("FilmID", ids)
+    not_in = WhereStatement().not_in("FilmID", ids)
+    assert bool(is_in.id_sets) == bool(not_in.id_sets) == (amount > MAX_BOUND_IDS) # only large lists go into a temporary table
+    assert film_ids(is_in) == set(ids)
+    assert film_ids(not_in) == films - set(ids)
+
+
+def test_temporary_tables_are_emptied_after_the_query(films):
+    assert film_ids(WhereStatement().is_in("FilmID", range(1000)).not_in("FilmID", range(10, 990))) == set(range(10)) | set(range(990, 1000))
+    with current_pool().connection() as db:
+        tables = [name for (name,) in db.execute("SELECT name FROM temp.sqlite_master WHERE type = 'table'")]
+        assert tables and all(db.execute(f"SELECT COUNT(*) FROM temp.{name}").fetchone()[0] == 0 for name in tables)
+
+
+def test_ids_which_are_repeated_or_in_a_set(films):
+    assert film_ids(WhereStatement().is_in("FilmID", [5, 5, 7])) == {5, 7}
+    assert film_ids(WhereStatement().is_in("FilmID", {3, 4})) == {3, 4}
+    assert film_ids(WhereStatement().is_in("FilmID", [9]*(MAX_BOUND_IDS+1))) == {9}
+
+
+def test_padding_repeats_the_last_value_up_to_a_power_of_2():
+    assert padded_placeholders([]) == ("", [])
+    assert padded_placeholders([4]) == ("?", [4])
+    assert padded_placeholders([1, 2, 3]) == ("?,?,?,?", [1, 2, 3, 3])
+    placeholders, values = padded_placeholders(range(300))
+    assert placeholders.count("?") == len(values) == 512 and values[299:] == [299]*213
+
+
+@pytest.mark.parametrize("amount", [1, 3, 37, 100, 511])
+def test_padding_does_not_change_the_results(films, amount):
+    ids = Random(amount).sample(range(AMOUNT_OF_FILMS), amount)
+    where_statement = WhereStatement().is_in("FilmID", ids).not_in("Length", ids[:3])
+    unpadded = f"SELECT FilmID FROM Films WHERE FilmID IN ({','.join('?'*len(ids))}) AND Length NOT IN ({','.join('?'*len(ids[:3]))})"
+    with current_pool().connection() as db:
+        expected = {i[0] for i in db.execute(unpadded, ids + ids[:3])}
+    assert film_ids(where_statement) == expected
+
+
+def test_statement_cache_key_only_depends_on_the_shape():
+    # lists of ids with different values and lengths which pad to the same size are the same statement
+    assert WhereStatement().is_in("FilmID", range(37)).shape() == WhereStatement().is_in("FilmID", range(100, 164)).shape()
+    assert WhereStatement().equals("UserID", 1).shape() == WhereStatement().equals("UserID", 2).shape()
+    assert WhereStatement().is_in("FilmID", range(600)).shape() == WhereStatement().is_in("FilmID", range(5000, 100000)).shape()
+    assert WhereStatement().is_in("FilmID", range(37)).shape() != WhereStatement().is_in("FilmID", range(65)).shape()
+    assert WhereStatement().equals("UserID", 1).shape() != WhereStatement().equals("UserID", 1).order_by("FilmID").shape()
+
+    shape = WhereStatement().is_in("FilmID", [1, 2, 3]).shape()
+    statement = builds_statement("SELECT", "FilmID", "Films", shape)
+    hits = builds_statement.cache_info().hits
+    assert builds_statement("SELECT", "FilmID", "Films", WhereStatement().is_in("FilmID", [7, 8, 9, 10]).shape()) is statement
+    assert builds_statement.cache_info().hits == hits + 1
+    assert statement == "SELECT FilmID FROM Films WHERE FilmID IN (?,?,?,?)"
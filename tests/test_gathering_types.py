@@ -0,0 +1,130 @@
+from collections import Counter
+from random import Random
+
+import pytest
+
+# imports from my project
+from core_algos.gathering_types import tallies_weighted_ratings, counts_shared_genre_combinations, genre_mask, genres_in_mask, MAX_SUBSET_GENRES
+
+
+def original_tallies(ratings: list, without_unknowns: list, amount_of_known_films: int):
+    """
+    The nested loops which "tallies_weighted_ratings" replaced, every rating is compared with every link
+    and each id is repeated by the rating before they are counted
+    """
+    films_with_ratings = []
+    rating_frequency = []
+    for film_id, rating in ratings:
+        films_with_ratings +=[film_id]
+        if rating == -1:
+            rating = 5
+        for film_id2, actors_directors_genres_id in without_unknowns:
+                if film_id == film_id2:
+                    rating_frequency += [actors_directors_genres_id]*rating
+    if len(films_with_ratings) != amount_of_known_films:
+        for film_id3, actors_directors_genres_id2 in without_unknowns:
+            if film_id3 not in films_with_ratings:
+                rating_frequency += [actors_directors_genres_id2]*5
+    return dict(Counter(rating_frequency))
+
+
+def random_ratings(size: int, seed: int):
+    """
+    A profile of size films with 10 actors each and 5 ratings for each film, the last fifth of the films are not rated
+    and some of the ratings are unknown (-1) or 0
+
+    :return: ratings: list
+
+    :return: without_unknowns: list
+    """
+    random = Random(seed)
+    films = list(range(size))
+    without_unknowns = [(film_id, random.randrange(size*3)) for film_id in films for _ in range(10)]
+    random.shuffle(without_unknowns)
+    ratings = [(film_id, random.choice((-1, 0, 1, 3, 5, 7, 10))) for film_id in films[: size*4//5] for _ in range(5)]
+    random.shuffle(ratings)
+    return ratings, without_unknowns
+
+
+@pytest.mark.parametrize("size, seed", [(1, 1), (10, 2), (50, 3), (200, 4)])
+def test_weighted_ratings_match_the_nested_loops(size, seed):
+    ratings, without_unknowns = random_ratings(size, seed)
+    expected = original_tallies(ratings, without_unknowns, size)
+    tallies = tallies_weighted_ratings(ratings, without_unknowns, size)
+    assert tallies == expected
+    assert list(tallies) == list(expected) # the same order aswell, ties are broken by the order the ids were tallied in
+
+
+def test_weighted_ratings_when_every_known_film_is_rated():
+    ratings = [(1, 3), (1, -1), (2, 0), (3, 10)]
+    without_unknowns = [(1, 7), (2, 7), (3, 8), (1, 9)]
+    assert tallies_weighted_ratings(ratings, without_unknowns, 4) == original_tallies(ratings, without_unknowns, 4) == {7: 8, 9: 8, 8: 10}
+
+
+def test_weighted_ratings_for_films_without_any_ratings():
+    ratings = [(1, 2)]
+    without_unknowns = [(1, 7), (2, 7), (2, 8)]
+    assert tallies_weighted_ratings(ratings, without_unknowns, 2) == original_tallies(ratings, without_unknowns, 2) == {7: 7, 8: 5}
+
+
+def test_weighted_ratings_with_no_ratings_or_links():
+    assert tallies_weighted_ratings([], [], 0) == original_tallies([], [], 0) == {}
+
+
+def original_combinations(films_genres: list):
+    """
+    Every pair of films compared with sets, which "counts_shared_genre_combinations" replaced
+    """
+    combinations = []
+    for index, genres1 in enumerate(films_genres):
+        for genres2 in films_genres[index+1:]:
+            in_common = set(genres1) & set(genres2)
+            if len(in_common) > 1:
+                combinations += [tuple(sorted(in_common))]
+    return Counter(combinations).most_common()
+
+
+@pytest.mark.parametrize("size, seed", [(2, 1), (20, 2), (100, 3), (400, 4)])
+def test_genre_combinations_match_the_pairwise_sets(size, seed):
+    random = Random(seed)
+    films_genres = [random.sample(range(2, 22), random.randint(1, 4)) for _ in range(size)]
+    # the same combinations and occurences, in the same order, including ties which are in the order they were first found
+    assert counts_shared_genre_combinations([genre_mask(genres) for genres in films_genres]) == original_combinations(films_genres)
+
+
+@pytest.mark.parametrize("size, most_genres, seed", [(50, 12, 5), (200, 12, 6), (150, 8, 7), (60, 20, 8)])
+def test_genre_combinations_with_many_genres_match_the_pairwise_sets(size, most_genres, seed):
+    # a mix of films with few genres, which are counted by their combinations, and films with many, which are compared with every other film
+    random = Random(seed)
+    films_genres = [random.sample(range(2, 29), random.randint(1, most_genres)) for _ in range(size)]
+    assert any(len(genres) > MAX_SUBSET_GENRES for genres in films_genres) and any(len(genres) <= MAX_SUBSET_GENRES for genres in films_genres)
+    assert counts_shared_genre_combinations([genre_mask(genres) for genres in films_genres]) == original_combinations(films_genres)
+
+
+def test_genre_combinations_when_every_film_has_many_genres():
+    random = Random(9)
+    films_genres = [random.sample(range(2, 29), 12) for _ in range(100)]
+    assert counts_shared_genre_combinations([genre_mask(genres) for genres in films_genres]) == original_combinations(films_genres)
+
+
+def test_genre_combinations_on_either_side_of_the_most_genres_for_combinations():
+    few, many = list(range(2, 2+MAX_SUBSET_GENRES)), list(range(2, 3+MAX_SUBSET_GENRES))
+    films_genres = [few, many, few, [2, 3], many, [4, 5, 30], few[1:]]
+    assert counts_shared_genre_combinations([genre_mask(genres) for genres in films_genres]) == original_combinations(films_genres)
+
+
+def test_genre_combinations_only_count_exactly_the_genres_in_common():
+    films_genres = [[2, 3, 4], [2, 3, 4], [2, 3], [5, 6], [2, 5, 6]]
+    expected = original_combinations(films_genres)
+    assert counts_shared_genre_combinations([genre_mask(genres) for genres in films_genres]) == expected
+    assert dict(expected) == {(2, 3): 2, (2, 3, 4): 1, (5, 6): 1}
+
+
+def test_genre_combinations_with_less_than_2_genres_in_common():
+    assert counts_shared_genre_combinations([genre_mask([2]), genre_mask([2, 3]), genre_mask([4, 5])]) == []
+    assert counts_shared_genre_combinations([]) == []
+
+
+def test_genre_mask_round_trip():
+    assert genre_mask([1, 3]) == 0b1010
+    assert genres_in_mask(genre_mask([21, 4, 2])) == (2, 4, 21)
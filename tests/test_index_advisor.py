@@ -0,0 +1,52 @@
+import pytest
+
+# imports from my project
+from core_algos.formulas import configures_pool, telemetry
+from core_algos.index_advisor import applies_index_migration, collects_statements, covering_index, finds_full_scans, generated_indexes, \
+    records_query_shapes
+from core_algos.synthetic_catalog import creates_synthetic_catalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """
+    A small synthetic catalog which the pool points at, with the statements the recommendations run recorded by the telemetry,
+    the pool and the telemetry are put back afterwards
+    """
+    creates_synthetic_catalog(str(tmp_path / "catalog.db"), films= 2000, actors= 300, directors= 80, users= 4, rated_per_user= 30, favourited_per_user= 10)
+    telemetry.resets()
+    records_query_shapes(user_ids= [1, 2])
+    yield
+    telemetry.resets()
+    configures_pool()
+
+
+def test_migration_only_runs_once_and_leaves_no_full_scans(catalog):
+    assert applies_index_migration()
+    assert applies_index_migration() == [] # every index is already there
+    statements = collects_statements()
+    scanning = []
+    for statement, (parameters, where_statement, table) in statements.items():
+        _, scans = finds_full_scans(statement, parameters, where_statement)
+        if covering_index(statement) is not None and any(scan.startswith(f"SCAN {table}") for scan in scans):
+            scanning += [statement]
+    assert scanning == [] # only the statements which read a whole table on purpose (e.g. to build an index in memory) still scan it
+    assert any(covering_index(statement) for statement in statements)
+
+
+def test_indexes_are_made_from_the_scanning_statements(catalog):
+    statements = [statement for statement, (parameters, where_statement, table) in collects_statements().items()
+        if any(scan.startswith(f"SCAN {table}") for scan in finds_full_scans(statement, parameters, where_statement)[1])]
+    indexes = generated_indexes(statements, known_indexes= [])
+    assert ("FavouritesByUserIDFilmID", "Favourites", "UserID, FilmID") in indexes
+    assert applies_index_migration(indexes)
+    assert all(not any(scan.startswith(f"SCAN {table}") for scan in finds_full_scans(statement, parameters, where_statement)[1])
+        for statement, (parameters, where_statement, table) in collects_statements().items() if statement in statements and covering_index(statement))
+
+
+def test_covering_index_fields():
+    assert covering_index("SELECT FilmID FROM TopRated WHERE Chategory = ? ORDER BY Priority DESC") == ("TopRated", "Chategory, Priority, FilmID")
+    assert covering_index("SELECT CAST(ActorID AS VARCHAR(11)) FROM ActorIntegrator WHERE FilmID = ?") == ("ActorIntegrator", "FilmID, ActorID")
+    assert covering_index("SELECT FilmID FROM Films WHERE Length > ? AND Colour = ?") == ("Films", "Colour, Length, FilmID")
+    assert covering_index("SELECT FilmID, ActorID FROM ActorIntegrator WHERE 1") is None # reads the whole table anyway
+    assert covering_index("SELECT Films.FilmID FROM Films JOIN GenreToFilm WHERE GenreID IN (?) AND GenreToFilm.FilmID = Films.FilmID") is None
@@ -0,0 +1,49 @@
+import pytest
+
+# imports from my project
+from core_algos import people_index as people_index_module
+from core_algos.formulas import configures_pool, deletes_from_database, inserts_info_to_database, selects_info_from_database, updates_database, \
+    WhereStatement
+from core_algos.people_index import people_index, reloads_people_indexes
+from core_algos.synthetic_catalog import creates_synthetic_catalog
+
+
+EDITED_FILM_ID = 7
+NEW_PERSON_ID = 777777 # a person who is not in the synthetic catalog
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    """
+    A small synthetic catalog which the pool points at, with the indexes checked for changes every time they are used, the pool is put back afterwards
+    """
+    creates_synthetic_catalog(str(tmp_path / "catalog.db"), films= 100, actors= 40, directors= 10, users= 2)
+    monkeypatch.setattr(people_index_module, "REFRESH_SECONDS", -1)
+    reloads_people_indexes()
+    yield
+    reloads_people_indexes()
+    configures_pool()
+
+
+def test_index_is_read_again_after_a_link_is_updated(catalog):
+    # an update keeps the amount of rows and the largest rowid the same, so only the trigger's version shows it has changed
+    actor_id = selects_info_from_database("ActorID", "ActorIntegrator", WhereStatement().equals("FilmID", EDITED_FILM_ID))[0][0]
+    assert EDITED_FILM_ID in people_index("Actor").films_of(actor_id)
+    updates_database("ActorID", "ActorIntegrator", WhereStatement().equals("FilmID", EDITED_FILM_ID).equals("ActorID", actor_id), (NEW_PERSON_ID,))
+    assert people_index("Actor").films_of(NEW_PERSON_ID) == [EDITED_FILM_ID]
+    assert EDITED_FILM_ID not in people_index("Actor").films_of(actor_id)
+
+
+def test_index_is_read_again_after_a_link_is_replaced(catalog):
+    director_id = selects_info_from_database("DirectorID", "DirectorIntegrator", WhereStatement().equals("FilmID", EDITED_FILM_ID))[0][0]
+    people_index("Director")
+    deletes_from_database("DirectorIntegrator", WhereStatement().equals("FilmID", EDITED_FILM_ID))
+    inserts_info_to_database("(FilmID, DirectorID)", "DirectorIntegrator", [(EDITED_FILM_ID, NEW_PERSON_ID)])
+    assert people_index("Director").people_in(EDITED_FILM_ID) == [NEW_PERSON_ID]
+    assert EDITED_FILM_ID not in people_index("Director").films_of(director_id)
+
+
+def test_index_is_kept_while_nothing_has_changed(catalog):
+    index = people_index("Actor")
+    updates_database("Length", "Films", WhereStatement().equals("FilmID", EDITED_FILM_ID), (999,)) # a table the index does not use
+    assert people_index("Actor") is index
@@ -0,0 +1,56 @@
+from threading import Event, Lock
+from time import sleep, monotonic
+
+# imports from my project
+import core_algos.recommendation_jobs as jobs
+from core_algos.recommendation_jobs import RecommendationJobQueue, QUEUED, RUNNING, DONE
+
+
+class BlockingRecommendation:
+    """
+    Stands in for RecommendedFilms, each recommendation waits until its user's event is set,
+    and the most recommendations which were being made at the same time for each user are recorded
+    """
+    release = {}
+    running = {}
+    most_running = {}
+    made = []
+    lock = Lock()
+
+    def __init__(self, user_id: int):
+        with self.lock:
+            self.running[user_id] = self.running.get(user_id, 0) + 1
+            self.most_running[user_id] = max(self.most_running.get(user_id, 0), self.running[user_id])
+        self.release[user_id].wait(5)
+        with self.lock:
+            self.running[user_id] -= 1
+            self.made.append(user_id)
+        self.recommendation_created, self.from_cache = True, False
+
+
+def waits_for_status(job_queue: RecommendationJobQueue, job_id: int, status: str):
+    deadline = monotonic() + 5
+    while job_queue.status(job_id)["status"] != status:
+        assert monotonic() < deadline, f"job {job_id} never became {status}"
+        sleep(0.01)
+
+
+def test_a_job_submitted_while_the_users_job_is_running_waits_for_it(monkeypatch):
+    monkeypatch.setattr(jobs, "RecommendedFilms", BlockingRecommendation)
+    BlockingRecommendation.release = {1: Event(), 2: Event()}
+    job_queue = RecommendationJobQueue(workers= 2)
+
+    first = job_queue.submits(1)
+    waits_for_status(job_queue, first["job_id"], RUNNING)
+    second = job_queue.submits(1)
+    assert job_queue.submits(1)["job_id"] == second["job_id"] # coalesces with the job which is waiting
+    other_user = job_queue.submits(2)
+    waits_for_status(job_queue, other_user["job_id"], RUNNING) # the other worker is free, but it does not take the second job for user 1
+    assert job_queue.status(second["job_id"])["status"] == QUEUED
+
+    BlockingRecommendation.release[1].set()
+    BlockingRecommendation.release[2].set()
+    job_queue.waits_for_all()
+    assert [job_queue.status(job["job_id"])["status"] for job in (first, second, other_user)] == [DONE, DONE, DONE]
+    assert BlockingRecommendation.made.count(1) == 2
+    assert BlockingRecommendation.most_running == {1: 1, 2: 1}
@@ -0,0 +1,71 @@
+from fractions import Fraction
+from math import comb, inf, sqrt
+
+import pytest
+
+# imports from my project
+from core_algos.statistics_kernel import binomial_cdf, binomial_range, combination, means_and_sds
+
+
+def exact_binomial_range(lower: int, upper: int, trial: int, probability: Fraction):
+    """
+    The probability of getting between lower and upper successes, worked out exactly with fractions
+    """
+    return float(sum(comb(trial, i) * probability**i * (1-probability)**(trial-i) for i in range(max(lower, 0), min(upper, trial)+1)))
+
+
+@pytest.mark.parametrize("lower, upper, trial, probability", [(0, 10, 10, Fraction(1, 10)), (3, 3, 10, Fraction(1, 10)), (2, 7, 20, Fraction(3, 10)),
+    (0, 0, 50, Fraction(1, 2)), (40, 60, 100, Fraction(1, 2)), (5, 300, 300, Fraction(1, 100)), (-3, 4, 8, Fraction(1, 3)), (6, 20, 8, Fraction(1, 3))])
+def test_binomial_range_matches_the_exact_value(lower, upper, trial, probability):
+    assert binomial_range(lower, upper, trial, float(probability)) == pytest.approx(exact_binomial_range(lower, upper, trial, probability), rel= 1e-9, abs= 1e-300)
+
+
+def test_binomial_range_for_a_large_amount_of_trials():
+    # the old version worked out trial! as an integer and divided it, which overflowed a float long before 10,000 trials
+    assert binomial_range(4900, 5100, 10000, 0.5) == pytest.approx(float(Fraction(sum(comb(10000, i) for i in range(4900, 5101)), 2**10000)), rel= 1e-9)
+    assert binomial_range(150, 300, 1500, 0.1) == pytest.approx(exact_binomial_range(150, 300, 1500, Fraction(1, 10)), rel= 1e-9)
+    assert binomial_range(0, 100000, 100000, 0.5) == pytest.approx(1.0, rel= 1e-12)
+    assert binomial_cdf(10, 10000, 0.5) == pytest.approx(float(Fraction(sum(comb(10000, i) for i in range(11)), 2**10000)), rel= 1e-6)
+
+
+def test_binomial_range_where_lower_is_greater_than_upper():
+    assert binomial_range(5, 4, 10, 0.5) is None
+
+
+@pytest.mark.parametrize("successes, trial, probability", [(0, 10, Fraction(1, 4)), (4, 10, Fraction(1, 4)), (10, 10, Fraction(1, 4)),
+    (25, 40, Fraction(2, 3)), (-1, 10, Fraction(1, 2)), (12, 10, Fraction(1, 2))])
+def test_binomial_cdf_matches_the_exact_value(successes, trial, probability):
+    assert binomial_cdf(successes, trial, float(probability)) == pytest.approx(exact_binomial_range(0, successes, trial, probability), rel= 1e-9)
+
+
+def test_binomial_when_every_trial_gives_the_same_result():
+    assert binomial_range(0, 0, 10, 0.0) == binomial_range(10, 10, 10, 1.0) == 1.0
+    assert binomial_range(1, 10, 10, 0.0) == binomial_range(0, 9, 10, 1.0) == 0.0
+
+
+@pytest.mark.parametrize("total, position", [(0, 0), (5, 2), (30, 15), (100, 3), (1000, 500)])
+def test_combination_matches_math_comb(total, position):
+    assert combination(total, position) == float(comb(total, position))
+
+
+def test_combination_of_more_than_the_total_is_0():
+    assert combination(3, 5) == 0.0 # the old version gave 0.05
+
+
+def test_combination_too_big_for_a_float():
+    assert combination(2000, 1000) == inf
+
+
+def test_means_and_sds_match_the_exact_values():
+    columns = [[1, 2, 3, 4], [0.1]*1000, [60, 200, 95, 95, 130, 181], [10**9 + i for i in range(1000)]]
+    for values, (mean, sd) in zip(columns, means_and_sds(columns)):
+        exact = [Fraction(value) for value in values]
+        exact_mean = sum(exact)/len(exact)
+        exact_variance = sum(value*value for value in exact)/len(exact) - exact_mean**2
+        assert mean == pytest.approx(float(exact_mean), rel= 1e-12)
+        assert sd == pytest.approx(sqrt(exact_variance), rel= 1e-9, abs= 1e-9)
+
+
+def test_sd_of_the_same_value_is_never_below_0():
+    assert means_and_sds([[0.1]*1000, [7]])[1] == (7.0, 0.0)
+    assert means_and_sds([[0.1]*1000])[0][1] >= 0.0
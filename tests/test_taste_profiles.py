@@ -0,0 +1,186 @@
+import pytest
+
+# imports from my project
+from core_algos import taste_profiles
+from core_algos.formulas import configures_pool, selects_info_from_database, transaction, WhereStatement
+from core_algos.gathering_types import UserProfile
+from core_algos.recommendation_cache import RecommendationCache
+from core_algos.synthetic_catalog import creates_synthetic_catalog
+from core_algos.taste_profiles import finishes_taste_profile_updates, loads_taste_profile, profile_reweights, rebuilds_taste_profile, \
+    updates_taste_profiles, REWEIGHTS_TABLE, TABLE, UNKNOWN_PERSON_ID
+
+
+MISSING_FILM_ID = 999999 # a film which is favourited but is not in the Films table
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """
+    A small synthetic catalog which the pool points at, without the TasteProfiles table, the pool is put back afterwards
+    """
+    creates_synthetic_catalog(str(tmp_path / "catalog.db"), films= 300, actors= 120, directors= 30, users= 4, rated_per_user= 12, favourited_per_user= 6)
+    yield
+    profile_reweights.waits_for_all() # so the background thread has finished with the database
+    configures_pool()
+
+
+def users_films(user_id: int):
+    """
+    :return: TYPE: list - the films the user has favourited and rated, without duplicates, the same as calc_recommendations
+    """
+    where = WhereStatement().equals("UserID", user_id)
+    return list({i[0] for i in selects_info_from_database("FilmID", "Favourites", where) + selects_info_from_database("FilmID", "Ratings", where)})
+
+
+def test_profile_has_the_same_amounts_as_the_user_profile(catalog):
+    films = users_films(1)
+    profile = loads_taste_profile(1, films)
+    user_profile = UserProfile(films)
+    assert profile.amount_of_films() == user_profile.amount_of_films() == len(films)
+    assert profile.colour_amounts() == user_profile.colour_amounts()
+    for field, table, rating_chategory, UNKNOWN_ID in taste_profiles.LINKS:
+        unknowns, occurence, _ = profile.tallies(field, table, rating_chategory, UNKNOWN_ID)
+        user_unknowns, user_occurence, _ = user_profile.tallies(field, table, rating_chategory, UNKNOWN_ID)
+        assert (unknowns, occurence) == (user_unknowns, user_occurence)
+
+
+def test_ties_are_in_order_of_the_most_common_then_the_smallest_id(catalog):
+    # the profile does not know the order the films were read in, so unlike UserProfile ties are broken by the id
+    _, occurence, _ = loads_taste_profile(1, users_films(1)).tallies("ActorID", "ActorIntegrator", "Actors", UNKNOWN_PERSON_ID)
+    assert list(occurence) == sorted(occurence, key= lambda actor_id: (-occurence[actor_id], actor_id))
+
+
+def test_film_missing_from_the_films_table_does_not_rebuild_every_time(catalog, monkeypatch):
+    with transaction() as unit:
+        unit.inserts("(FilmID, UserID, DateAdded)", "Favourites", [(MISSING_FILM_ID, 1, "2020-01-01")])
+    films = users_films(1)
+    assert loads_taste_profile(1, films).amount_of_films() == len(films)
+
+    def rebuilds(user_id):
+        raise AssertionError("the profile was worked out again")
+    monkeypatch.setattr(taste_profiles, "rebuilds_taste_profile", rebuilds)
+    assert loads_taste_profile(1, films).amount_of_films() == len(films)
+
+
+def test_updates_make_the_table_if_it_does_not_exist(catalog):
+    film_id = next(film_id for (film_id,) in selects_info_from_database("FilmID", "Films", WhereStatement()) if film_id not in users_films(2))
+    with transaction() as unit:
+        with updates_taste_profiles(unit, 2, film_id):
+            unit.inserts("(FilmID, UserID, DateAdded)", "Favourites", [(film_id, 2, "2020-01-01")])
+    # the favourite was kept and added onto the profile, rather than rolled back because the table was missing
+    assert selects_info_from_database("FilmID", "Favourites", WhereStatement().equals("UserID", 2).equals("FilmID", film_id))
+    assert selects_info_from_database("Amount", TABLE, WhereStatement().equals("UserID", 2).equals("Field", "Films")) == [(1,)]
+
+
+def test_adding_and_removing_a_missing_film_keeps_the_amount_of_films(catalog):
+    films = users_films(3)
+    loads_taste_profile(3, films)
+    with transaction() as unit:
+        with updates_taste_profiles(unit, 3, MISSING_FILM_ID):
+            unit.inserts("(FilmID, UserID, DateAdded)", "Favourites", [(MISSING_FILM_ID, 3, "2020-01-01")])
+    assert taste_profiles.PersistedUserProfile(3).amount_of_films() == len(films) + 1
+    with transaction() as unit:
+        with updates_taste_profiles(unit, 3, MISSING_FILM_ID):
+            unit.deletes("Favourites", WhereStatement().equals("UserID", 3).equals("FilmID", MISSING_FILM_ID))
+    assert taste_profiles.PersistedUserProfile(3).amount_of_films() == len(films)
+
+
+def profile_rows(user_id: int):
+    """
+    :return: TYPE: list - every row of the user's profile, in order
+    """
+    return sorted(selects_info_from_database("Field, ID, Amount, Total, TotalOfSquares", TABLE, WhereStatement().equals("UserID", user_id)))
+
+
+def rebuilt_rows(user_id: int):
+    """
+    :return: TYPE: list - the rows of the user's profile when it is worked out again from the start
+    """
+    rebuilds_taste_profile(user_id)
+    return profile_rows(user_id)
+
+
+def favourites(user_id: int, film_id: int):
+    """
+    Favourites the film the same way as the website, with the profiles updated in the same transaction
+
+    :return: TYPE: set - the other users whose profiles were changed
+    """
+    with transaction() as unit:
+        with updates_taste_profiles(unit, user_id, film_id) as changed_profiles:
+            unit.inserts("(FilmID, UserID, DateAdded)", "Favourites", [(film_id, user_id, "2020-01-01")])
+    return changed_profiles
+
+
+def rates(user_id: int, film_id: int, rating: int):
+    """
+    Rates the film the same way as the website, without the background thread being started
+
+    :return: TYPE: set - the other users whose profiles were changed
+    """
+    with transaction() as unit:
+        with updates_taste_profiles(unit, user_id, film_id) as changed_profiles:
+            unit.deletes("Ratings", WhereStatement().equals("FilmID", film_id).equals("UserID", user_id))
+            unit.inserts("(Overall, Comedy, Actors, Quality, FilmID, UserID)", "Ratings", [(rating, rating, rating, rating, film_id, user_id)])
+    return changed_profiles
+
+
+@pytest.fixture
+def shared_film(catalog, monkeypatch):
+    """
+    A film with actors which users 2 and 3 have favourited, with every user's profile already worked out and an empty cache of recommendations
+
+    :return: TYPE: int - the film id
+    """
+    monkeypatch.setattr(taste_profiles, "recommendation_cache", RecommendationCache())
+    films_of_users = set().union(*(users_films(user_id) for user_id in (1, 2, 3, 4)))
+    film_id = next(film_id for (film_id,) in selects_info_from_database("FilmID", "Films", WhereStatement())
+        if film_id not in films_of_users and selects_info_from_database("ActorID", "ActorIntegrator", WhereStatement().equals("FilmID", film_id)))
+    for user_id in (1, 2, 3, 4):
+        loads_taste_profile(user_id, users_films(user_id))
+    favourites(2, film_id)
+    favourites(3, film_id)
+    return film_id
+
+
+def test_other_profiles_are_reweighted_in_the_background(shared_film):
+    before = profile_rows(2)
+    taste_profiles.recommendation_cache.keeps(2, "fingerprint", True, [])
+    rates(1, shared_film, 9)
+    assert profile_rows(2) == before # the request only changed the profile of the user who rated the film
+    assert len(selects_info_from_database("ChangeID", REWEIGHTS_TABLE, WhereStatement())) == 1
+
+    finishes_taste_profile_updates(set())
+    profile_reweights.waits_for_all()
+    assert selects_info_from_database("ChangeID", REWEIGHTS_TABLE, WhereStatement()) == []
+    assert taste_profiles.recommendation_cache.gets(2, "fingerprint") is None # it was made from the old weights
+    for user_id in (1, 2, 3):
+        assert profile_rows(user_id) == rebuilt_rows(user_id)
+
+
+def test_removing_the_film_before_the_reweight_runs(shared_film):
+    rates(1, shared_film, 9)
+    taste_profiles.recommendation_cache.keeps(3, "fingerprint", True, [])
+    with transaction() as unit:
+        with updates_taste_profiles(unit, 2, shared_film) as changed_profiles:
+            unit.deletes("Favourites", WhereStatement().equals("UserID", 2).equals("FilmID", shared_film))
+    assert changed_profiles == {3} # the change which was waiting was added in the same transaction, user 2's own profile is not included
+    assert taste_profiles.recommendation_cache.gets(3, "fingerprint") is not None # only once it has committed
+    finishes_taste_profile_updates(changed_profiles)
+    assert taste_profiles.recommendation_cache.gets(3, "fingerprint") is None
+    favourites(2, shared_film) # and adds it again, which counts the new weights
+    rates(4, shared_film, 3)
+    finishes_taste_profile_updates(set())
+    profile_reweights.waits_for_all()
+    for user_id in (1, 2, 3, 4):
+        assert profile_rows(user_id) == rebuilt_rows(user_id)
+
+
+def test_rebuilding_a_profile_adds_the_changes_which_are_waiting_first(shared_film):
+    rates(1, shared_film, 9)
+    rebuilt = rebuilt_rows(2)
+    assert selects_info_from_database("ChangeID", REWEIGHTS_TABLE, WhereStatement()) == []
+    finishes_taste_profile_updates(set())
+    profile_reweights.waits_for_all()
+    assert profile_rows(2) == rebuilt # the change was not added again on top of the profile which was worked out
+    assert profile_rows(3) == rebuilt_rows(3) # and the other users in it were given it at the same time